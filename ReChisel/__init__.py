@@ -1,5 +1,3 @@
 
-# Load .env variables
-from dotenv import load_dotenv
-
-load_dotenv(verbose=True)
+# NOTE: `.env` variables are loaded lazily by `ReChisel.llms` when the first LLM client
+# is created, so that importing the verifier alone stays cheap.
@@ -0,0 +1,149 @@
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+from ReChisel.results_store import STAGES, ResultsStore
+
+
+def _group_labels(store: ResultsStore, table: str) -> list[str]:
+    # Labels in the same order as `DENSE_RANK() OVER (ORDER BY model_key, config_key)`.
+    rows = store.connection.execute(
+        f"SELECT DISTINCT model_key, config_key FROM {table} ORDER BY model_key, config_key"
+    ).fetchall()
+    return [f"{model_key}#{config_key}" for model_key, config_key in rows]
+
+
+def _load(store: ResultsStore, table: str, columns: list[str]) -> tuple[np.ndarray, list[str]]:
+    """
+    Load integer `columns` of `table` as a 2D array. The first column is the 0-based
+    (model, config) group index; the returned labels map group indices to names.
+    """
+    sql = (
+        "SELECT DENSE_RANK() OVER (ORDER BY model_key, config_key) - 1, "
+        + ", ".join(columns) + f" FROM {table} ORDER BY rowid"
+    )
+    rows = store.connection.execute(sql).fetchall()
+    data = np.array(rows, dtype=np.int64).reshape(-1, len(columns) + 1)
+    return data, _group_labels(store, table)
+
+
+def pass_at_k(n: np.ndarray, c: np.ndarray, k: int) -> np.ndarray:
+    """
+    Unbiased pass@k estimator `1 - C(n - c, k) / C(n, k)`, vectorized over problems
+    with `n` runs and `c` passing runs each. Problems with `n < k` are NaN.
+    """
+    n = np.asarray(n, dtype=np.float64)
+    c = np.asarray(c, dtype=np.float64)
+    # C(n - c, k) / C(n, k) = prod_{j=0}^{k-1} (n - c - j) / (n - j)
+    ratio = np.ones_like(n)
+    for j in range(k):
+        ratio *= np.clip(n - c - j, 0, None) / np.where(n - j > 0, n - j, 1)
+    result = 1.0 - ratio
+    result[n < k] = np.nan
+    return result
+
+
+def group_pass_at_k(store: ResultsStore, ks: tuple[int, ...] = (1, 5, 10)) -> dict:
+    """ Mean pass@k over problems, for each (model, config) group. """
+    data, labels = _load(store, 'problems', ['is_passed'])
+    groups, passed = data[:, 0], data[:, 1]
+    # Problem IDs are strings; factorize them separately.
+    prob_ids = np.array(
+        [r[0] for r in store.connection.execute("SELECT prob_id FROM problems ORDER BY rowid").fetchall()],
+        dtype=object
+    )
+    _, prob_idx = np.unique(prob_ids, return_inverse=True)
+    num_probs = int(prob_idx.max()) + 1 if len(prob_idx) else 0
+
+    # One cell per (group, problem)
+    cell = groups * num_probs + prob_idx
+    n = np.bincount(cell, minlength=len(labels) * num_probs)
+    c = np.bincount(cell, weights=passed, minlength=len(labels) * num_probs)
+    cell_group = np.arange(len(n)) // max(num_probs, 1)
+    present = n > 0
+
+    result = {label: {'num_problems': 0, 'num_runs': 0} for label in labels}
+    for g, label in enumerate(labels):
+        mask = present & (cell_group == g)
+        result[label]['num_problems'] = int(mask.sum())
+        result[label]['num_runs'] = int(n[mask].sum())
+    for k in ks:
+        scores = pass_at_k(n[present], c[present], k)
+        g_present = cell_group[present]
+        valid = ~np.isnan(scores)
+        sums = np.bincount(g_present[valid], weights=scores[valid], minlength=len(labels))
+        counts = np.bincount(g_present[valid], minlength=len(labels))
+        for g, label in enumerate(labels):
+            result[label][f'pass@{k}'] = float(sums[g] / counts[g]) if counts[g] else None
+    return result
+
+
+def attempts_to_pass_distribution(store: ResultsStore) -> dict:
+    """
+    For each group: the histogram of attempts needed by passing runs, and the
+    cumulative fraction of all runs solved within `i + 1` attempts.
+    """
+    data, labels = _load(store, 'problems', ['is_passed', 'num_attempts'])
+    groups, passed, num_attempts = data[:, 0], data[:, 1].astype(bool), data[:, 2]
+    max_attempts = int(num_attempts.max()) if len(num_attempts) else 0
+
+    hist = np.zeros((len(labels), max_attempts + 1), dtype=np.int64)
+    np.add.at(hist, (groups[passed], num_attempts[passed]), 1)
+    runs = np.bincount(groups, minlength=len(labels))
+    cumulative = np.cumsum(hist, axis=1) / np.maximum(runs, 1)[:, None]
+
+    return {
+        label: {
+            'num_runs': int(runs[g]),
+            'attempts_histogram': hist[g, 1:].tolist(),
+            'solved_within': cumulative[g, 1:].round(6).tolist(),
+        }
+        for g, label in enumerate(labels)
+    }
+
+
+def stage_failure_breakdown(store: ResultsStore) -> dict:
+    """ For each group: how many attempts ended at each pipeline stage, and the mean mismatches of functional failures. """
+    data, labels = _load(store, 'attempts', ['stage', 'mismatches'])
+    groups, stage, mismatches = data[:, 0], data[:, 1], data[:, 2]
+
+    counts = np.zeros((len(labels), len(STAGES)), dtype=np.int64)
+    np.add.at(counts, (groups, stage), 1)
+
+    func = (stage == STAGES.index('functionality')) & (mismatches >= 0)
+    mm_sum = np.bincount(groups[func], weights=mismatches[func], minlength=len(labels))
+    mm_cnt = np.bincount(groups[func], minlength=len(labels))
+
+    return {
+        label: {
+            'num_attempts': int(counts[g].sum()),
+            'stages': {s: int(counts[g, i]) for i, s in enumerate(STAGES)},
+            'mean_functional_mismatches': float(mm_sum[g] / mm_cnt[g]) if mm_cnt[g] else None,
+        }
+        for g, label in enumerate(labels)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ReChisel results analytics")
+    parser.add_argument('db', type=str, help='Results store (SQLite file) written by `rechisel_cli.py --results-db`')
+    parser.add_argument('--ingest', type=str, nargs='*', default=[], help='CLI result JSON files to append before analyzing')
+    parser.add_argument('-k', type=int, nargs='+', default=[1, 5, 10], help='k values for pass@k')
+    args = parser.parse_args()
+
+    store = ResultsStore(args.db)
+    if args.ingest:
+        print(f"Ingested {store.ingest_json_files(Path(p) for p in args.ingest)} result files.")
+    report = {
+        'pass_at_k': group_pass_at_k(store, tuple(args.k)),
+        'attempts_to_pass': attempts_to_pass_distribution(store),
+        'stage_failures': stage_failure_breakdown(store),
+    }
+    print(json.dumps(report, indent=2))
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+from dataclasses import dataclass, field
+import re
+from typing import Callable, Optional
+
+from langchain_core.messages import AIMessage
+
+from ReChisel.chisel_code import ChiselCode
+from ReChisel.formal import module_names
+from ReChisel.scala_extract import find_block_end
+from ReChisel.testcase import Testcase
+from ReChisel.verifier import VerifyResult
+
+
+# Icarus Verilog: "tb.sv:76: error: port ``zero'' is not a port of top_module1."
+_MISSING_PORT = re.compile(r"port ``(\w+)'' is not a port of (\w+)")
+_PORT_DECL = re.compile(
+    r'\b(?:input|output|inout)\s+(?:wire\s+|reg\s+|logic\s+)?(?:signed\s+)?(?:\[[^\]]*\]\s*)*(\w+)'
+)
+_NAMED_CONNECTION = re.compile(r'\.(\w+)\s*(?=[(,)])')
+# Constructs that need the implicit clock and reset of `Module`.
+_IMPLICIT_CLOCK_USE = re.compile(
+    r'\b(?:Reg|RegInit|RegNext|RegEnable|ShiftRegister|Mem|SyncReadMem|Counter|clock|reset)\b'
+)
+_IMPLICIT_PORTS = {'clock', 'reset'}
+
+
+def verilog_ports(verilog_code: str, module_name: str) -> list[str]:
+    """ Port names of `module_name` in ANSI-style Verilog, in declaration order. """
+    m = re.search(rf'\bmodule\s+{re.escape(module_name)}\b[^;]*?\(([^;]*?)\)\s*;', verilog_code, flags=re.DOTALL)
+    return _PORT_DECL.findall(m.group(1)) if m else []
+
+
+def expected_ports(testcase: Testcase, top_module_name: str) -> Optional[set[str]]:
+    """
+    Ports the testbench connects on its `top_module_name` instance. Wildcard (`.*`) connections
+    are resolved with the reference module's ports. None if the ports cannot be determined.
+    """
+    m = re.search(rf'\b{re.escape(top_module_name)}\s+\w+\s*\((.*?)\)\s*;', testcase.testbench_code, flags=re.DOTALL)
+    if m is None:
+        return None
+    ports = set(_NAMED_CONNECTION.findall(m.group(1)))
+    if '.*' in m.group(1) or not ports:
+        reference_modules = module_names(testcase.reference_code)
+        if not reference_modules:
+            return ports or None
+        reference_top = 'RefModule' if 'RefModule' in reference_modules else reference_modules[0]
+        ports |= set(verilog_ports(testcase.reference_code, reference_top))
+    return ports or None
+
+
+def _split_statements(body: str) -> list[str]:
+    """ Split a block body at newlines and `;` outside parentheses, dropping line comments. """
+    statements, depth, start = [], 0, 0
+    for i, c in enumerate(body):
+        if c in '([{':
+            depth += 1
+        elif c in ')]}':
+            depth -= 1
+        elif c in '\n;' and depth == 0:
+            statements.append(body[start:i])
+            start = i + 1
+    statements.append(body[start:])
+    statements = [re.sub(r'//[^\n]*', '', s).strip() for s in statements]
+    return [s for s in statements if s]
+
+
+def flatten_io_bundle(code: str) -> Optional[str]:
+    """
+    Rewrite `val io = IO(new Bundle { val a = Input(...) ... })` into flat ports
+    `val a = IO(Input(...))` and `io.a` into `a`, so the Verilog ports lose the `io_` prefix.
+    None if there is no such bundle or a field cannot be rewritten.
+    """
+    m = re.search(r'^([ \t]*)val\s+io\s*=\s*IO\(\s*new\s+Bundle\s*\{', code, flags=re.MULTILINE)
+    if m is None:
+        return None
+    indent = m.group(1)
+    block_end = find_block_end(code, m.end() - 1)
+    close = re.match(r'\s*\)', code[block_end:])
+    if close is None:
+        return None
+
+    fields = []
+    for statement in _split_statements(code[m.end():block_end - 1]):
+        field_match = re.fullmatch(r'val\s+(\w+)\s*=\s*((?:Input|Output|Flipped)\(.*\))', statement, flags=re.DOTALL)
+        if field_match is None:
+            return None
+        fields.append(field_match.groups())
+    if not fields:
+        return None
+
+    ports = "\n".join(f"{indent}val {name} = IO({direction})" for name, direction in fields)
+    code = code[:m.start()] + ports + code[block_end + close.end():]
+    names = "|".join(re.escape(name) for name, _ in fields)
+    return re.sub(rf'\bio\.({names})\b', r'\1', code)
+
+
+def module_to_raw_module(code: str, top_module_name: str) -> Optional[str]:
+    """
+    Make the top module extend `RawModule`, removing the implicit clock and reset ports.
+    None if the top module is not a `Module` or relies on the implicit clock or reset.
+    """
+    pattern = rf'(\bclass\s+{re.escape(top_module_name)}\b[^{{]*?\bextends\s+)Module\b'
+    if not re.search(pattern, code) or _IMPLICIT_CLOCK_USE.search(code):
+        return None
+    return re.sub(pattern, r'\1RawModule', code, count=1)
+
+
+@dataclass
+class AutoFix:
+    chisel_code: ChiselCode
+    # Names of the applied rules, see `RULES`.
+    rules: list[str]
+
+    @property
+    def reviewer_response(self) -> AIMessage:
+        # Stands in for the reviewer's response in the tracing history.
+        return AIMessage("Applied automatic interface fixes: " + "; ".join(RULES[r] for r in self.rules) + ".")
+
+
+@dataclass
+class AutoFixStats:
+    # Iverilog failures examined, rewrites attempted, and rewrites that made iverilog pass.
+    candidates: int = 0
+    rewrites: int = 0
+    hits: int = 0
+    rule_hits: dict = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return {
+            'candidates': self.candidates,
+            'rewrites': self.rewrites,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.candidates if self.candidates else None,
+            'rule_hits': dict(self.rule_hits),
+            # Each hit replaces one reviewer call and one correction call.
+            'llm_calls_saved': 2 * self.hits,
+        }
+
+
+RULES = {
+    'flatten_io_bundle': "declared the `io` Bundle fields as separate IO ports, removing the `io_` prefix",
+    'module_to_raw_module': "made the top module extend `RawModule`, removing the implicit clock and reset ports",
+}
+
+
+class AutoFixer:
+    """
+    Deterministic fixes for interface mismatches between the generated Verilog and the
+    testbench, applied to the Chisel source before asking the reviewer.
+    """
+
+    def __init__(self, *, verbose: bool = False):
+        self._verbose = verbose
+        self.stats = AutoFixStats()
+
+    def _log(self, message: str):
+        if self._verbose:
+            print(f"[AUTOFIX] {message}")
+
+    def propose(self, chisel_code: ChiselCode, verify_result: VerifyResult, testcase: Testcase) -> Optional[AutoFix]:
+        """ A rewritten ChiselCode for an iverilog interface failure, or None if no rule applies. """
+        if not verify_result.chisel_compile_to_verilog_success or verify_result.verilog_compile_success:
+            return None
+        self.stats.candidates += 1
+        iv = verify_result.iv_cmd_exec_result
+        missing_ports = {m.group(1) for m in _MISSING_PORT.finditer(iv.stdout + iv.stderr)}
+        top = chisel_code.top_module_name
+        generated = set(verilog_ports(verify_result.compiled_verilog_code, top))
+        expected = expected_ports(testcase, top)
+        if expected is None or not generated:
+            self._log("Cannot determine the expected or generated ports.")
+            return None
+
+        code, rules = chisel_code.raw, []
+        missing_expected = missing_ports & expected
+        if missing_expected and all(f"io_{p}" in generated for p in missing_expected):
+            fixed = flatten_io_bundle(code)
+            if fixed is not None:
+                code = fixed
+                rules.append('flatten_io_bundle')
+        if (generated & _IMPLICIT_PORTS) - expected:
+            fixed = module_to_raw_module(code, top)
+            if fixed is not None:
+                code = fixed
+                rules.append('module_to_raw_module')
+        if not rules:
+            self._log("No rule applies.")
+            return None
+
+        self._log(f"Rewriting with rules: {rules}")
+        self.stats.rewrites += 1
+        return AutoFix(ChiselCode(f"```scala\n{code}\n```", top), rules)
+
+    def record(self, fix: AutoFix, verify_result: VerifyResult) -> bool:
+        """ Record the re-verification of `fix`; True if it resolved the iverilog failure. """
+        hit = bool(verify_result.verilog_compile_success)
+        if hit:
+            self.stats.hits += 1
+            for rule in fix.rules:
+                self.stats.rule_hits[rule] = self.stats.rule_hits.get(rule, 0) + 1
+        self._log(f"Rewrite {'resolved' if hit else 'did not resolve'} the iverilog failure.")
+        return hit
+
+    def run(
+            self,
+            chisel_code: ChiselCode,
+            verify_result: VerifyResult,
+            testcase: Testcase,
+            verify_fn: Callable[[ChiselCode], VerifyResult]
+    ) -> Optional[tuple[AutoFix, VerifyResult]]:
+        """ Propose, re-verify with `verify_fn`, and return the fix and its result if it was a hit. """
+        fix = self.propose(chisel_code, verify_result, testcase)
+        if fix is None:
+            return None
+        try:
+            fixed_result = verify_fn(fix.chisel_code)
+        except ValueError as e:
+            self._log(f"Rewritten code could not be verified: {e}")
+            return None
+        return (fix, fixed_result) if self.record(fix, fixed_result) else None
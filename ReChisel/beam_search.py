@@ -0,0 +1,271 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+import threading
+import time
+from typing import Callable, Optional
+
+from langchain_core.messages import AIMessage
+
+from ReChisel.chisel_code import ChiselCode
+from ReChisel.generator import Generator
+from ReChisel.reviewer import Reviewer
+from ReChisel.testcase import Testcase
+from ReChisel.tracing import Tracing, in_context_attempt_history_format
+from ReChisel.usage import BudgetExceeded, UsageTracker
+from ReChisel.verifier import VerifyResult, parse_mismatches, verify
+
+
+def verify_progress(verify_result: Optional[VerifyResult]) -> tuple:
+    """
+    Sort key for how far a candidate got in the pipeline: sbt pass, then iverilog pass,
+    then fewest functional mismatches. Larger is better.
+    """
+    if verify_result is None:
+        return (-1, 0)
+    if verify_result.functionality_correct:
+        return (3, 0)
+    if not verify_result.chisel_compile_to_verilog_success:
+        return (0, 0)
+    if not verify_result.verilog_compile_success:
+        return (1, 0)
+    vvp = verify_result.vvp_cmd_exec_result
+    mismatches = parse_mismatches(vvp.stdout) if vvp else None
+    # Unknown mismatch counts rank below any known count.
+    return (2, -mismatches if mismatches is not None else -float('inf'))
+
+
+@dataclass
+class Candidate:
+    chisel_code: ChiselCode
+    verify_result: VerifyResult
+    # History of the attempts that led to this candidate, not including itself.
+    tracing: Tracing
+    depth: int
+    reviewer_response: Optional[AIMessage] = None
+    # `tracing` plus this candidate's own attempt; set once the candidate is reviewed.
+    child_tracing: Optional[Tracing] = None
+
+    @property
+    def progress(self) -> tuple:
+        return verify_progress(self.verify_result)
+
+    @property
+    def is_passed(self) -> bool:
+        return bool(self.verify_result and self.verify_result.functionality_correct)
+
+
+@dataclass
+class BeamSearchConfig:
+    beam_width: int = 2
+    num_expansions: int = 2
+    max_depth: int = 5
+    verify_workers: int = 4
+    # Budgets; None means unlimited.
+    time_budget: Optional[float] = None
+    llm_call_budget: Optional[int] = None
+
+
+@dataclass
+class BeamSearchStats:
+    llm_calls: int = 0
+    verifications: int = 0
+    depth_reached: int = 0
+    elapsed: float = 0.0
+    stop_reason: str = ''
+    beam_progress: list = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+class BeamSearch:
+    """
+    Keep the top-B candidates ranked by `verify_progress`. Each round, every candidate in the
+    beam is reviewed once and expanded with M corrections; the expansions are generated and
+    verified concurrently, each in its own working directory. Every branch carries its own
+    `Tracing` history.
+    """
+
+    def __init__(
+            self, *,
+            generator: Generator,
+            reviewer: Reviewer,
+            tracing: Tracing,
+            testcase: Testcase,
+            bm_type: str,
+            output_dir: Path,
+            config: BeamSearchConfig,
+            use_in_context_history: bool = False,
+            max_history_length: int = 5,
+            summary_wait: float = 0.0,
+            verify_kwargs: Optional[dict] = None,
+            verify_fn: Callable[..., VerifyResult] = verify,
+            usage_tracker: Optional[UsageTracker] = None,
+            verbose: bool = False,
+    ):
+        self._generator = generator
+        self._reviewer = reviewer
+        self._root_tracing = tracing
+        self._testcase = testcase
+        self._bm_type = bm_type
+        self._output_dir = Path(output_dir)
+        self._config = config
+        self._use_in_context_history = use_in_context_history
+        self._max_history_length = max_history_length
+        self._summary_wait = summary_wait
+        self._verify_kwargs = verify_kwargs or {}
+        self._verify_fn = verify_fn
+        # Only used to attribute token usage to search depths; budgets are enforced by the LLM calls.
+        self._usage_tracker = usage_tracker
+        self._verbose = verbose
+
+        self.stats = BeamSearchStats()
+        self._lock = threading.Lock()
+        self._start_time = None
+        self._num_verify_dirs = 0
+
+    def _log(self, message: str):
+        if self._verbose:
+            print(f"[BEAM SEARCH] {message}")
+
+    def _check_time_budget(self):
+        budget = self._config.time_budget
+        if budget is not None and time.monotonic() - self._start_time >= budget:
+            raise BudgetExceeded("Wall-clock budget exhausted.")
+
+    def _reserve_llm_calls(self, n: int):
+        # Reserve budget before making the calls, so concurrent branches cannot overshoot.
+        self._check_time_budget()
+        with self._lock:
+            budget = self._config.llm_call_budget
+            if budget is not None and self.stats.llm_calls + n > budget:
+                raise BudgetExceeded("LLM call budget exhausted.")
+            self.stats.llm_calls += n
+
+    def _verify(self, chisel_code: ChiselCode) -> Optional[VerifyResult]:
+        with self._lock:
+            working_dir = self._output_dir / f"candidate_{self._num_verify_dirs}"
+            self._num_verify_dirs += 1
+            self.stats.verifications += 1
+        try:
+            return self._verify_fn(
+                chisel_code, self._testcase, output_dir=working_dir, bm_type=self._bm_type,
+                verbose=self._verbose, **self._verify_kwargs
+            )
+        except ValueError as e:
+            # The response has no usable Scala code block.
+            self._log(f"Dropping candidate: {e}")
+            return None
+
+    def _initial_candidate(self) -> Optional[Candidate]:
+        self._reserve_llm_calls(1)
+        response = self._generator.initial_chisel_generation()
+        chisel_code = self._generator.code_extract(response)
+        verify_result = self._verify(chisel_code)
+        if verify_result is None:
+            return None
+        return Candidate(chisel_code, verify_result, self._root_tracing.fork(), depth=0)
+
+    def _review(self, candidate: Candidate):
+        """ Review a failed candidate once, and record the history its children continue from. """
+        if candidate.child_tracing is not None:
+            return
+        self._reserve_llm_calls(2 if candidate.tracing.use_llm_summary else 1)
+        reviewer_response = self._reviewer(
+            self._testcase, candidate.verify_result, candidate.chisel_code
+        )
+        child_tracing = candidate.tracing.fork()
+        child_tracing.add_attempt(candidate.chisel_code, candidate.verify_result, reviewer_response)
+        candidate.reviewer_response = reviewer_response
+        candidate.child_tracing = child_tracing
+
+    def _expand(self, candidate: Candidate) -> Optional[Candidate]:
+        self._reserve_llm_calls(1)
+        child_tracing = candidate.child_tracing
+        in_context_history = None
+        if self._use_in_context_history:
+            in_context_history = in_context_attempt_history_format(
+                child_tracing, k=self._max_history_length, summary_wait=self._summary_wait
+            )
+        response = self._generator.correction_generation(
+            candidate.reviewer_response,
+            candidate.verify_result,
+            candidate.chisel_code,
+            in_context_history=in_context_history
+        )
+        chisel_code = self._generator.code_extract(response)
+        self._check_time_budget()
+        verify_result = self._verify(chisel_code)
+        if verify_result is None:
+            return None
+        return Candidate(chisel_code, verify_result, child_tracing, depth=candidate.depth + 1)
+
+    @staticmethod
+    def _collect(futures) -> tuple[list, Optional[BudgetExceeded]]:
+        results, budget_error = [], None
+        for future in futures:
+            try:
+                results.append(future.result())
+            except BudgetExceeded as e:
+                budget_error = e
+        return results, budget_error
+
+    def _record_beam(self, beam: list[Candidate]):
+        self.stats.beam_progress.append([list(c.progress) for c in beam])
+        self._log(f"Beam at depth {self.stats.depth_reached}: {[c.progress for c in beam]}")
+
+    def run(self) -> Optional[Candidate]:
+        """
+        Run the search and return the best candidate found, or None if a budget ran out before
+        any initial candidate was verified (`stats.stop_reason` says which).
+        """
+        self._start_time = time.monotonic()
+        config = self._config
+        beam: list[Candidate] = []
+
+        # One worker pool bounds both the concurrent LLM calls and the concurrent verifications.
+        with ThreadPoolExecutor(max_workers=config.verify_workers) as pool:
+            futures = [pool.submit(self._initial_candidate) for _ in range(config.beam_width)]
+            results, budget_error = self._collect(futures)
+            beam = sorted((c for c in results if c), key=lambda c: c.progress, reverse=True)
+            self._record_beam(beam)
+            if not beam:
+                if budget_error is None:
+                    raise RuntimeError("No initial candidate contains usable Chisel code.")
+                self.stats.stop_reason = str(budget_error)
+                self.stats.elapsed = time.monotonic() - self._start_time
+                return None
+
+            while True:
+                if any(c.is_passed for c in beam):
+                    self.stats.stop_reason = 'passed'
+                    break
+                if budget_error is not None:
+                    self.stats.stop_reason = str(budget_error)
+                    break
+                if self.stats.depth_reached >= config.max_depth:
+                    self.stats.stop_reason = 'max depth reached'
+                    break
+                if self._usage_tracker is not None:
+                    self._usage_tracker.attempt = self.stats.depth_reached + 1
+
+                futures = [pool.submit(self._review, c) for c in beam]
+                _, budget_error = self._collect(futures)
+
+                futures = [
+                    pool.submit(self._expand, candidate)
+                    for candidate in beam if candidate.child_tracing is not None
+                    for _ in range(config.num_expansions)
+                ]
+                results, expand_error = self._collect(futures)
+                budget_error = budget_error or expand_error
+                children = [c for c in results if c]
+                self.stats.depth_reached += 1
+
+                # Parents stay in the running, so a round of bad corrections cannot lose progress.
+                beam = sorted(children + beam, key=lambda c: c.progress, reverse=True)[:config.beam_width]
+                self._record_beam(beam)
+
+        self.stats.elapsed = time.monotonic() - self._start_time
+        return beam[0]
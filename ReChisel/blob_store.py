@@ -0,0 +1,84 @@
+from pathlib import Path
+import hashlib
+import threading
+import zlib
+from typing import Optional
+
+
+class BlobStore:
+    """
+    Content-addressed, compressed store for large strings (Verilog code, tool logs, LLM responses).
+
+    Strings are keyed by the SHA-256 of their UTF-8 bytes, so identical contents stored by
+    different attempts are kept only once. Compressed blobs live in memory by default; if
+    `spill_dir` is given, they are written to disk instead and only the keys stay in memory.
+    """
+
+    def __init__(
+            self,
+            spill_dir: Optional[str | Path] = None,
+            *,
+            compress_level: int = 6,
+    ):
+        self._spill_dir = Path(spill_dir) if spill_dir else None
+        if self._spill_dir is not None:
+            self._spill_dir.mkdir(parents=True, exist_ok=True)
+        self._compress_level = compress_level
+        self._blobs: dict[str, bytes] = {}
+        self._known: set[str] = set()
+        self._lock = threading.Lock()
+        # Statistics
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.dedup_hits = 0
+
+    def _blob_path(self, key: str) -> Path:
+        return self._spill_dir / key[:2] / key[2:]
+
+    def put(self, text: Optional[str]) -> Optional[str]:
+        """ Store `text` and return its key. `None` is passed through unchanged. """
+        if text is None:
+            return None
+        data = text.encode('utf-8')
+        key = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            self.raw_bytes += len(data)
+            if key in self._known:
+                self.dedup_hits += 1
+                return key
+            compressed = zlib.compress(data, self._compress_level)
+            if self._spill_dir is None:
+                self._blobs[key] = compressed
+            else:
+                path = self._blob_path(key)
+                if not path.exists():
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    path.write_bytes(compressed)
+            self._known.add(key)
+            self.stored_bytes += len(compressed)
+        return key
+
+    def get(self, key: Optional[str]) -> Optional[str]:
+        """ Load and decompress the string stored under `key`. """
+        if key is None:
+            return None
+        if self._spill_dir is None:
+            compressed = self._blobs[key]
+        else:
+            compressed = self._blob_path(key).read_bytes()
+        return zlib.decompress(compressed).decode('utf-8')
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._known
+
+    def __len__(self) -> int:
+        return len(self._known)
+
+    def stats(self) -> dict:
+        return {
+            'num_blobs': len(self._known),
+            'raw_bytes': self.raw_bytes,
+            'stored_bytes': self.stored_bytes,
+            'dedup_hits': self.dedup_hits,
+            'spill_dir': str(self._spill_dir) if self._spill_dir else None,
+        }
@@ -0,0 +1,272 @@
+import base64
+from contextlib import contextmanager
+import hashlib
+import json
+import os
+from pathlib import Path
+import subprocess
+import threading
+from typing import Literal, Optional
+import zlib
+
+from langchain_core.messages import AIMessage, BaseMessage
+
+from ReChisel import llms, utils
+from ReChisel.utils import CommandExecResult
+
+
+CASSETTE_VERSION = 1
+
+# Build caches and editor state; never part of a command's inputs or outputs.
+_IGNORED_DIRS = {'target', 'project', '.bsp', '.bloop', '.metals', '.idea'}
+# Previous outputs are removed before every verification; they are outputs, not inputs.
+_OUTPUT_ONLY_DIRS = {'generated'}
+# Exceptions `run_command` may raise that the verifier handles; they are recorded and re-raised.
+_REPLAYABLE_EXCEPTIONS = {'FileNotFoundError', 'TimeoutExpired'}
+
+
+class CassetteMiss(KeyError, llms.NonRetryableError):
+    """Raised in replay mode for a command or LLM call that the cassette has no recording of."""
+    pass
+
+
+def _walk_files(root: Path, skip_dirs: set) -> dict[str, Path]:
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in skip_dirs)
+        for name in filenames:
+            path = Path(dirpath) / name
+            files[path.relative_to(root).as_posix()] = path
+    return files
+
+
+def workingdir_hash(workingdir: Optional[str | Path]) -> str:
+    """ Hash of the relative paths and contents of the input files in `workingdir`. """
+    h = hashlib.sha256()
+    if workingdir is not None and Path(workingdir).is_dir():
+        for rel, path in sorted(_walk_files(Path(workingdir), _IGNORED_DIRS | _OUTPUT_ONLY_DIRS).items()):
+            h.update(rel.encode('utf-8') + b'\0')
+            h.update(hashlib.sha256(path.read_bytes()).digest())
+    return h.hexdigest()
+
+
+def _snapshot(workingdir: Optional[str | Path]) -> dict[str, tuple]:
+    if workingdir is None or not Path(workingdir).is_dir():
+        return {}
+    return {
+        rel: (path.stat().st_mtime_ns, path.stat().st_size)
+        for rel, path in _walk_files(Path(workingdir), _IGNORED_DIRS).items()
+    }
+
+
+def _encode(data: bytes) -> str:
+    return base64.b64encode(zlib.compress(data)).decode('ascii')
+
+
+def _decode(data: str) -> bytes:
+    return zlib.decompress(base64.b64decode(data))
+
+
+def _command_key(command, workingdir) -> str:
+    command = command.split() if isinstance(command, str) else [str(c) for c in command]
+    return hashlib.sha256(json.dumps([command, workingdir_hash(workingdir)]).encode('utf-8')).hexdigest()
+
+
+def _messages_hash(messages: list[BaseMessage]) -> str:
+    return hashlib.sha256(
+        json.dumps([(m.type, m.content) for m in messages]).encode('utf-8')
+    ).hexdigest()
+
+
+class _CassetteClient:
+    """
+    Stands in for the chat model of `model`. Only `invoke` is provided, which is all
+    `llm_call_with_retry` uses.
+    """
+
+    def __init__(self, cassette: 'Cassette', model: str, real_client=None):
+        self._cassette = cassette
+        self._model = model
+        self._real_client = real_client
+
+    def invoke(self, messages: list[BaseMessage]) -> AIMessage:
+        if self._real_client is not None:
+            response = self._real_client.invoke(messages)
+            self._cassette._record_llm(self._model, messages, response)
+            return response
+        return self._cassette._replay_llm(self._model, messages)
+
+
+class Cassette:
+    """
+    Records every `run_command` invocation and LLM response of a run, and replays them later
+    without sbt, iverilog or LLM access.
+
+    Commands are keyed by the command line and a hash of the input files in its working
+    directory, so a replay serves the recorded return code, output and generated files for
+    the same code. Repeated identical commands are served in recording order. An LLM call is
+    served the first unused recording of its model with the same request messages, so that
+    concurrent calls (background summaries, beam search, speculative correction) get their own
+    responses; without `strict_llm`, the first unused recording of the model is served if no
+    messages match.
+    """
+
+    def __init__(
+            self, path: str | Path,
+            mode: Literal['record', 'replay'],
+            *,
+            strict_llm: bool = False,
+            verbose: bool = False
+    ):
+        if mode not in {'record', 'replay'}:
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self._strict_llm = strict_llm
+        self._verbose = verbose
+        self._lock = threading.Lock()
+
+        self._commands: dict[str, list[dict]] = {}
+        self._llm_calls: dict[str, list[dict]] = {}
+        if mode == 'replay':
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+            if data.get('version') != CASSETTE_VERSION:
+                raise ValueError(f"Unsupported cassette version: {data.get('version')}")
+            self._commands = data['commands']
+            self._llm_calls = data['llm_calls']
+        # Next recording to serve, per command key / model.
+        self._command_pos: dict[str, int] = {}
+        self._llm_used: dict[str, set[int]] = {}
+        self.stats = {'commands': 0, 'llm_calls': 0, 'misses': 0}
+
+    def _log(self, message: str):
+        if self._verbose:
+            print(f"[CASSETTE] {message}")
+
+    # Commands
+
+    def _run_command_hook(self, run, command, **kwargs) -> CommandExecResult:
+        workingdir = kwargs.get('workingdir')
+        key = _command_key(command, workingdir)
+        if self.mode == 'record':
+            return self._record_command(run, key, command, **kwargs)
+        return self._replay_command(key, command, workingdir)
+
+    def _record_command(self, run, key: str, command, **kwargs) -> CommandExecResult:
+        workingdir = kwargs.get('workingdir')
+        before = _snapshot(workingdir)
+        entry = {'command': command if isinstance(command, str) else [str(c) for c in command]}
+        try:
+            result = run(command, **kwargs)
+        except (FileNotFoundError, subprocess.TimeoutExpired) as e:
+            entry['exception'] = type(e).__name__
+            with self._lock:
+                self._commands.setdefault(key, []).append(entry)
+                self.stats['commands'] += 1
+            raise
+        after = _snapshot(workingdir)
+        entry.update({
+            'return_code': result.return_code,
+            'stdout': result.stdout,
+            'stderr': result.stderr,
+            'outputs': {
+                rel: _encode((Path(workingdir) / rel).read_bytes())
+                for rel in sorted(after) if before.get(rel) != after[rel]
+            },
+        })
+        with self._lock:
+            self._commands.setdefault(key, []).append(entry)
+            self.stats['commands'] += 1
+        self._log(f"Recorded `{entry['command']}` ({len(entry['outputs'])} output files)")
+        return result
+
+    def _next(self, recordings: dict, positions: dict, key: str) -> Optional[dict]:
+        entries = recordings.get(key)
+        if not entries:
+            return None
+        with self._lock:
+            pos = positions.get(key, 0)
+            # Past the end, keep serving the last recording.
+            positions[key] = pos + 1
+        return entries[min(pos, len(entries) - 1)]
+
+    def _replay_command(self, key: str, command, workingdir) -> CommandExecResult:
+        entry = self._next(self._commands, self._command_pos, key)
+        if entry is None:
+            with self._lock:
+                self.stats['misses'] += 1
+            raise CassetteMiss(f"No recording of `{command}` with these input files in {workingdir}.")
+        with self._lock:
+            self.stats['commands'] += 1
+        if 'exception' in entry:
+            if entry['exception'] == 'TimeoutExpired':
+                raise subprocess.TimeoutExpired(command, timeout=None)
+            raise FileNotFoundError(f"Recorded: {entry['command']} could not be executed.")
+        for rel, data in entry['outputs'].items():
+            target = Path(workingdir) / rel
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(_decode(data))
+        self._log(f"Replayed `{entry['command']}`")
+        return CommandExecResult(entry['return_code'], entry['stdout'], entry['stderr'])
+
+    # LLM calls
+
+    def _client(self, model: str, **kwargs):
+        if self.mode == 'record':
+            return _CassetteClient(self, model, llms._create_llm_client(model, **kwargs))
+        return _CassetteClient(self, model)
+
+    def _record_llm(self, model: str, messages: list[BaseMessage], response: AIMessage):
+        entry = {
+            'messages_hash': _messages_hash(messages),
+            'content': response.content,
+            'usage_metadata': dict(response.usage_metadata) if response.usage_metadata else None,
+            'response_metadata': response.response_metadata,
+        }
+        with self._lock:
+            self._llm_calls.setdefault(model, []).append(entry)
+            self.stats['llm_calls'] += 1
+
+    def _replay_llm(self, model: str, messages: list[BaseMessage]) -> AIMessage:
+        messages_hash = _messages_hash(messages)
+        entries = self._llm_calls.get(model, [])
+        with self._lock:
+            used = self._llm_used.setdefault(model, set())
+            unused = [i for i in range(len(entries)) if i not in used]
+            pos = next((i for i in unused if entries[i]['messages_hash'] == messages_hash), None)
+            if pos is None and not self._strict_llm and unused:
+                pos = unused[0]
+            if pos is None:
+                self.stats['misses'] += 1
+                raise CassetteMiss(f"No unused recorded response of model {model} for these messages.")
+            # Only a served recording is used up.
+            used.add(pos)
+            self.stats['llm_calls'] += 1
+        entry = entries[pos]
+        return AIMessage(
+            entry['content'],
+            usage_metadata=entry['usage_metadata'],
+            response_metadata=entry['response_metadata'],
+        )
+
+    # Activation
+
+    @contextmanager
+    def activate(self):
+        """ Route `run_command` and `get_llm_client` through the cassette; save it on exit when recording. """
+        utils.set_command_hook(self._run_command_hook)
+        llms.set_client_override(self._client)
+        try:
+            yield self
+        finally:
+            utils.set_command_hook(None)
+            llms.set_client_override(None)
+            if self.mode == 'record':
+                self.save()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            data = {'version': CASSETTE_VERSION, 'commands': self._commands, 'llm_calls': self._llm_calls}
+        self.path.write_text(json.dumps(data), encoding='utf-8')
+        self._log(f"Cassette saved to {self.path}")
@@ -1,6 +1,8 @@
 
 from functools import cached_property
-import re
+
+from ReChisel.scala_extract import CodeBlock, extract_code_blocks, strip_scala
+from ReChisel.toolchains import CHISEL3, ChiselToolchain
 
 
 class ChiselCode:
@@ -20,51 +22,23 @@ class ChiselCode:
     def top_module_name(self) -> str:
         return self._top_module_name
 
+    @cached_property
+    def code_blocks(self) -> list[CodeBlock]:
+        # Raises `CodeExtractionError` (a `ValueError`) if no Scala code block is found.
+        return extract_code_blocks(self._llm_response)
+
     @cached_property
     def raw(self) -> str:
-        
-        chunks = re.findall(r'```scala', self._llm_response)
-        # Raise error if no scala code block is found.
-        if len(chunks) < 1:
-            raise ValueError(f"Error: Scala code block is not found.")
-        
-        code_blocks = list()
-        for match in re.finditer(r'```scala', self._llm_response):
-            start = match.end()
-            end = self._llm_response.find('```', start)
-            if end == -1:
-                raise ValueError(f"Error: Scala code block is not closed.")
-            code_blocks.append(self._llm_response[start:end])
-        
-        code = "\n".join(code_blocks)
-        return code
+        return "\n".join(block.code for block in self.code_blocks)
     
     @cached_property
     def raw_stripped(self) -> str:
-        code = self.raw
-        code = re.sub(r'^\s*import.*\n', '', code, flags=re.MULTILINE)
-        code = re.sub(r'^\s*package.*\n', '', code, flags=re.MULTILINE)
-        code = re.sub(r'object\s+\w+\s+extends\s+App\s*{.*}', '', code, flags=re.DOTALL)
-        code = code.strip()
-        return code
+        return strip_scala(self.raw)
     
     @cached_property
     def decorated(self) -> str:
-        return (
-            f"package {self._top_module_name}\n\n"
-            "import chisel3._\n"
-            "import chisel3.util._\n\n"
-            "import chisel3.stage.ChiselStage\n\n"
-            #
-            f"{self.raw_stripped}\n\n"
-            #
-            "object Main extends App {\n"
-            "    (new ChiselStage).emitVerilog(\n"
-            f"      new {self._top_module_name},\n"
-            "      Array(\n"
-            "        \"--target-dir\", \"generated\",\n"
-            "        \"--emission-options=disableMemRandomization,disableRegisterRandomization\",\n"
-            "      )\n"
-            "    )\n"
-            "}\n"
-        )
+        return self.decorated_for(CHISEL3)
+
+    def decorated_for(self, toolchain: ChiselToolchain) -> str:
+        """ The code wrapped into a `Main.scala` that elaborates the top module with `toolchain`. """
+        return toolchain.decorate(self.raw_stripped, self._top_module_name)
@@ -0,0 +1,224 @@
+from dataclasses import dataclass
+import fcntl
+import json
+import os
+from pathlib import Path
+import re
+import time
+from typing import Optional
+
+from ReChisel.verifier import VerifyResult
+
+
+# sbt: "[error] src/main/scala/Main.scala:14:29: High index 8 is out of range [0, 7]"
+_SBT_LOCATED_ERROR = re.compile(r'^\[error\]\s+\S+\.scala:\d+(?::\d+)?:\s*(.+)$', flags=re.MULTILINE)
+# sbt, errors without a source location, e.g. exceptions thrown during elaboration.
+_SBT_EXCEPTION = re.compile(r'^\[error\]\s+(?:\([^)]*\)\s+)?([\w.$]+(?:Exception|Error)\b.*)$', flags=re.MULTILINE)
+# Summaries that every failure prints; they carry no information about the error.
+_SBT_GENERIC = re.compile(r'Fatal errors during hardware elaboration|Compilation failed|Nonzero exit code')
+# Icarus Verilog: "tb.sv:76: error: port ``zero'' is not a port of top_module1."
+_IV_ERROR = re.compile(r'^\S+:\d+:\s*(?:error|syntax error):?\s*(.*)$', flags=re.MULTILINE)
+
+_MASKS = [
+    (re.compile(r"``[^']*''|`[^`]*`|'[^'\s]*'|\"[^\"]*\""), '<ID>'),
+    # Names that follow a kind of symbol.
+    (re.compile(r'\b(value|variable|method|object|package|class|trait|parameter|signal|wire)\s+(?!of\b|is\b|in\b)[A-Za-z_][\w$]*'), r'\1 <ID>'),
+    (re.compile(r'\b(not found: \w+|port of|module type:|identifier:)\s+[A-Za-z_][\w$]*'), r'\1 <ID>'),
+    # Hardware references in Chisel messages, e.g. "(TopModule.io.out: IO[UInt<8>])".
+    (re.compile(r'\b[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)+(?=:\s)'), '<ID>'),
+    (re.compile(r"\b0x[0-9a-fA-F]+\b|\b\d+(?:'[bdhoBDHO][0-9a-fA-F_xzXZ]+)?\b"), '<N>'),
+    (re.compile(r'\s+'), ' '),
+]
+# At most this many distinct error templates make up a signature.
+_MAX_TEMPLATES = 5
+
+
+def mask_error_message(message: str) -> str:
+    """ The template of an error message: identifiers, quoted names and numbers masked. """
+    for pattern, replacement in _MASKS:
+        message = pattern.sub(replacement, message)
+    return message.strip().rstrip('.')
+
+
+def error_signature(verify_result: VerifyResult) -> Optional[str]:
+    """
+    Normalized signature of an sbt or iverilog failure: the failing stage and the sorted distinct
+    templates of its error messages. None for functional failures or if no error message is found.
+    """
+    if not verify_result.chisel_compile_to_verilog_success:
+        stage, output = 'sbt', verify_result.sbt_cmd_exec_result
+        pattern_matches = lambda text: _SBT_LOCATED_ERROR.findall(text) or [
+            m for m in _SBT_EXCEPTION.findall(text) if not _SBT_GENERIC.search(m)
+        ]
+    elif not verify_result.verilog_compile_success:
+        stage, output = 'iverilog', verify_result.iv_cmd_exec_result
+        pattern_matches = _IV_ERROR.findall
+    else:
+        return None
+    if output is None:
+        return None
+    templates = sorted({mask_error_message(m) for m in pattern_matches(output.stdout + "\n" + output.stderr)} - {''})
+    if not templates:
+        return None
+    return f"{stage}: " + " | ".join(templates[:_MAX_TEMPLATES])
+
+
+def _templates(signature: str) -> set[str]:
+    return set(signature.split(': ', 1)[1].split(' | '))
+
+
+def is_resolved(signature: str, verify_result: VerifyResult) -> bool:
+    """ Whether none of the errors of `signature` occur in `verify_result` any more. """
+    stage = signature.split(':')[0]
+    if verify_result.chisel_compile_to_verilog_success and (stage == 'sbt' or verify_result.verilog_compile_success):
+        # Got past the failing stage.
+        return True
+    new_signature = error_signature(verify_result)
+    if new_signature is None or new_signature.split(':')[0] != stage:
+        # Failed at an earlier stage, or with errors that cannot be compared.
+        return False
+    return not (_templates(signature) & _templates(new_signature))
+
+
+@dataclass
+class FixMemoryStats:
+    # Failures looked up, of which answered from memory; outcomes of the served guidance.
+    lookups: int = 0
+    hits: int = 0
+    served_resolved: int = 0
+    served_unresolved: int = 0
+    # Reviewer responses stored after they led to a successful correction.
+    learned: int = 0
+    evicted: int = 0
+
+    def to_dict(self) -> dict:
+        served = self.served_resolved + self.served_unresolved
+        return {
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.lookups if self.lookups else None,
+            'served_resolved': self.served_resolved,
+            'served_unresolved': self.served_unresolved,
+            'served_success_rate': self.served_resolved / served if served else None,
+            'learned': self.learned,
+            'evicted': self.evicted,
+            # Each hit replaces one reviewer call.
+            'llm_calls_saved': self.hits,
+        }
+
+
+class FixMemory:
+    """
+    Reviewer guidance that fixed sbt/iverilog errors before, keyed by error signature and kept
+    in a JSON file shared by all runs. Updates are serialized with a lock on a separate lock
+    file and replace the JSON file atomically; lookups only read it.
+
+    Guidance is stored once a reviewer response for a signature led to a correction that resolved
+    its errors, and is served instead of the reviewer once it did so `min_support` times. Served
+    guidance is evicted when its success rate over at least `min_trials` uses drops below
+    `min_success_rate`; the reviewer then relearns the signature.
+    """
+
+    def __init__(
+            self, path: str | Path, *,
+            min_support: int = 2,
+            min_trials: int = 3,
+            min_success_rate: float = 0.5,
+            verbose: bool = False
+    ):
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock_path = self._path.with_name(self._path.name + '.lock')
+        self._min_support = min_support
+        self._min_trials = min_trials
+        self._min_success_rate = min_success_rate
+        self._verbose = verbose
+        self.stats = FixMemoryStats()
+
+    def _log(self, message: str):
+        if self._verbose:
+            print(f"[FIX MEMORY] {message}")
+
+    def _load(self) -> dict:
+        try:
+            content = self._path.read_text(encoding='utf-8')
+        except FileNotFoundError:
+            return {}
+        return json.loads(content) if content.strip() else {}
+
+    def _update(self, fn):
+        with self._lock_path.open('a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            entries = self._load()
+            result = fn(entries)
+            # Readers see either the old or the new file, never a partly written one.
+            tmp_path = self._path.with_name(f"{self._path.name}.{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps(entries, indent=1, ensure_ascii=False), encoding='utf-8')
+            os.replace(tmp_path, self._path)
+            return result
+
+    def entries(self) -> dict:
+        with self._lock_path.open('a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH)
+            return self._load()
+
+    def lookup(self, signature: Optional[str]) -> Optional[str]:
+        """ Stored guidance for `signature` if it is confident, otherwise None. """
+        if signature is None:
+            return None
+        self.stats.lookups += 1
+        entry = self.entries().get(signature)
+        if entry is None or entry['support'] < self._min_support:
+            self._log(f"Miss: {signature}")
+            return None
+        self.stats.hits += 1
+        self._log(f"Hit ({entry['support']} fixes, {entry['served_resolved']}/{entry['served']} served): {signature}")
+        return entry['guidance']
+
+    def record_outcome(self, signature: Optional[str], guidance: str, served: bool, verify_result: VerifyResult) -> bool:
+        """
+        Record whether the correction that followed `guidance` for `signature` resolved its errors,
+        given the verification result of the corrected code. Returns whether it did.
+        """
+        if signature is None:
+            return False
+        resolved = is_resolved(signature, verify_result)
+
+        def _record(entries):
+            entry = entries.get(signature)
+            if served:
+                if entry is None or entry['guidance'] != guidance:
+                    # Evicted or replaced by another run in the meantime.
+                    return
+                entry['served'] += 1
+                entry['served_resolved'] += int(resolved)
+                entry['last_used'] = time.time()
+                if entry['served'] >= self._min_trials and entry['served_resolved'] / entry['served'] < self._min_success_rate:
+                    del entries[signature]
+                    self.stats.evicted += 1
+                    self._log(f"Evicted guidance that stopped working: {signature}")
+            elif resolved:
+                if entry is None or entry['support'] < self._min_support:
+                    # Not yet confident: the latest guidance that worked is kept. Support counts
+                    # the fixes by this guidance text only, so it restarts when the text changes.
+                    same = entry is not None and entry['guidance'] == guidance
+                    entries[signature] = {
+                        'guidance': guidance,
+                        'support': (entry['support'] if same else 0) + 1,
+                        'served': 0,
+                        'served_resolved': 0,
+                        'created': entry['created'] if same else time.time(),
+                        'last_used': time.time(),
+                    }
+                else:
+                    entry['support'] += 1
+                self.stats.learned += 1
+                self._log(f"Learned guidance: {signature}")
+
+        if served:
+            if resolved:
+                self.stats.served_resolved += 1
+            else:
+                self.stats.served_unresolved += 1
+        self._update(_record)
+        return resolved
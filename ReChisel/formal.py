@@ -0,0 +1,103 @@
+from dataclasses import dataclass
+from pathlib import Path
+import re
+import subprocess
+from typing import Literal, Optional
+
+from ReChisel.utils import CommandExecResult, run_command
+
+
+# Any edge-triggered process makes a design sequential.
+_SEQUENTIAL_PATTERN = re.compile(r'\balways_ff\b|\balways\s*@\s*\(\s*(posedge|negedge)\b')
+_MODULE_PATTERN = re.compile(r'^\s*module\s+(\w+)', flags=re.MULTILINE)
+# Rows of the `sat -show-inputs -show-outputs` table: `[time] \name  dec  hex  bin`
+_SAT_TABLE_ROW = re.compile(r'^\s*(?:\w+\s+)?\\(\S+)\s+(\S+)\s+(\S+)\s+([01xz]+)\s*$')
+
+
+@dataclass
+class EquivalenceCheckResult:
+    status: Literal['equivalent', 'not_equivalent', 'timeout', 'error']
+    cmd_exec_result: Optional[CommandExecResult] = None
+    # Port name -> Verilog literal, for the inputs and both sets of outputs.
+    counterexample: Optional[dict] = None
+
+    @property
+    def is_conclusive(self):
+        return self.status in {'equivalent', 'not_equivalent'}
+
+
+def is_combinational(verilog_code: str) -> bool:
+    return not _SEQUENTIAL_PATTERN.search(verilog_code)
+
+
+def module_names(verilog_code: str) -> list[str]:
+    return _MODULE_PATTERN.findall(verilog_code)
+
+
+def _parse_counterexample(sat_output: str) -> dict:
+    counterexample = {'inputs': {}, 'reference_outputs': {}, 'generated_outputs': {}}
+    # `miter -make_outputs` names ports `in_<port>`, `gold_<port>` and `gate_<port>`.
+    prefixes = {'in_': 'inputs', 'gold_': 'reference_outputs', 'gate_': 'generated_outputs'}
+    for line in sat_output.splitlines():
+        match = _SAT_TABLE_ROW.match(line)
+        if not match:
+            continue
+        name, _, hex_value, bin_value = match.groups()
+        for prefix, key in prefixes.items():
+            if name.startswith(prefix):
+                counterexample[key][name[len(prefix):]] = f"{len(bin_value)}'h{hex_value}"
+                break
+    return counterexample
+
+
+def yosys_equivalence_check(
+        reference_code: str,
+        reference_top: str,
+        generated_code: str,
+        generated_top: str,
+        working_dir: str | Path,
+        *,
+        timeout: int = 60,
+) -> EquivalenceCheckResult:
+    """
+    Prove that the generated module is equivalent to the reference module with a Yosys
+    miter and SAT check. Only meaningful for combinational designs. The ports of both
+    modules must match by name and width, otherwise Yosys reports an error.
+    """
+    working_dir = Path(working_dir)
+    working_dir.mkdir(parents=True, exist_ok=True)
+    (working_dir / 'ref.sv').write_text(reference_code, encoding='utf-8')
+    (working_dir / 'top.v').write_text(generated_code, encoding='utf-8')
+    script = (
+        "read_verilog -sv ref.sv\n"
+        "read_verilog -sv top.v\n"
+        "proc\n"
+        "opt_clean\n"
+        f"miter -equiv -flatten -make_outputs -ignore_gold_x {reference_top} {generated_top} miter\n"
+        "hierarchy -top miter\n"
+        "opt -fast\n"
+        f"sat -verify -prove trigger 0 -show-inputs -show-outputs -timeout {timeout} miter\n"
+    )
+    (working_dir / 'equiv.ys').write_text(script, encoding='utf-8')
+
+    try:
+        # Leave some slack over the solver timeout for parsing and elaboration.
+        result = run_command(['yosys', '-s', 'equiv.ys'], workingdir=working_dir, timeout=timeout + 30)
+    except subprocess.TimeoutExpired:
+        return EquivalenceCheckResult(status='timeout')
+    except FileNotFoundError:
+        return EquivalenceCheckResult(status='error')
+
+    output = result.stdout + result.stderr
+    if result.is_ok:
+        return EquivalenceCheckResult(status='equivalent', cmd_exec_result=result)
+    if 'TIMEOUT' in output:
+        return EquivalenceCheckResult(status='timeout', cmd_exec_result=result)
+    # `sat -verify` fails with `SAT proof finished - model found: FAIL!` and prints the model.
+    if 'model found' in output:
+        return EquivalenceCheckResult(
+            status='not_equivalent',
+            cmd_exec_result=result,
+            counterexample=_parse_counterexample(result.stdout),
+        )
+    return EquivalenceCheckResult(status='error', cmd_exec_result=result)
@@ -1,7 +1,9 @@
+import re
 from typing import Optional
 from ReChisel.chisel_code import ChiselCode
 from ReChisel.llms import get_llm_client, llm_call_with_retry
 from ReChisel.testcase import Testcase
+from ReChisel.usage import UsageTracker
 
 
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, BaseMessage
@@ -9,6 +11,28 @@ from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, Base
 from ReChisel.verifier import VerifyResult, collect_verify_feedback
 
 
+_DIAGNOSIS_HEADING = re.compile(r'^#+[ \t]*Diagnosis[ \t]*:?[ \t]*$', flags=re.MULTILINE | re.IGNORECASE)
+_CORRECTED_CODE_HEADING = re.compile(r'^#+[ \t]*Corrected Code[ \t]*:?[ \t]*$', flags=re.MULTILINE | re.IGNORECASE)
+_CODE_FENCE = re.compile(r'^[ \t]*```[ \t]*(?:scala|chisel)\b', flags=re.MULTILINE | re.IGNORECASE)
+
+
+def split_fused_response(response: AIMessage) -> tuple[AIMessage, AIMessage]:
+    """
+    Split a fused reflect-and-correct response into the diagnosis and the corrected code part,
+    at the `## Corrected Code` heading or, failing that, at the last Scala code block.
+    """
+    content = response.content
+    heading = _CORRECTED_CODE_HEADING.search(content)
+    if heading is not None:
+        diagnosis, code = content[:heading.start()], content[heading.end():]
+    else:
+        fences = list(_CODE_FENCE.finditer(content))
+        split = fences[-1].start() if fences else len(content)
+        diagnosis, code = content[:split], content[split:] or content
+    diagnosis = _DIAGNOSIS_HEADING.sub('', diagnosis, count=1).strip()
+    return AIMessage(diagnosis), AIMessage(code)
+
+
 class Generator:
     def __init__(
             self, *, 
@@ -17,6 +41,8 @@ class Generator:
             syntax_correction_system_prompt: str,
             functionality_correction_system_prompt: str,
             correction_model: str,
+            fused_system_prompt_template: Optional[str] = None,
+            usage_tracker: Optional[UsageTracker] = None,
             verbose: bool = False
     ):
         self._init_gen_system_prompt = init_gen_system_prompt
@@ -25,7 +51,10 @@ class Generator:
         self._syntax_correction_system_prompt = syntax_correction_system_prompt
         self._functionality_correction_system_prompt = functionality_correction_system_prompt
         self._correction_model = correction_model
+        # Combines a reflection and a correction system prompt, see `fused_correction_generation`.
+        self._fused_system_prompt_template = fused_system_prompt_template
 
+        self._usage_tracker = usage_tracker
         self._verbose = verbose
 
     def _log(self, message: str):
@@ -33,10 +62,15 @@ class Generator:
             # TODO: Use `logging` module instead of print
             print(f"[GENERATOR] {message}")
 
-    def testcase_prepare(self, testcase: Testcase, top_module_name: str):
+    def testcase_prepare(
+            self, testcase: Testcase, top_module_name: str, *,
+            few_shot_examples: Optional[HumanMessage] = None
+    ):
         self._log("Preparing testcase for code generation.")
         self._testcase = testcase
         self._top_module_name = top_module_name
+        # Solved examples of similar problems, shown before the specification in the initial generation.
+        self._few_shot_examples = few_shot_examples
         self._log("Testcase:" + str(testcase))
         self._log("Top module name: " + top_module_name)
 
@@ -49,13 +83,15 @@ class Generator:
 
     def initial_chisel_generation(self) -> AIMessage:
         self._log("Preparing messages for initial Chisel code generation.")
-        messages = [
-            SystemMessage(self._init_gen_system_prompt),
-            HumanMessage(self._testcase.specification)
-        ]
+        messages = [SystemMessage(self._init_gen_system_prompt)]
+        if self._few_shot_examples is not None:
+            messages.append(self._few_shot_examples)
+        messages.append(HumanMessage(self._testcase.specification))
         self._log(f"Calling LLM for initial Chisel code generation with model {self._init_gen_model}.")
         client = get_llm_client(self._init_gen_model)
-        response = llm_call_with_retry(client, messages)
+        response = llm_call_with_retry(
+            client, messages, usage_tracker=self._usage_tracker, role='generate', model=self._init_gen_model
+        )
         self._log("Initial Chisel code generation response received.")
         return response
 
@@ -97,6 +133,69 @@ class Generator:
         
         self._log(f"Calling LLM for correction generation with model {self._correction_model}.")
         client = get_llm_client(self._correction_model)
-        response = llm_call_with_retry(client, messages)
+        response = llm_call_with_retry(
+            client, messages, usage_tracker=self._usage_tracker, role='correct', model=self._correction_model
+        )
         self._log("Correction generation response received.")
         return response
+
+    def direct_correction_generation(
+            self,
+            verify_result: VerifyResult,
+            chisel_code: ChiselCode,
+            in_context_history: Optional[HumanMessage] = None
+    ) -> AIMessage:
+        """ Correct from the specification and verification feedback alone, without a reviewer response. """
+        self._log("Preparing messages for direct correction generation.")
+        messages = [
+            self._correction_system_prompt(verify_result),
+            HumanMessage(self._testcase.specification),
+        ]
+        if in_context_history is not None:
+            messages.append(in_context_history)
+        messages.append(collect_verify_feedback(verify_result, chisel_code))
+
+        self._log(f"Calling LLM for direct correction generation with model {self._correction_model}.")
+        client = get_llm_client(self._correction_model)
+        response = llm_call_with_retry(
+            client, messages, usage_tracker=self._usage_tracker, role='speculative', model=self._correction_model
+        )
+        self._log("Direct correction generation response received.")
+        return response
+
+    def fused_correction_generation(
+            self,
+            reflection_system_prompt: SystemMessage,
+            verify_result: VerifyResult,
+            chisel_code: ChiselCode,
+            in_context_history: Optional[HumanMessage] = None
+    ) -> tuple[AIMessage, AIMessage]:
+        """
+        Diagnose and correct in a single LLM call, with a system prompt combining the reviewer's
+        `reflection_system_prompt` and the correction system prompt. Returns the diagnosis, which
+        takes the place of the reviewer response, and the part of the response with the corrected code.
+        """
+        if self._fused_system_prompt_template is None:
+            raise ValueError("Fused correction requires `fused_system_prompt_template`.")
+
+        self._log("Preparing messages for fused reflection and correction.")
+        system_prompt = (
+            self._fused_system_prompt_template
+            .replace('{reflection_prompt}', reflection_system_prompt.content.strip())
+            .replace('{correction_prompt}', self._correction_system_prompt(verify_result).content.strip())
+        )
+        messages = [
+            SystemMessage(system_prompt),
+            HumanMessage(self._testcase.specification),
+        ]
+        if in_context_history is not None:
+            messages.append(in_context_history)
+        messages.append(collect_verify_feedback(verify_result, chisel_code))
+
+        self._log(f"Calling LLM for fused reflection and correction with model {self._correction_model}.")
+        client = get_llm_client(self._correction_model)
+        response = llm_call_with_retry(
+            client, messages, usage_tracker=self._usage_tracker, role='fused', model=self._correction_model
+        )
+        self._log("Fused reflection and correction response received.")
+        return split_fused_response(response)
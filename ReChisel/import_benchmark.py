@@ -0,0 +1,91 @@
+import argparse
+from datetime import datetime, timezone
+import json
+from pathlib import Path
+import re
+import subprocess
+import sys
+
+
+# Entry points whose import cost we track.
+DEFAULT_MODULES = [
+    'ReChisel.verifier',
+    'ReChisel.tracing',
+    'ReChisel.generator',
+    'ReChisel.llms',
+]
+
+# `import time: self [us] | cumulative | imported package`
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$')
+
+
+def measure_import(module: str, *, python: str = sys.executable) -> dict:
+    """
+    Import `module` in a fresh interpreter with `-X importtime` and summarize the report.
+    Returns the total cumulative time and the heaviest packages by self time, in microseconds.
+    """
+    proc = subprocess.run(
+        [python, '-X', 'importtime', '-c', f'import {module}'],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        encoding='utf-8',
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Failed to import {module}:\n{proc.stderr}")
+
+    total_us = 0
+    # Self time aggregated by root package, e.g. all `langchain_core.*` modules together.
+    by_package = {}
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative, indent, name = match.groups()
+        # Top-level imports are those with a single space of indentation.
+        if len(indent) == 1:
+            total_us += int(cumulative)
+        package = name.split('.')[0]
+        by_package[package] = by_package.get(package, 0) + int(self_us)
+
+    return {
+        'module': module,
+        'total_us': total_us,
+        'heaviest': sorted(by_package.items(), key=lambda kv: kv[1], reverse=True)[:10],
+        'loads_llm_providers': any(
+            package in {'langchain_openai', 'langchain_aws', 'botocore'} for package in by_package
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure ReChisel import (startup) cost with `python -X importtime`")
+    parser.add_argument('modules', type=str, nargs='*', default=DEFAULT_MODULES, help='Modules to import')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='Repeat each measurement and keep the fastest')
+    parser.add_argument('--history', type=str, default=None, help='Append the report to this JSONL file to track import cost over time')
+    args = parser.parse_args()
+
+    report = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': sys.version.split()[0],
+        'results': [],
+    }
+    for module in args.modules:
+        best = min((measure_import(module) for _ in range(args.repeat)), key=lambda r: r['total_us'])
+        report['results'].append(best)
+        print(
+            f"{module:<24} {best['total_us'] / 1000:9.1f} ms"
+            f"{'  (loads LLM providers)' if best['loads_llm_providers'] else ''}"
+        )
+        for name, us in best['heaviest'][:5]:
+            print(f"    {name:<40} {us / 1000:9.1f} ms")
+
+    if args.history:
+        history = Path(args.history)
+        history.parent.mkdir(parents=True, exist_ok=True)
+        with history.open('a', encoding='utf-8') as f:
+            f.write(json.dumps(report) + '\n')
+        print(f"Report appended to {history}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,99 +1,152 @@
-from time import sleep
+from time import monotonic, sleep
 import os
-from typing import Literal, Optional, Union
+from typing import TYPE_CHECKING, Literal, Optional
 from functools import lru_cache
 
+from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, BaseMessage
-from langchain_openai import ChatOpenAI
-from langchain_aws import ChatBedrock
-import botocore.config
 
+if TYPE_CHECKING:
+    from ReChisel.usage import UsageTracker
 
-class BedrockClaudeClient(ChatBedrock):
-    
-    def __init__(
-        self, 
-        model: str,
-        *,
-        region: str = 'us-west-2',
-        streaming: bool = False, 
-        max_tokens: int = 8192,
-        temperature: Optional[float] = None,
-        top_k: Optional[int] = None,
-        top_p: Optional[float] = None,
-    ):
-        # model ID mapping
-        MODEL_ID_MAPPING = {
-            'claude-3.5-sonnet-v2': 'us.anthropic.claude-3-5-sonnet-20241022-v2:0',
-            'claude-3.5-haiku': 'us.anthropic.claude-3-5-haiku-20241022-v1:0',
-        }
+# Provider backends (`langchain_openai`, `langchain_aws`, `botocore`) are heavy to import.
+# They are imported on first use of a model from that provider, so that processes which
+# only use one provider, or only the verifier, do not pay for the others.
 
-        super().__init__(
-            model_id=MODEL_ID_MAPPING[model],
-            region=region,
-            streaming=streaming,
-            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-            max_tokens=max_tokens,
-            model_kwargs={
-                key: value for key, value in {
-                    'temperature': temperature,
-                    'top_k': top_k,
-                    'top_p': top_p
-                }.items() if value is not None
-            },
-            config=botocore.config.Config(
-                connect_timeout=30,
-                read_timeout=12000,
+
+@lru_cache()
+def _load_env():
+    # Load .env variables once, right before the first client is created.
+    from dotenv import load_dotenv
+    load_dotenv(verbose=True)
+
+
+@lru_cache()
+def _bedrock_claude_client_class() -> type:
+    from langchain_aws import ChatBedrock
+    import botocore.config
+
+    class BedrockClaudeClient(ChatBedrock):
+        
+        def __init__(
+            self, 
+            model: str,
+            *,
+            region: str = 'us-west-2',
+            streaming: bool = False, 
+            max_tokens: int = 8192,
+            temperature: Optional[float] = None,
+            top_k: Optional[int] = None,
+            top_p: Optional[float] = None,
+        ):
+            # model ID mapping
+            MODEL_ID_MAPPING = {
+                'claude-3.5-sonnet-v2': 'us.anthropic.claude-3-5-sonnet-20241022-v2:0',
+                'claude-3.5-haiku': 'us.anthropic.claude-3-5-haiku-20241022-v1:0',
+            }
+
+            super().__init__(
+                model_id=MODEL_ID_MAPPING[model],
+                region=region,
+                streaming=streaming,
+                aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+                aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+                max_tokens=max_tokens,
+                model_kwargs={
+                    key: value for key, value in {
+                        'temperature': temperature,
+                        'top_k': top_k,
+                        'top_p': top_p
+                    }.items() if value is not None
+                },
+                config=botocore.config.Config(
+                    connect_timeout=30,
+                    read_timeout=12000,
+                )
             )
-        )
 
+    return BedrockClaudeClient
+
+
+@lru_cache()
+def _openai_client_class() -> type:
+    from langchain_openai import ChatOpenAI
+
+    class OpenAIClient(ChatOpenAI):
+        """OpenAI client with simplified initialization."""
+        
+        def __init__(
+            self, 
+            model: str, 
+            *,
+            streaming: bool = False, 
+            temperature: Optional[float] = None,
+            top_p: Optional[float] = None,
+            max_tokens: Optional[int] = None,
+            api_key: Optional[str] = None,
+            base_url: Optional[str] = None,
+            proxy: Optional[str] = None
+        ):
+            super().__init__(
+                model=model,
+                streaming=streaming,
+                temperature=temperature,
+                top_p=top_p,
+                max_completion_tokens=max_tokens,
+                max_tokens=max_tokens,
+                api_key=api_key or os.getenv("OPENAI_API_KEY"),
+                base_url=base_url or os.getenv("OPENAI_BASE_URL"),
+                openai_proxy=proxy or os.getenv("OPENAI_PROXY"),
+            )
+
+    return OpenAIClient
 
-class OpenAIClient(ChatOpenAI):
-    """OpenAI client with simplified initialization."""
-    
-    def __init__(
-        self, 
-        model: str, 
-        *,
-        streaming: bool = False, 
-        temperature: Optional[float] = None,
-        top_p: Optional[float] = None,
-        max_tokens: Optional[int] = None,
-        api_key: Optional[str] = None,
-        base_url: Optional[str] = None,
-        proxy: Optional[str] = None
-    ):
-        super().__init__(
-            model=model,
-            streaming=streaming,
-            temperature=temperature,
-            top_p=top_p,
-            max_completion_tokens=max_tokens,
-            max_tokens=max_tokens,
-            api_key=api_key or os.getenv("OPENAI_API_KEY"),
-            base_url=base_url or os.getenv("OPENAI_BASE_URL"),
-            openai_proxy=proxy or os.getenv("OPENAI_PROXY"),
-        )
 
+_CLIENT_CLASS_LOADERS = {
+    'BedrockClaudeClient': _bedrock_claude_client_class,
+    'OpenAIClient': _openai_client_class,
+}
+
+
+def __getattr__(name: str):
+    # Keep `from ReChisel.llms import OpenAIClient` working without eager provider imports.
+    if name in _CLIENT_CLASS_LOADERS:
+        return _CLIENT_CLASS_LOADERS[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Installed by `ReChisel.cassette` to record or replay LLM responses; maps a model name to a client.
+_client_override = None
+
+
+def set_client_override(factory):
+    global _client_override
+    _client_override = factory
+
+
+def get_llm_client(model: str, **kwargs) -> BaseChatModel:
+    if _client_override is not None:
+        return _client_override(model, **kwargs)
+    return _create_llm_client(model, **kwargs)
 
 
 @lru_cache()
-def get_llm_client(model: str, **kwargs) -> Union[OpenAIClient, BedrockClaudeClient]:
+def _create_llm_client(model: str, **kwargs) -> BaseChatModel:
 
     MODEL_GROUPS = {
         'openai': ['gpt-4o', 'gpt-4o-mini', 'gpt-4.1'],
         'claude': ['claude-3.5-haiku', 'claude-3.5-sonnet-v2'],
     }
 
-    CLIENT_CLASSES = {
-        'openai': OpenAIClient,
-        'claude': BedrockClaudeClient,
+    CLIENT_CLASS_LOADERS = {
+        'openai': _openai_client_class,
+        'claude': _bedrock_claude_client_class,
     }
 
     for group, models in MODEL_GROUPS.items():
         if model in models:
-            client_class = CLIENT_CLASSES[group]
+            _load_env()
+            client_class = CLIENT_CLASS_LOADERS[group]()
             return client_class(model=model, **kwargs)
     
     raise ValueError(f"Model '{model}' is not supported.")
@@ -104,28 +157,52 @@ class LLMAPICallError(RuntimeError):
     pass
 
 
+class NonRetryableError(Exception):
+    """Raised by a client for failures that retrying cannot fix; `llm_call_with_retry` re-raises it."""
+    pass
+
+
 def llm_call_with_retry(
-    client: OpenAIClient | BedrockClaudeClient,
+    client: BaseChatModel,
     messages: list[HumanMessage | SystemMessage | AIMessage],
     *,
     retry: int = 16,
-    wait_after_retry: float = 0.2
+    wait_after_retry: float = 0.2,
+    usage_tracker: Optional['UsageTracker'] = None,
+    role: str = '',
+    model: str = '',
 ):
-    """Call LLM with retry logic on failure."""
+    """
+    Call LLM with retry logic on failure. With `usage_tracker`, budgets are checked before
+    the call (raising `BudgetExceeded`, which is not retried) and the response's token usage
+    is recorded under `role` and `model`.
+    """
     last_exception = None
+    if usage_tracker is not None:
+        usage_tracker.check()
+    start = monotonic()
     
+    response = None
     for attempt in range(1, retry + 1):
         try:
-            return client.invoke(messages)
+            response = client.invoke(messages)
+            break
+        except NonRetryableError:
+            raise
         except Exception as e:
             last_exception = e
             if attempt == retry:
                 break
             sleep(wait_after_retry)
-    
-    raise LLMAPICallError(
-        f"Error calling LLM: Retry limit reached with last error: {last_exception}"
-    ) from last_exception
+
+    if response is None:
+        raise LLMAPICallError(
+            f"Error calling LLM: Retry limit reached with last error: {last_exception}"
+        ) from last_exception
+    # Outside the retry loop: a failure to record must not repeat (and bill) a successful call.
+    if usage_tracker is not None:
+        usage_tracker.record(response, role=role, model=model, seconds=monotonic() - start)
+    return response
 
 
 
@@ -0,0 +1,154 @@
+from pathlib import Path
+import hashlib
+import json
+import sqlite3
+import time
+from typing import Iterable, Optional
+import uuid
+
+from ReChisel.verifier import parse_mismatches
+
+
+# Pipeline stage an attempt reached. Ordered by progress.
+STAGES = ('sbt', 'iv', 'functionality', 'passed')
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS problems (
+    run_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    prob_id TEXT NOT NULL,
+    bm_type TEXT,
+    model_key TEXT NOT NULL,
+    config_key TEXT NOT NULL,
+    is_passed INTEGER NOT NULL,
+    num_attempts INTEGER NOT NULL,
+    final_stage INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS attempts (
+    run_id TEXT NOT NULL,
+    prob_id TEXT NOT NULL,
+    model_key TEXT NOT NULL,
+    config_key TEXT NOT NULL,
+    attempt_idx INTEGER NOT NULL,
+    stage INTEGER NOT NULL,
+    mismatches INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS configs (
+    config_key TEXT PRIMARY KEY,
+    config_json TEXT NOT NULL
+);
+"""
+
+
+def verify_result_stage(verify_result: Optional[dict]) -> int:
+    """ Index into `STAGES` of the pipeline stage reached by a `VerifyResult.__dict__()` dict. """
+    if not verify_result or not verify_result['chisel_compile_to_verilog_success']:
+        return STAGES.index('sbt')
+    if not verify_result['verilog_compile_success']:
+        return STAGES.index('iv')
+    if not verify_result['functionality_correct']:
+        return STAGES.index('functionality')
+    return STAGES.index('passed')
+
+
+def _mismatches(verify_result: Optional[dict]) -> int:
+    # -1 when the simulation did not run or the benchmark does not report mismatches.
+    vvp = verify_result.get('vvp_cmd_exec_result') if verify_result else None
+    if not vvp:
+        return -1
+    n = parse_mismatches(vvp['stdout'])
+    return -1 if n is None else n
+
+
+def _model_key(rlt_dict: dict) -> str:
+    models = rlt_dict.get('llm_models', {})
+    return "/".join(
+        models.get(k, '') for k in ('init_gen_model', 'correction_model', 'reviewer_model')
+    )
+
+
+def _config_json(rlt_dict: dict) -> str:
+    # Working directories and output paths differ across runs of the same configuration.
+    config = {
+        k: v for k, v in rlt_dict.get('config', {}).items()
+        if k not in {'verifier_working_dir', 'trace_spill_dir'}
+    }
+    config['prompts'] = rlt_dict.get('prompts', {})
+    config['llm_summary_model'] = rlt_dict.get('llm_models', {}).get('llm_summary_model')
+    return json.dumps(config, sort_keys=True)
+
+
+class ResultsStore:
+    """
+    Append-only store of per-problem and per-attempt rows, one set of rows per CLI run.
+
+    Rows are flat and numeric where possible so that `ReChisel.analytics` can load whole
+    columns at once. The store is a single SQLite file; concurrent CLI processes may
+    append to the same file.
+    """
+
+    def __init__(self, path: str | Path):
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self._path, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        return self._conn
+
+    def append_result(self, rlt_dict: dict, *, run_id: Optional[str] = None) -> str:
+        """ Append the rows of one CLI result dict (the JSON written by `rechisel_cli.py`). """
+        run_id = run_id or uuid.uuid4().hex
+        prob_id = rlt_dict['testcase']['prob_id']
+        model_key = _model_key(rlt_dict)
+        config_json = _config_json(rlt_dict)
+        config_key = hashlib.sha1(config_json.encode('utf-8')).hexdigest()[:16]
+
+        # Failed attempts are recorded in `attempts`; a passing attempt only appears
+        # as `final_verify_result`.
+        verify_results = [a['verify_result'] for a in rlt_dict['attempts']]
+        if rlt_dict['is_passed']:
+            verify_results.append(rlt_dict['final_verify_result'])
+
+        attempt_rows = [
+            (run_id, prob_id, model_key, config_key, i, verify_result_stage(vr), _mismatches(vr))
+            for i, vr in enumerate(verify_results)
+        ]
+        final_stage = attempt_rows[-1][5] if attempt_rows else 0
+
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO configs VALUES (?, ?)", (config_key, config_json)
+            )
+            self._conn.execute(
+                "INSERT INTO problems VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run_id, time.time(), prob_id, rlt_dict.get('config', {}).get('bm_type'),
+                    model_key, config_key, int(bool(rlt_dict['is_passed'])),
+                    len(verify_results), final_stage
+                )
+            )
+            self._conn.executemany(
+                "INSERT INTO attempts VALUES (?, ?, ?, ?, ?, ?, ?)", attempt_rows
+            )
+        return run_id
+
+    def ingest_json_files(self, paths: Iterable[str | Path]) -> int:
+        """ Backfill the store from existing CLI result JSON files. Returns the number of files ingested. """
+        count = 0
+        for p in paths:
+            with Path(p).open('r', encoding='utf-8') as f:
+                self.append_result(json.load(f))
+            count += 1
+        return count
+
+    def close(self):
+        self._conn.close()
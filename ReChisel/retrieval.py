@@ -0,0 +1,329 @@
+import argparse
+from contextlib import contextmanager
+from dataclasses import dataclass
+import fcntl
+import hashlib
+import json
+import os
+from pathlib import Path
+import re
+import shutil
+import time
+from typing import TYPE_CHECKING, Iterable, Optional
+import uuid
+import zlib
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from langchain_core.messages import HumanMessage
+
+
+_WORD = re.compile(r'[a-z0-9_]+')
+# BM25 parameters.
+_K1 = 1.2
+_B = 0.75
+
+
+def tokenize(text: str) -> list[str]:
+    """ Lower-cased words and word bigrams. """
+    words = _WORD.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def _term_ids(terms: Iterable[str]) -> np.ndarray:
+    # Terms are hashed rather than kept in a vocabulary, so segments need no vocabulary to load.
+    return np.fromiter((zlib.crc32(t.encode('utf-8')) for t in terms), dtype=np.uint32)
+
+
+def _doc_key(prob_id: str, code: str) -> bytes:
+    return hashlib.sha256(f"{prob_id}\0{code}".encode('utf-8')).digest()[:16]
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly 4 characters per token for English text and code; no tokenizer needed.
+    return len(text) // 4 + 1
+
+
+@dataclass
+class SolvedExample:
+    prob_id: str
+    specification: str
+    chisel_code: str
+    score: float = 0.0
+
+
+class _Segment:
+    """
+    An immutable part of the index. Postings are stored in CSR form: `terms` (sorted term ids),
+    `offsets` into `docs`/`tfs`. All arrays are memory-mapped, so opening a segment is cheap.
+    """
+
+    FILES = ('terms', 'offsets', 'docs', 'tfs', 'doc_len', 'doc_offsets', 'keys')
+
+    def __init__(self, path: Path):
+        self.path = path
+        for name in self.FILES:
+            setattr(self, name, np.load(path / f"{name}.npy", mmap_mode='r'))
+        self._blob = np.memmap(path / 'docs.bin', dtype=np.uint8, mode='r') if (path / 'docs.bin').stat().st_size else None
+
+    @property
+    def num_docs(self) -> int:
+        return len(self.doc_len)
+
+    def document(self, i: int) -> dict:
+        start, end = int(self.doc_offsets[i]), int(self.doc_offsets[i + 1])
+        return json.loads(bytes(self._blob[start:end]).decode('utf-8'))
+
+    def postings(self, term_id: int) -> tuple[np.ndarray, np.ndarray]:
+        i = int(np.searchsorted(self.terms, term_id))
+        if i == len(self.terms) or self.terms[i] != term_id:
+            return self.docs[:0], self.tfs[:0]
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self.docs[start:end], self.tfs[start:end]
+
+    def document_frequency(self, term_ids: np.ndarray) -> np.ndarray:
+        idx = np.searchsorted(self.terms, term_ids)
+        idx_clipped = np.minimum(idx, len(self.terms) - 1) if len(self.terms) else idx
+        found = (idx < len(self.terms)) & (self.terms[idx_clipped] == term_ids) if len(self.terms) else np.zeros(len(term_ids), bool)
+        return np.where(found, self.offsets[idx_clipped + 1] - self.offsets[idx_clipped], 0)
+
+    @staticmethod
+    def write(path: Path, documents: list[dict]):
+        """ Build a segment from `{'prob_id', 'specification', 'chisel_code'}` documents. """
+        tmp = path.with_name(f".tmp_{path.name}")
+        tmp.mkdir(parents=True)
+
+        term_ids, doc_ids, doc_len = [], [], []
+        for i, doc in enumerate(documents):
+            ids = _term_ids(tokenize(doc['specification']))
+            term_ids.append(ids)
+            doc_ids.append(np.full(len(ids), i, dtype=np.int32))
+            doc_len.append(len(ids))
+        term_ids = np.concatenate(term_ids) if term_ids else np.zeros(0, np.uint32)
+        doc_ids = np.concatenate(doc_ids) if doc_ids else np.zeros(0, np.int32)
+        # Term frequencies: count (term, doc) pairs, sorted by term, then doc.
+        pairs, tfs = np.unique(
+            (term_ids.astype(np.uint64) << np.uint64(32)) | doc_ids.astype(np.uint64), return_counts=True
+        )
+        pair_terms = (pairs >> np.uint64(32)).astype(np.uint32)
+        terms, starts = np.unique(pair_terms, return_index=True)
+
+        blobs = [json.dumps(doc, ensure_ascii=False).encode('utf-8') for doc in documents]
+        arrays = {
+            'terms': terms,
+            'offsets': np.append(starts, len(pairs)).astype(np.int64),
+            'docs': (pairs & np.uint64(0xFFFFFFFF)).astype(np.int32),
+            'tfs': tfs.astype(np.float32),
+            'doc_len': np.array(doc_len, dtype=np.int32),
+            'doc_offsets': np.concatenate([[0], np.cumsum([len(b) for b in blobs], dtype=np.int64)]).astype(np.int64),
+            'keys': np.array(
+                [_doc_key(d['prob_id'], d['chisel_code']) for d in documents], dtype='S16'
+            ).reshape(-1),
+        }
+        for name, array in arrays.items():
+            np.save(tmp / f"{name}.npy", array)
+        (tmp / 'docs.bin').write_bytes(b''.join(blobs))
+        # Segments become visible atomically, so readers never see a partial one.
+        os.rename(tmp, path)
+
+
+class RetrievalIndex:
+    """
+    BM25 index of solved problems over their specifications, stored in `index_dir` as
+    immutable memory-mapped segments. Adding documents writes a new segment; segments are
+    merged once there are more than `max_segments`. Writers serialize on a lock file;
+    readers need no lock.
+    """
+
+    def __init__(self, index_dir: str | Path, *, max_segments: int = 16, verbose: bool = False):
+        self._dir = Path(index_dir)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._max_segments = max_segments
+        self._verbose = verbose
+        self._segments: list[_Segment] = []
+        self.reload()
+
+    def _log(self, message: str):
+        if self._verbose:
+            print(f"[RETRIEVAL] {message}")
+
+    def reload(self):
+        self._segments = [_Segment(p) for p in sorted(self._dir.glob('seg_*'))]
+
+    @property
+    def num_docs(self) -> int:
+        return sum(s.num_docs for s in self._segments)
+
+    @contextmanager
+    def _write_lock(self):
+        with (self._dir / '.lock').open('w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _new_segment_path(self) -> Path:
+        # Sorted by creation time, so segment order (and tie-breaking) is stable.
+        return self._dir / f"seg_{time.time_ns():020d}_{uuid.uuid4().hex[:8]}"
+
+    def add(self, documents: list[dict]) -> int:
+        """
+        Add `{'prob_id', 'specification', 'chisel_code'}` documents, skipping ones already
+        indexed. Returns the number of documents added.
+        """
+        with self._write_lock():
+            self.reload()
+            known = {bytes(k) for s in self._segments for k in s.keys}
+            new, seen = [], set()
+            for doc in documents:
+                key = _doc_key(doc['prob_id'], doc['chisel_code'])
+                if key not in known and key not in seen:
+                    seen.add(key)
+                    new.append(doc)
+            if new:
+                _Segment.write(self._new_segment_path(), new)
+                self.reload()
+                self._log(f"Added {len(new)} documents in a new segment.")
+            if len(self._segments) > self._max_segments:
+                self._compact_locked()
+        return len(new)
+
+    def compact(self):
+        """ Merge all segments into one. """
+        with self._write_lock():
+            self.reload()
+            self._compact_locked()
+
+    def _compact_locked(self):
+        if len(self._segments) <= 1:
+            return
+        old = self._segments
+        documents = [s.document(i) for s in old for i in range(s.num_docs)]
+        _Segment.write(self._new_segment_path(), documents)
+        for s in old:
+            shutil.rmtree(s.path)
+        self.reload()
+        self._log(f"Compacted {len(old)} segments into one with {len(documents)} documents.")
+
+    def query(self, specification: str, k: int = 3, *, exclude_prob_ids: Iterable[str] = ()) -> list[SolvedExample]:
+        """ The `k` solved examples whose specifications are most similar to `specification`. """
+        if not self._segments or k <= 0:
+            return []
+        term_ids = np.unique(_term_ids(tokenize(specification)))
+        num_docs = self.num_docs
+        avg_len = sum(float(s.doc_len.sum()) for s in self._segments) / max(num_docs, 1)
+        df = sum(s.document_frequency(term_ids) for s in self._segments)
+        idf = np.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+
+        candidates = []
+        for seg_idx, segment in enumerate(self._segments):
+            scores = np.zeros(segment.num_docs, dtype=np.float32)
+            norm = _K1 * (1 - _B + _B * np.asarray(segment.doc_len, dtype=np.float32) / avg_len)
+            for term_id, term_idf in zip(term_ids, idf):
+                docs, tfs = segment.postings(term_id)
+                if len(docs):
+                    # A term occurs once per document in a posting list, so fancy-index addition is safe.
+                    scores[docs] += term_idf * tfs * (_K1 + 1) / (tfs + norm[docs])
+            # Extra candidates make up for excluded problems and duplicates.
+            top = np.argsort(-scores, kind='stable')[:k * 4 + 8]
+            candidates.extend((float(scores[i]), seg_idx, int(i)) for i in top if scores[i] > 0)
+
+        exclude = set(exclude_prob_ids)
+        results, seen = [], set()
+        for score, seg_idx, i in sorted(candidates, key=lambda c: -c[0]):
+            segment = self._segments[seg_idx]
+            key = bytes(segment.keys[i])
+            if key in seen:
+                continue
+            seen.add(key)
+            doc = segment.document(i)
+            if doc['prob_id'] in exclude:
+                continue
+            results.append(SolvedExample(doc['prob_id'], doc['specification'], doc['chisel_code'], score))
+            if len(results) == k:
+                break
+        return results
+
+
+def documents_from_results(result_paths: Iterable[str | Path]) -> list[dict]:
+    """ Passing (specification, final Chisel code) pairs from `rechisel_cli.py` result JSON files. """
+    documents = []
+    for path in result_paths:
+        rlt = json.loads(Path(path).read_text(encoding='utf-8'))
+        if not rlt.get('is_passed') or not rlt.get('final_chisel_code'):
+            continue
+        spec_path = rlt['testcase'].get('specification_path')
+        if not spec_path or not Path(spec_path).exists():
+            continue
+        documents.append({
+            'prob_id': rlt['testcase']['prob_id'],
+            'specification': Path(spec_path).read_text(encoding='utf-8'),
+            'chisel_code': rlt['final_chisel_code'],
+        })
+    return documents
+
+
+def few_shot_examples_message(examples: list[SolvedExample], token_budget: int) -> Optional['HumanMessage']:
+    """
+    Format solved examples, most similar first, into a message for the initial generation.
+    Examples that do not fit into `token_budget` (estimated) are skipped.
+    """
+    # Imported here so that indexing never imports LLM libraries.
+    from langchain_core.messages import HumanMessage
+
+    header = (
+        "Below are verified-correct Chisel solutions to similar problems. "
+        "Use them as references for Chisel idioms and interface conventions; "
+        "the problem you need to solve follows after them.\n\n"
+    )
+    used, parts = estimate_tokens(header), []
+    for example in examples:
+        part = (
+            f"## Example {len(parts) + 1}\n\n"
+            f"### Specification\n\n{example.specification.strip()}\n\n"
+            f"### Chisel code\n\n```scala\n{example.chisel_code.strip()}\n```\n\n"
+        )
+        if used + estimate_tokens(part) > token_budget:
+            continue
+        used += estimate_tokens(part)
+        parts.append(part)
+    if not parts:
+        return None
+    return HumanMessage(header + "".join(parts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval index of solved ReChisel problems")
+    parser.add_argument('index_dir', type=str, help='Index directory')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    p_add = subparsers.add_parser('add', help='Add passing results of rechisel_cli.py runs')
+    p_add.add_argument('results', type=str, nargs='+', help='Result JSON files')
+    subparsers.add_parser('compact', help='Merge all segments into one')
+    p_query = subparsers.add_parser('query', help='Query with a specification file and report latencies')
+    p_query.add_argument('specification', type=str, help='Specification file')
+    p_query.add_argument('-k', type=int, default=3, help='Number of examples')
+    p_query.add_argument('--repeat', type=int, default=20, help='Number of timed queries')
+    args = parser.parse_args()
+
+    if args.command == 'add':
+        index = RetrievalIndex(args.index_dir, verbose=True)
+        added = index.add(documents_from_results(args.results))
+        print(f"Added {added} documents; the index has {index.num_docs} documents.")
+    elif args.command == 'compact':
+        RetrievalIndex(args.index_dir, verbose=True).compact()
+    else:
+        start = time.perf_counter()
+        index = RetrievalIndex(args.index_dir)
+        load_ms = (time.perf_counter() - start) * 1000
+        spec = Path(args.specification).read_text(encoding='utf-8')
+        latencies = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            examples = index.query(spec, args.k)
+            latencies.append((time.perf_counter() - start) * 1000)
+        print(f"{index.num_docs} documents, load {load_ms:.1f} ms, query median {sorted(latencies)[len(latencies) // 2]:.2f} ms")
+        for example in examples:
+            print(f"  {example.score:8.3f}  {example.prob_id}")
+
+
+if __name__ == '__main__':
+    main()
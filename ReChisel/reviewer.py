@@ -1,9 +1,12 @@
 
+from typing import Optional
+
 from langchain_core.messages import SystemMessage, AIMessage, HumanMessage
 
 from ReChisel.chisel_code import ChiselCode
 from ReChisel.llms import get_llm_client, llm_call_with_retry
 from ReChisel.testcase import Testcase
+from ReChisel.usage import UsageTracker
 from ReChisel.verifier import VerifyResult, collect_verify_feedback
 
 
@@ -15,12 +18,14 @@ class Reviewer:
             iv_system_prompt: str,
             functionality_system_prompt: str,
             model: str,
+            usage_tracker: Optional[UsageTracker] = None,
             verbose: bool = False,
     ):
         self._sbt_system_prompt = sbt_system_prompt
         self._iv_system_prompt = iv_system_prompt
         self._functionality_system_prompt = functionality_system_prompt
         self._model = model
+        self._usage_tracker = usage_tracker
         self._verbose = verbose
 
     def _log(self, message: str):
@@ -28,7 +33,7 @@ class Reviewer:
             # TODO: Use `logging` module instead of print
             print(f"[REVIEWER] {message}")
 
-    def _reflection_system_prompt(self, verify_result: VerifyResult) -> SystemMessage:
+    def reflection_system_prompt(self, verify_result: VerifyResult) -> SystemMessage:
         if not verify_result.chisel_compile_to_verilog_success:
             self._log("Adopting SBT reflection system prompt.")
             return SystemMessage(self._sbt_system_prompt)
@@ -44,13 +49,15 @@ class Reviewer:
     def review(self, testcase: Testcase, verify_result: VerifyResult, chisel_code: ChiselCode) -> AIMessage:
         self._log("Preparing messages for reflection.")
         messages = [
-            self._reflection_system_prompt(verify_result),
+            self.reflection_system_prompt(verify_result),
             HumanMessage(testcase.specification),
             collect_verify_feedback(verify_result, chisel_code)
         ]
         self._log(f"Calling LLM for reflection with model {self._model}.")
         client = get_llm_client(self._model)
-        response = llm_call_with_retry(client, messages)
+        response = llm_call_with_retry(
+            client, messages, usage_tracker=self._usage_tracker, role='review', model=self._model
+        )
         self._log("Reflection response received.")
         return response
     
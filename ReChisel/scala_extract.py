@@ -0,0 +1,238 @@
+from dataclasses import dataclass
+import re
+from typing import Optional
+
+
+# Fences that open a code block we extract. Matched case-insensitively.
+CODE_FENCE_LANGUAGES = {'scala', 'chisel'}
+
+_FENCE = re.compile(r'```[ \t]*([\w+-]*)')
+
+
+class CodeExtractionError(ValueError):
+    """
+    Raised when no code can be extracted from an LLM response.
+
+    `kind` identifies the failure (e.g. 'no_code_block'); `line` is the 1-based line
+    of the response it refers to, if any.
+    """
+
+    def __init__(self, kind: str, message: str, *, line: Optional[int] = None):
+        super().__init__(f"Error: {message}")
+        self.kind = kind
+        self.line = line
+
+    def to_dict(self) -> dict:
+        return {'kind': self.kind, 'message': str(self), 'line': self.line}
+
+
+@dataclass
+class CodeBlock:
+    code: str
+    # 1-based line of the opening fence in the response.
+    start_line: int
+    # False if the response ended before the closing fence, e.g. a truncated response.
+    closed: bool = True
+
+
+def extract_code_blocks(response: str) -> list[CodeBlock]:
+    """
+    Extract all ```scala / ```chisel blocks from `response` in a single pass over its lines.
+
+    Other fenced blocks are skipped as a whole, so a fence inside them is not mistaken for a
+    Scala block. A block left open at the end of the response is kept and marked unclosed.
+    """
+    blocks = []
+    state = 'text'  # text | code | other
+    current: list[str] = []
+    start_line = 0
+
+    for lineno, line in enumerate(response.splitlines(keepends=True), start=1):
+        if state == 'code':
+            end = line.find('```')
+            if end < 0:
+                current.append(line)
+                continue
+            current.append(line[:end])
+            blocks.append(CodeBlock(''.join(current), start_line))
+            state = 'text'
+        elif state == 'other':
+            if line.lstrip().startswith('```'):
+                state = 'text'
+        else:
+            match = _FENCE.search(line)
+            if not match:
+                continue
+            if match.group(1).lower() in CODE_FENCE_LANGUAGES:
+                state, current, start_line = 'code', [], lineno
+                rest = line[match.end():]
+                # Code on the same line as the opening fence, e.g. "```scala class A {}```".
+                if rest.strip():
+                    end = rest.find('```')
+                    if end >= 0:
+                        blocks.append(CodeBlock(rest[:end], start_line))
+                        state = 'text'
+                    else:
+                        current.append(rest)
+            elif line[:match.start()].strip() == '':
+                state = 'other'
+
+    if state == 'code':
+        blocks.append(CodeBlock(''.join(current), start_line, closed=False))
+    if not blocks:
+        raise CodeExtractionError('no_code_block', "Scala code block is not found.")
+    return blocks
+
+
+# Tokens that matter for brace matching. Comments and literals are matched as a whole so that
+# braces inside them are ignored. `re.search` skips everything else in C, so scanning stays
+# linear and fast even for very long responses.
+_OPAQUE = (
+    r'(?P<line_comment>//[^\n]*)'
+    r'|(?P<block_comment>/\*)'
+    r'|(?P<triple_string>"""[\s\S]*?(?:"""|\Z)"*)'
+    r'|(?P<string>"(?:[^"\\\n]|\\.)*(?:"|$))'
+    r"|(?P<char>'(?:\\u[0-9a-fA-F]{4}|\\.|[^'\\\n])')"
+)
+_BRACE_TOKEN = re.compile(_OPAQUE + r'|(?P<open>\{)|(?P<close>\})|(?P<newline>\n)', flags=re.MULTILINE)
+# Top-level clauses to remove; only recognized at the start of a line.
+_STRIP_TOKEN = re.compile(
+    r'(?P<app_object>^[ \t]*object\s+\w+\s+extends\s+App\s*\{)'
+    r'|(?P<clause>^[ \t]*(?:import|package)\b)'
+    r'|' + _OPAQUE + r'|(?P<open>\{)|(?P<close>\})',
+    flags=re.MULTILINE
+)
+_BLOCK_COMMENT_DELIM = re.compile(r'/\*|\*/')
+
+
+def _skip_block_comment(code: str, i: int) -> int:
+    """ `code[i:]` starts with `/*`; return the index right after the comment. Scala block comments nest. """
+    depth, pos = 0, i
+    for m in _BLOCK_COMMENT_DELIM.finditer(code, pos):
+        depth += 1 if m.group() == '/*' else -1
+        if depth == 0:
+            return m.end()
+    return len(code)
+
+
+def _skip_braces(code: str, i: int, *, stop_at_newline: bool) -> int:
+    """
+    Scan from `i`, tracking brace nesting while ignoring comments and literals. Return the index
+    right after the `}` that closes the first opened brace or, with `stop_at_newline`, right after
+    the first newline outside braces. Returns the end of the code if neither is found.
+    """
+    depth, pos = 0, i
+    while True:
+        m = _BRACE_TOKEN.search(code, pos)
+        if m is None:
+            return len(code)
+        kind, pos = m.lastgroup, m.end()
+        if kind == 'block_comment':
+            pos = _skip_block_comment(code, m.start())
+        elif kind == 'open':
+            depth += 1
+        elif kind == 'close':
+            depth -= 1
+            if depth == 0 and not stop_at_newline:
+                return pos
+        elif kind == 'newline' and stop_at_newline and depth <= 0:
+            return pos
+
+
+def find_block_end(code: str, open_index: int) -> int:
+    """ Index right after the `}` matching the `{` at `open_index`, ignoring comments and literals. """
+    return _skip_braces(code, open_index, stop_at_newline=False)
+
+
+def strip_scala(code: str) -> str:
+    """
+    Remove top-level `import` and `package` clauses and `object ... extends App { ... }`
+    from Scala code in a single pass. Comments and string literals are respected, so braces
+    or keywords inside them do not affect the result.
+    """
+    out = []
+    depth, pos, copy_from = 0, 0, 0
+    while True:
+        m = _STRIP_TOKEN.search(code, pos)
+        if m is None:
+            break
+        kind, pos = m.lastgroup, m.end()
+        if kind in {'app_object', 'clause'} and depth == 0:
+            out.append(code[copy_from:m.start()])
+            if kind == 'app_object':
+                copy_from = pos = _skip_braces(code, m.end() - 1, stop_at_newline=False)
+            else:
+                # Import selectors may span lines, e.g. `import chisel3.util.{Cat,\n Fill}`.
+                copy_from = pos = _skip_braces(code, m.end(), stop_at_newline=True)
+        elif kind == 'app_object' or kind == 'open':
+            depth += 1
+        elif kind == 'close':
+            depth = max(depth - 1, 0)
+        elif kind == 'block_comment':
+            pos = _skip_block_comment(code, m.start())
+
+    out.append(code[copy_from:])
+    return ''.join(out).strip()
+
+
+def _legacy_raw_stripped(response: str) -> str:
+    # The regex-based extraction this module replaced; kept for the benchmark only.
+    blocks = []
+    for match in re.finditer(r'```scala', response):
+        start = match.end()
+        end = response.find('```', start)
+        blocks.append(response[start:end])
+    code = "\n".join(blocks)
+    code = re.sub(r'^\s*import.*\n', '', code, flags=re.MULTILINE)
+    code = re.sub(r'^\s*package.*\n', '', code, flags=re.MULTILINE)
+    code = re.sub(r'object\s+\w+\s+extends\s+App\s*{.*}', '', code, flags=re.DOTALL)
+    return code.strip()
+
+
+def _synthetic_response(num_modules: int) -> str:
+    module = (
+        "class Adder{i} extends RawModule {{\n"
+        "  val a = IO(Input(UInt(8.W)))  // input {{ a }}\n"
+        "  val out = IO(Output(UInt(8.W)))\n"
+        "  /* nested /* comment */ with braces }} */\n"
+        "  val s = \"}}{{ not a brace\"\n"
+        "  out := a + {i}.U\n"
+        "}}\n\n"
+    )
+    return (
+        "Here is the implementation.\n\n```scala\n"
+        "package top\n"
+        "import chisel3._\n"
+        "import chisel3.util.{Cat,\n  Fill}\n\n"
+        + "".join(module.format(i=i) for i in range(num_modules))
+        + "object Main extends App {\n  println(\"done\")\n}\n```\n\n"
+        "Explanation: each module adds a constant.\n"
+    )
+
+
+def _whitespace_heavy_response(num_lines: int) -> str:
+    # Runs of whitespace-only lines make the legacy `^\s*import.*\n` pattern backtrack quadratically.
+    return "```scala\nclass TopModule extends RawModule {\n" + "    \n" * num_lines + "}\n```\n"
+
+
+def benchmark(repeat: int = 3):
+    """ Compare the single-pass extractor with the legacy regex extraction on synthetic LLM responses. """
+    import timeit
+
+    cases = [
+        *((f"{n} modules", _synthetic_response(n)) for n in (10, 100, 1000, 5000)),
+        *((f"{n} blank lines", _whitespace_heavy_response(n)) for n in (1000, 4000, 8000)),
+    ]
+    print(f"{'response':>18} {'chars':>10} {'single-pass (ms)':>18} {'legacy regex (ms)':>18}")
+    for name, response in cases:
+
+        def single_pass():
+            return strip_scala("\n".join(b.code for b in extract_code_blocks(response)))
+
+        t_new = min(timeit.repeat(single_pass, number=1, repeat=repeat)) * 1000
+        t_old = min(timeit.repeat(lambda: _legacy_raw_stripped(response), number=1, repeat=repeat)) * 1000
+        print(f"{name:>18} {len(response):>10} {t_new:>18.2f} {t_old:>18.2f}")
+
+
+if __name__ == '__main__':
+    benchmark()
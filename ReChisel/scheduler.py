@@ -0,0 +1,656 @@
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+import json
+from pathlib import Path
+import threading
+import time
+from typing import Literal, Optional
+
+from ReChisel.results_store import STAGES, ResultsStore
+from ReChisel.usage import Budget
+from ReChisel.verifier import VerifyResult, parse_mismatches
+
+
+SchedulingPolicy = Literal['adaptive', 'round-robin']
+
+# Prior probability that the next attempt passes, by the stage the last attempt reached
+# (functional failures bucketed by mismatch count), before any attempt of the suite is observed.
+DEFAULT_PRIORS = {
+    'new': 0.40,
+    'sbt': 0.15,
+    'iv': 0.25,
+    'functionality<=3': 0.35,
+    'functionality<=20': 0.20,
+    'functionality>20': 0.10,
+    'functionality?': 0.15,
+}
+# Priors scale down with the number of attempts since the best result so far (0, 1, 2+).
+_STAGNATION_FACTORS = (1.0, 0.6, 0.3)
+# Weight of the priors, in observations.
+DEFAULT_PRIOR_STRENGTH = 4.0
+
+
+def _stage_bucket(stage: int, mismatches: int) -> str:
+    name = STAGES[stage]
+    if name != 'functionality':
+        return name
+    if mismatches < 0:
+        return 'functionality?'
+    return 'functionality<=3' if mismatches <= 3 else 'functionality<=20' if mismatches <= 20 else 'functionality>20'
+
+
+def state_key(stage: Optional[int], mismatches: int = -1, stagnation: int = 0) -> str:
+    """ Key of a problem's state: last stage reached (None before the first attempt) and stagnation. """
+    if stage is None:
+        return 'new'
+    return f"{_stage_bucket(stage, mismatches)}/{min(stagnation, len(_STAGNATION_FACTORS) - 1)}"
+
+
+def _progress(stage: int, mismatches: int) -> tuple:
+    # Same order as `beam_search.verify_progress`: stage, then fewer known mismatches.
+    return stage, -mismatches if mismatches >= 0 else -float('inf')
+
+
+class SolveModel:
+    """
+    Beta-Bernoulli estimate of the probability that a problem's next attempt passes, per
+    `state_key`. Starts from `DEFAULT_PRIORS` or from recorded runs, and is updated with
+    every attempt of the suite.
+    """
+
+    def __init__(self, prior_strength: float = DEFAULT_PRIOR_STRENGTH):
+        self._counts: dict[str, list[float]] = {}
+        for bucket, p in DEFAULT_PRIORS.items():
+            if bucket == 'new':
+                self._counts[bucket] = [p * prior_strength, (1 - p) * prior_strength]
+                continue
+            for stagnation, factor in enumerate(_STAGNATION_FACTORS):
+                q = p * factor
+                self._counts[f"{bucket}/{stagnation}"] = [q * prior_strength, (1 - q) * prior_strength]
+
+    def probability(self, key: str) -> float:
+        passed, failed = self._counts[key]
+        return passed / (passed + failed)
+
+    def update(self, key: str, passed: bool):
+        self._counts[key][0 if passed else 1] += 1
+
+    def fit(self, sequences: dict[str, list[tuple[int, int]]]):
+        """ Add the transitions of recorded attempt sequences, `(stage, mismatches)` per attempt. """
+        for sequence in sequences.values():
+            problem = ProblemState('fit')
+            for stage, mismatches in sequence:
+                self.update(problem.key, STAGES[stage] == 'passed')
+                problem.observe(stage, mismatches)
+
+    def to_dict(self) -> dict:
+        return {key: round(self.probability(key), 4) for key in self._counts}
+
+
+@dataclass
+class ProblemState:
+    prob_id: str
+    attempts: int = 0
+    stage: Optional[int] = None
+    mismatches: int = -1
+    best_progress: Optional[tuple] = None
+    # Attempts since the best result so far.
+    stagnation: int = 0
+    solved: bool = False
+    # Set when the problem cannot get further attempts, e.g. after an error.
+    given_up: bool = False
+    running: bool = False
+    # Scheduler step at which the problem last got an attempt.
+    last_step: int = -1
+
+    @property
+    def key(self) -> str:
+        return state_key(self.stage, self.mismatches, self.stagnation)
+
+    def observe(self, stage: int, mismatches: int):
+        self.attempts += 1
+        self.stage, self.mismatches = stage, mismatches
+        progress = _progress(stage, mismatches)
+        if self.best_progress is None or progress > self.best_progress:
+            self.best_progress, self.stagnation = progress, 0
+        else:
+            self.stagnation += 1
+        self.solved = STAGES[stage] == 'passed'
+
+
+class AttemptScheduler:
+    """
+    Decides which problem of a suite gets the next attempt.
+
+    `round-robin` gives every problem its next attempt in turn. `adaptive` picks the problem
+    whose next attempt is most likely to pass according to a `SolveModel`. For fairness, a
+    problem that has not had an attempt for `max_wait_steps` scheduling steps goes first,
+    and no problem gets more than `max_attempts_per_problem`.
+    """
+
+    def __init__(
+            self, prob_ids: list[str], *,
+            policy: SchedulingPolicy = 'adaptive',
+            model: Optional[SolveModel] = None,
+            max_attempts_per_problem: int = 10,
+            max_wait_steps: Optional[int] = None,
+            verbose: bool = False
+    ):
+        if policy not in {'adaptive', 'round-robin'}:
+            raise ValueError(f"Unknown scheduling policy: {policy}")
+        self.problems = {prob_id: ProblemState(prob_id) for prob_id in prob_ids}
+        self._order = {prob_id: i for i, prob_id in enumerate(prob_ids)}
+        self._policy = policy
+        self.model = model or SolveModel()
+        self._max_attempts = max_attempts_per_problem
+        self._max_wait_steps = max_wait_steps if max_wait_steps is not None else 3 * len(prob_ids)
+        self._verbose = verbose
+        self._step = 0
+        self._lock = threading.Lock()
+
+    def _log(self, message: str):
+        if self._verbose:
+            print(f"[SCHEDULER] {message}")
+
+    def _schedulable(self) -> list[ProblemState]:
+        return [
+            p for p in self.problems.values()
+            if not (p.solved or p.given_up or p.running or p.attempts >= self._max_attempts)
+        ]
+
+    def next_problem(self) -> Optional[str]:
+        """ The problem to give the next attempt to, or None if none is schedulable right now. """
+        with self._lock:
+            candidates = self._schedulable()
+            if not candidates:
+                return None
+            if self._policy == 'round-robin':
+                chosen = min(candidates, key=lambda p: (p.attempts, p.last_step, self._order[p.prob_id]))
+                reason = 'round-robin'
+            else:
+                starving = [p for p in candidates if self._step - p.last_step > self._max_wait_steps and p.last_step >= 0]
+                if starving:
+                    chosen = min(starving, key=lambda p: p.last_step)
+                    reason = 'waited too long'
+                else:
+                    chosen = max(candidates, key=lambda p: (
+                        self.model.probability(p.key), -p.attempts, -self._order[p.prob_id]
+                    ))
+                    reason = f"p={self.model.probability(chosen.key):.2f} ({chosen.key})"
+            chosen.running = True
+            chosen.last_step = self._step
+            self._step += 1
+            self._log(f"Step {chosen.last_step}: {chosen.prob_id}, attempt {chosen.attempts + 1}, {reason}")
+            return chosen.prob_id
+
+    def report(self, prob_id: str, stage: int, mismatches: int):
+        """ Record the outcome of the attempt given to `prob_id`. """
+        with self._lock:
+            problem = self.problems[prob_id]
+            self.model.update(problem.key, STAGES[stage] == 'passed')
+            problem.observe(stage, mismatches)
+            problem.running = False
+
+    def release(self, prob_id: str):
+        """ Give up on a problem whose attempt could not be completed. """
+        with self._lock:
+            problem = self.problems[prob_id]
+            problem.running = False
+            problem.given_up = True
+
+
+@dataclass
+class SuiteProgress:
+    """ Budget used and problems solved, recorded after every attempt. """
+    timeline: list = field(default_factory=list)
+
+    def record(self, *, attempts: int, tokens: int, cost: float, seconds: float, solved: int):
+        self.timeline.append({
+            'attempts': attempts, 'tokens': tokens, 'cost': round(cost, 6),
+            'seconds': round(seconds, 3), 'solved': solved,
+        })
+
+    def solved_within(self, attempts: int) -> int:
+        return max((t['solved'] for t in self.timeline if t['attempts'] <= attempts), default=0)
+
+    def summary(self, num_problems: int) -> dict:
+        last = self.timeline[-1] if self.timeline else {'attempts': 0, 'tokens': 0, 'cost': 0.0, 'seconds': 0.0, 'solved': 0}
+        return {
+            'problems': num_problems,
+            **last,
+            'solved_per_100_attempts': 100 * last['solved'] / last['attempts'] if last['attempts'] else None,
+            'solved_per_million_tokens': 1e6 * last['solved'] / last['tokens'] if last['tokens'] else None,
+            'solved_per_dollar': last['solved'] / last['cost'] if last['cost'] else None,
+            'solved_per_hour': 3600 * last['solved'] / last['seconds'] if last['seconds'] else None,
+            # Solved problems after each quarter of the attempts used.
+            'solved_at_attempt_quarters': [
+                self.solved_within(round(last['attempts'] * q / 4)) for q in range(1, 5)
+            ],
+        }
+
+
+def attempt_outcome(verify_result: Optional[VerifyResult]) -> tuple[int, int]:
+    """ Index into `STAGES` reached by an attempt and its mismatch count (-1 if unknown). """
+    if verify_result is None or not verify_result.chisel_compile_to_verilog_success:
+        return STAGES.index('sbt'), -1
+    if not verify_result.verilog_compile_success:
+        return STAGES.index('iv'), -1
+    if verify_result.functionality_correct:
+        return STAGES.index('passed'), 0
+    vvp = verify_result.vvp_cmd_exec_result
+    mismatches = parse_mismatches(vvp.stdout) if vvp else None
+    return STAGES.index('functionality'), -1 if mismatches is None else mismatches
+
+
+# Simulation of recorded runs
+
+def recorded_sequences(store: ResultsStore) -> dict[str, list[tuple[int, int]]]:
+    """ `(stage, mismatches)` of every attempt of every recorded run, by run. """
+    sequences: dict[str, list[tuple[int, int]]] = {}
+    rows = store.connection.execute(
+        "SELECT run_id, prob_id, stage, mismatches FROM attempts ORDER BY run_id, attempt_idx"
+    )
+    for run_id, prob_id, stage, mismatches in rows:
+        sequences.setdefault(f"{prob_id}#{run_id[:8]}", []).append((stage, mismatches))
+    return sequences
+
+
+def simulate(
+        sequences: dict[str, list[tuple[int, int]]], policy: SchedulingPolicy, *,
+        max_total_attempts: Optional[int] = None,
+        max_attempts_per_problem: int = 10,
+        max_wait_steps: Optional[int] = None,
+        prior: Optional[dict[str, list[tuple[int, int]]]] = None
+) -> dict:
+    """
+    Replay recorded runs under a scheduling policy: each scheduled attempt reveals the next
+    recorded attempt of that run. A run's attempts do not depend on how runs are interleaved,
+    so policies can be compared on the same recordings without LLM calls.
+    """
+    model = SolveModel()
+    if prior:
+        model.fit(prior)
+    scheduler = AttemptScheduler(
+        list(sequences), policy=policy, model=model,
+        max_attempts_per_problem=max_attempts_per_problem, max_wait_steps=max_wait_steps
+    )
+    progress = SuiteProgress()
+    attempts = 0
+    while max_total_attempts is None or attempts < max_total_attempts:
+        prob_id = scheduler.next_problem()
+        if prob_id is None:
+            break
+        sequence = sequences[prob_id]
+        done = scheduler.problems[prob_id].attempts
+        if done >= len(sequence):
+            # The recording ends here (the run hit its own attempt limit).
+            scheduler.release(prob_id)
+            continue
+        scheduler.report(prob_id, *sequence[done])
+        attempts += 1
+        solved = sum(p.solved for p in scheduler.problems.values())
+        progress.record(attempts=attempts, tokens=0, cost=0.0, seconds=0.0, solved=solved)
+    return {
+        'policy': policy,
+        'summary': progress.summary(len(sequences)),
+        'timeline': progress.timeline,
+    }
+
+
+# Live runs
+
+def load_suite(path: str | Path) -> list[dict]:
+    """
+    Problems from a JSON list or JSONL file of objects with the `rechisel_cli.py` testcase
+    arguments: `prob_id`, `specification`, `testbench` (a path or a list of paths), `bm_type`,
+    and optionally `reference` and `top_module_name`.
+    """
+    text = Path(path).read_text(encoding='utf-8')
+    problems = json.loads(text) if text.lstrip().startswith('[') else [
+        json.loads(line) for line in text.splitlines() if line.strip()
+    ]
+    for problem in problems:
+        problem.setdefault('reference', None)
+        problem.setdefault('top_module_name', 'TopModule')
+    return problems
+
+
+def discover_problems(root: str | Path) -> list[dict]:
+    """ Problems in the `benchmarks/` layout: one directory per problem with VerilogEval or AutoChip files. """
+    problems = []
+    for d in sorted(p for p in Path(root).iterdir() if p.is_dir()):
+        spec = next(iter(sorted(d.glob('*_spec.txt'))), None)
+        testbenches = sorted(d.glob('*_tb.sv')) + sorted(d.glob('*_tb.v'))
+        if spec is None or not testbenches:
+            continue
+        reference = next(iter(sorted(d.glob('*_ref.sv'))), None)
+        problems.append({
+            'prob_id': d.name,
+            'specification': str(spec),
+            'reference': str(reference) if reference else None,
+            'testbench': str(testbenches[0]) if len(testbenches) == 1 else [str(t) for t in testbenches],
+            'bm_type': 'verilog-eval' if testbenches[0].suffix == '.sv' else 'autochip',
+            'top_module_name': 'TopModule',
+        })
+    return problems
+
+
+class ProblemRunner:
+    """ The reflection chain of one problem, advanced one attempt at a time. """
+
+    def __init__(
+            self, problem: dict, *,
+            reviewer_kwargs: dict,
+            generator_kwargs: dict,
+            output_dir: Path,
+            verify_kwargs: Optional[dict] = None,
+            use_in_context_history: bool = False,
+            max_history_length: int = 5,
+            verbose: bool = False
+    ):
+        # Imported here, as only live runs need them.
+        from ReChisel.generator import Generator
+        from ReChisel.reviewer import Reviewer
+        from ReChisel.testcase import Testcase
+        from ReChisel.tracing import Tracing
+        from ReChisel.usage import UsageTracker
+
+        self.problem = problem
+        self.testcase = Testcase(
+            prob_id=problem['prob_id'],
+            specification_path=problem['specification'],
+            reference_path=problem['reference'],
+            testbench_path=problem['testbench'],
+        )
+        self.usage_tracker = UsageTracker(problem['prob_id'])
+        self.generator = Generator(**generator_kwargs, usage_tracker=self.usage_tracker, verbose=verbose)
+        self.generator.testcase_prepare(self.testcase, problem['top_module_name'])
+        self.tracing = Tracing(self.testcase, usage_tracker=self.usage_tracker)
+        # Per problem, so that reviewer calls count towards the problem's usage and the suite budgets.
+        self._reviewer = Reviewer(**reviewer_kwargs, usage_tracker=self.usage_tracker, verbose=verbose)
+        self._output_dir = Path(output_dir)
+        self._verify_kwargs = verify_kwargs or {}
+        self._use_in_context_history = use_in_context_history
+        self._max_history_length = max_history_length
+        self._verbose = verbose
+
+        self.attempts = 0
+        self.chisel_code = None
+        self.verify_result: Optional[VerifyResult] = None
+        self.reviewer_response = None
+        self.is_passed = False
+
+    def step(self) -> tuple[int, int]:
+        """ Generate or correct, verify, and review a failure. Returns `attempt_outcome`. """
+        from ReChisel.tracing import in_context_attempt_history_format
+        from ReChisel.verifier import verify
+
+        self.usage_tracker.attempt = self.attempts
+        self.attempts += 1
+        if self.reviewer_response is None:
+            response = self.generator.initial_chisel_generation()
+        else:
+            in_context_history = None
+            if self._use_in_context_history:
+                in_context_history = in_context_attempt_history_format(self.tracing, k=self._max_history_length)
+            response = self.generator.correction_generation(
+                self.reviewer_response, self.verify_result, self.chisel_code, in_context_history=in_context_history
+            )
+        chisel_code = self.generator.code_extract(response)
+        try:
+            verify_result = verify(
+                chisel_code, self.testcase, output_dir=self._output_dir, bm_type=self.problem['bm_type'],
+                verbose=self._verbose, **self._verify_kwargs
+            )
+        except ValueError:
+            # No usable Scala code block; the next attempt retries from the same state.
+            return attempt_outcome(None)
+        self.chisel_code, self.verify_result = chisel_code, verify_result
+        if verify_result.functionality_correct:
+            self.is_passed = True
+        else:
+            self.reviewer_response = self._reviewer(self.testcase, verify_result, chisel_code)
+            self.tracing.add_attempt(chisel_code, verify_result, self.reviewer_response)
+        return attempt_outcome(verify_result)
+
+    def result_dict(self, common: dict) -> dict:
+        """ The result in the format of `rechisel_cli.py`, so `ResultsStore` can ingest it. """
+        return {
+            **common,
+            'testcase': self.testcase.to_dict(),
+            'attempts': [attempt.to_dict() for attempt in self.tracing.attempts],
+            'usage': self.usage_tracker.to_dict(),
+            'is_passed': self.is_passed,
+            'final_chisel_code': self.chisel_code.raw_stripped if self.chisel_code else None,
+            'final_verify_result': self.verify_result.__dict__() if self.verify_result else None,
+        }
+
+
+def run_suite(
+        runners: dict[str, ProblemRunner], scheduler: AttemptScheduler, *,
+        max_total_attempts: Optional[int] = None,
+        budget: Optional[Budget] = None,
+        workers: int = 1
+) -> SuiteProgress:
+    """
+    Give attempts to problems in the scheduler's order until every problem is solved or out of
+    attempts, or a global budget is used up. Up to `workers` problems run an attempt at once;
+    budgets are checked before each attempt starts, so running attempts may exceed them.
+    """
+    budget = budget or Budget()
+    progress = SuiteProgress()
+    start = time.monotonic()
+    started = completed = 0
+
+    def _totals() -> tuple[int, float]:
+        return (
+            sum(r.usage_tracker.total_tokens for r in runners.values()),
+            sum(r.usage_tracker.total_cost for r in runners.values()),
+        )
+
+    def _budget_left() -> bool:
+        if max_total_attempts is not None and started >= max_total_attempts:
+            return False
+        return budget.exceeded(*_totals(), time.monotonic() - start) is None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        running = {}
+        while True:
+            while len(running) < workers and _budget_left():
+                prob_id = scheduler.next_problem()
+                if prob_id is None:
+                    break
+                running[pool.submit(runners[prob_id].step)] = prob_id
+                started += 1
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                prob_id = running.pop(future)
+                completed += 1
+                try:
+                    scheduler.report(prob_id, *future.result())
+                except Exception as e:
+                    print(f"Attempt of {prob_id} failed: {e!r}; giving up on the problem.")
+                    scheduler.release(prob_id)
+                tokens, cost = _totals()
+                progress.record(
+                    attempts=completed,
+                    tokens=tokens, cost=cost, seconds=time.monotonic() - start,
+                    solved=sum(p.solved for p in scheduler.problems.values()),
+                )
+    return progress
+
+
+def _print_comparison(reports: list[dict]):
+    print(f"{'policy':>12} {'attempts':>9} {'solved':>7} {'per 100 att.':>13}  solved after each quarter of the attempts")
+    for report in reports:
+        s = report['summary']
+        per_100 = f"{s['solved_per_100_attempts']:.1f}" if s['solved_per_100_attempts'] is not None else '-'
+        print(f"{report['policy']:>12} {s['attempts']:>9} {s['solved']:>7} {per_100:>13}  {s['solved_at_attempt_quarters']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Schedule attempts across a benchmark suite under a global budget")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    p_sim = subparsers.add_parser('simulate', help='Compare policies by replaying runs recorded in a results store')
+    p_sim.add_argument('results_db', type=str, help='Results store (SQLite file) of rechisel_cli.py runs')
+    p_sim.add_argument('--max-total-attempts', type=int, nargs='+', default=[None], help='Attempt budgets to compare at (default: unlimited)')
+    p_sim.add_argument('--fit-prior', action='store_true', help='Fit the solve model to the recordings first (optimistic, as the recordings are also replayed)')
+
+    p_run = subparsers.add_parser('run', help='Run a suite')
+    p_run.add_argument('--suite', type=str, default=None, help='JSON or JSONL file of problems (see `load_suite`)')
+    p_run.add_argument('--benchmarks', type=str, default='benchmarks', help='Benchmark directory, used without --suite')
+    p_run.add_argument('--policy', type=str, default='adaptive', choices=['adaptive', 'round-robin'], help='Scheduling policy')
+    p_run.add_argument('--workers', type=int, default=1, help='Number of problems running an attempt at once')
+    p_run.add_argument('--max-total-attempts', type=int, default=None, help='Attempt budget for the whole suite')
+    p_run.add_argument('--max-tokens', type=int, default=None, help='Token budget for the whole suite')
+    p_run.add_argument('--max-cost', type=float, default=None, help='Cost budget in USD for the whole suite')
+    p_run.add_argument('--max-seconds', type=float, default=None, help='Wall-clock budget in seconds for the whole suite')
+    p_run.add_argument('--prior-results-db', type=str, default=None, help='Fit the solve model to runs recorded in this results store')
+    p_run.add_argument('--init-gen-model', type=str, default='gpt-4o-mini', help='Initial generation model')
+    p_run.add_argument('--correction-model', type=str, default='gpt-4o-mini', help='Correction model')
+    p_run.add_argument('--reviewer-model', type=str, default='gpt-4o-mini', help='Reviewer model')
+    p_run.add_argument('--prompts-dir', type=str, default='prompts', help='Directory with the prompt files of rechisel_cli.py, under their default names')
+    p_run.add_argument('--use-in-context-history', action='store_true', help='Use in-context history for reflection')
+    p_run.add_argument('--max-history-length', type=int, default=5, help='Maximum length of history to keep in tracing')
+    p_run.add_argument('--verifier-working-dir', type=str, default='output/suite/verification', help='Working directory for verification output, one subdirectory per problem')
+    p_run.add_argument('--chisel-toolchain', type=str, default='chisel3', choices=['chisel3', 'circt'], help='Chisel toolchain profile')
+    p_run.add_argument('--syntax-precheck', type=str, default=None, choices=['lexer', 'tree-sitter'], help='Reject code with Scala syntax errors without launching sbt')
+    p_run.add_argument('-o', '--output-dir', type=str, default='output/suite', help='Directory for the per-problem results and the suite report')
+    p_run.add_argument('--results-db', type=str, default=None, help='Append per-problem results to this results store')
+    p_run.add_argument('--verbose', action='store_true', help='Enable verbose output')
+
+    for p in (p_sim, p_run):
+        p.add_argument('--max-attempts-per-problem', type=int, default=10, help='Maximum number of attempts for any one problem')
+        p.add_argument('--max-wait-steps', type=int, default=None, help='Scheduling steps after which a waiting problem goes first (adaptive; default: 3x the number of problems)')
+    args = parser.parse_args()
+
+    if args.command == 'simulate':
+        store = ResultsStore(args.results_db)
+        sequences = recorded_sequences(store)
+        store.close()
+        print(f"{len(sequences)} recorded runs")
+        for max_total_attempts in args.max_total_attempts:
+            print(f"\nAttempt budget: {max_total_attempts or 'unlimited'}")
+            _print_comparison([
+                simulate(
+                    sequences, policy, max_total_attempts=max_total_attempts,
+                    max_attempts_per_problem=args.max_attempts_per_problem, max_wait_steps=args.max_wait_steps,
+                    prior=sequences if args.fit_prior else None
+                )
+                for policy in ('round-robin', 'adaptive')
+            ])
+        return
+
+    problems = load_suite(args.suite) if args.suite else discover_problems(args.benchmarks)
+    prompts = {
+        name: str(Path(args.prompts_dir) / f"{name}.txt")
+        for name in ('chisel_generation', 'syntax_correction', 'functionality_correction',
+                     'syntax_sbt_reflection', 'syntax_iv_reflection', 'functionality_reflection')
+    }
+    read = lambda name: Path(prompts[name]).read_text(encoding='utf-8')
+    reviewer_kwargs = {
+        'sbt_system_prompt': read('syntax_sbt_reflection'),
+        'iv_system_prompt': read('syntax_iv_reflection'),
+        'functionality_system_prompt': read('functionality_reflection'),
+        'model': args.reviewer_model,
+    }
+    generator_kwargs = {
+        'init_gen_system_prompt': read('chisel_generation'),
+        'init_gen_model': args.init_gen_model,
+        'syntax_correction_system_prompt': read('syntax_correction'),
+        'functionality_correction_system_prompt': read('functionality_correction'),
+        'correction_model': args.correction_model,
+    }
+    verify_kwargs = {'toolchain': args.chisel_toolchain, 'syntax_precheck': args.syntax_precheck}
+    runners = {
+        problem['prob_id']: ProblemRunner(
+            problem, reviewer_kwargs=reviewer_kwargs, generator_kwargs=generator_kwargs,
+            output_dir=Path(args.verifier_working_dir) / problem['prob_id'],
+            verify_kwargs=verify_kwargs,
+            use_in_context_history=args.use_in_context_history,
+            max_history_length=args.max_history_length,
+            verbose=args.verbose
+        )
+        for problem in problems
+    }
+
+    model = SolveModel()
+    if args.prior_results_db:
+        store = ResultsStore(args.prior_results_db)
+        model.fit(recorded_sequences(store))
+        store.close()
+    scheduler = AttemptScheduler(
+        list(runners), policy=args.policy, model=model,
+        max_attempts_per_problem=args.max_attempts_per_problem,
+        max_wait_steps=args.max_wait_steps, verbose=args.verbose
+    )
+    progress = run_suite(
+        runners, scheduler,
+        max_total_attempts=args.max_total_attempts,
+        budget=Budget(args.max_tokens, args.max_cost, args.max_seconds),
+        workers=args.workers
+    )
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    common = {
+        'prompts': {
+            'init_gen_system_prompt': prompts['chisel_generation'],
+            'syntax_correction_system_prompt': prompts['syntax_correction'],
+            'functionality_correction_system_prompt': prompts['functionality_correction'],
+            'sbt_reflection_system_prompt': prompts['syntax_sbt_reflection'],
+            'iv_reflection_system_prompt': prompts['syntax_iv_reflection'],
+            'functionality_reflection_system_prompt': prompts['functionality_reflection'],
+        },
+        'llm_models': {
+            'init_gen_model': args.init_gen_model,
+            'correction_model': args.correction_model,
+            'reviewer_model': args.reviewer_model,
+        },
+        'config': {
+            'search': 'chain',
+            'scheduler_policy': args.policy,
+            'use_in_context_history': args.use_in_context_history,
+            'max_history_length': args.max_history_length,
+            'num_iterations': args.max_attempts_per_problem,
+            'chisel_toolchain': args.chisel_toolchain,
+            'syntax_precheck': args.syntax_precheck,
+        },
+    }
+    results_store = ResultsStore(args.results_db) if args.results_db else None
+    for prob_id, runner in runners.items():
+        rlt_dict = runner.result_dict({**common, 'config': {**common['config'], 'bm_type': runner.problem['bm_type']}})
+        (output_dir / f"{prob_id}.json").write_text(json.dumps(rlt_dict, indent=2, ensure_ascii=False), encoding='utf-8')
+        if results_store is not None and runner.attempts:
+            results_store.append_result(rlt_dict)
+    if results_store is not None:
+        results_store.close()
+
+    report = {
+        'policy': args.policy,
+        'budgets': {
+            'max_total_attempts': args.max_total_attempts,
+            'max_tokens': args.max_tokens,
+            'max_cost': args.max_cost,
+            'max_seconds': args.max_seconds,
+            'max_attempts_per_problem': args.max_attempts_per_problem,
+        },
+        'summary': progress.summary(len(runners)),
+        'problems': {
+            p.prob_id: {'attempts': p.attempts, 'solved': p.solved, 'last_state': p.key}
+            for p in scheduler.problems.values()
+        },
+        'solve_model': scheduler.model.to_dict(),
+        'timeline': progress.timeline,
+    }
+    (output_dir / 'suite_report.json').write_text(json.dumps(report, indent=2), encoding='utf-8')
+    _print_comparison([report])
+    print(f"Suite report saved to {output_dir / 'suite_report.json'}")
+
+
+if __name__ == '__main__':
+    main()
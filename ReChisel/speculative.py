@@ -0,0 +1,313 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+import threading
+import time
+from typing import Callable, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage
+
+from ReChisel.beam_search import verify_progress
+from ReChisel.chisel_code import ChiselCode
+from ReChisel.generator import Generator
+from ReChisel.reviewer import Reviewer
+from ReChisel.testcase import Testcase
+from ReChisel.tracing import Tracing, in_context_attempt_history_format
+from ReChisel.usage import extract_token_usage
+from ReChisel.verifier import VerifyResult, verify
+
+
+SPECULATIVE = 'speculative'
+CHAIN = 'chain'
+
+
+def failure_stage(verify_result: VerifyResult) -> str:
+    """ The pipeline stage a verification failed at: 'sbt', 'iv' or 'functionality'. """
+    if not verify_result.chisel_compile_to_verilog_success:
+        return 'sbt'
+    if not verify_result.verilog_compile_success:
+        return 'iv'
+    return 'functionality'
+
+
+@dataclass
+class Branch:
+    name: str
+    chisel_code: Optional[ChiselCode] = None
+    verify_result: Optional[VerifyResult] = None
+    # Seconds from the start of the race until the candidate was verified; None if it never was.
+    seconds: Optional[float] = None
+    # Tokens of the branch's LLM calls, including calls that finish after the branch was cancelled.
+    tokens: int = 0
+    cancelled: bool = False
+    error: Optional[Exception] = None
+
+    @property
+    def is_passed(self) -> bool:
+        return bool(self.verify_result and self.verify_result.functionality_correct)
+
+    def add_usage(self, response: BaseMessage):
+        self.tokens += sum(extract_token_usage(response))
+
+
+@dataclass
+class Race:
+    stage: str
+    speculative: Branch
+    chain: Branch
+    chosen: Optional[Branch] = None
+    # Seconds from the start of the race until a candidate was chosen.
+    decision_seconds: Optional[float] = None
+
+    @property
+    def other(self) -> Branch:
+        return self.chain if self.chosen is self.speculative else self.speculative
+
+
+@dataclass
+class SpeculationStats:
+    races: list[Race] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        """
+        Per failure stage: how often each branch won, and the trade-off against the plain chain.
+        Latency saved is measured against the chain branch where it ran to completion; where it
+        was cancelled, its duration is estimated by its mean duration in the completed races of
+        the same stage. Extra tokens are those of the branch that was not continued.
+        """
+        by_stage = {}
+        for stage in sorted({race.stage for race in self.races}):
+            races = [race for race in self.races if race.stage == stage]
+            chain_seconds = [r.chain.seconds for r in races if r.chain.seconds is not None]
+            mean_chain_seconds = sum(chain_seconds) / len(chain_seconds) if chain_seconds else None
+            measured, estimated, unestimated = 0.0, 0.0, 0
+            for race in races:
+                if race.decision_seconds is None:
+                    continue
+                if race.chain.seconds is not None:
+                    measured += max(0.0, race.chain.seconds - race.decision_seconds)
+                elif mean_chain_seconds is not None:
+                    estimated += max(0.0, mean_chain_seconds - race.decision_seconds)
+                else:
+                    unestimated += 1
+            by_stage[stage] = {
+                'races': len(races),
+                'speculative_chosen': sum(r.chosen is r.speculative for r in races),
+                'speculative_passed': sum(r.speculative.is_passed for r in races),
+                'chain_passed': sum(r.chain.is_passed for r in races),
+                'chain_cancelled': sum(r.chain.cancelled for r in races),
+                'latency_saved_seconds': measured,
+                'latency_saved_estimated_seconds': estimated,
+                'latency_saved_unestimated_races': unestimated,
+                'speculative_tokens': sum(r.speculative.tokens for r in races),
+                'chain_tokens': sum(r.chain.tokens for r in races),
+                'extra_tokens': sum(r.other.tokens for r in races if r.chosen is not None),
+            }
+        return {
+            'by_stage': by_stage,
+            'races': [
+                {
+                    'stage': race.stage,
+                    'chosen': race.chosen.name if race.chosen else None,
+                    'decision_seconds': race.decision_seconds,
+                    **{
+                        branch.name: {
+                            'seconds': branch.seconds,
+                            'tokens': branch.tokens,
+                            'passed': branch.is_passed,
+                            'cancelled': branch.cancelled,
+                        }
+                        for branch in (race.speculative, race.chain)
+                    },
+                }
+                for race in self.races
+            ],
+        }
+
+
+class SpeculativeCorrector:
+    """
+    Race a reviewer-free correction (specification and verification feedback only) against the
+    review-then-correct chain, verifying each candidate as soon as it is generated. The first
+    candidate that passes wins and the other branch is cancelled; otherwise both candidates are
+    verified and the one that got further in the pipeline is continued, the chain's on ties.
+    Both candidates are recorded in the `Tracing`.
+    """
+
+    def __init__(
+            self, *,
+            generator: Generator,
+            reviewer: Reviewer,
+            testcase: Testcase,
+            bm_type: str,
+            output_dir: Path,
+            use_in_context_history: bool = False,
+            max_history_length: int = 5,
+            summary_wait: float = 0.0,
+            verify_kwargs: Optional[dict] = None,
+            verify_fn: Callable[..., VerifyResult] = verify,
+            verbose: bool = False,
+    ):
+        self._generator = generator
+        self._reviewer = reviewer
+        self._testcase = testcase
+        self._bm_type = bm_type
+        self._output_dir = Path(output_dir)
+        self._use_in_context_history = use_in_context_history
+        self._max_history_length = max_history_length
+        self._summary_wait = summary_wait
+        self._verify_kwargs = verify_kwargs or {}
+        self._verify_fn = verify_fn
+        self._verbose = verbose
+        self.stats = SpeculationStats()
+        self._pools = []
+
+    def _log(self, message: str):
+        if self._verbose:
+            print(f"[SPECULATIVE] {message}")
+
+    def _verify(self, chisel_code: ChiselCode, output_dir: Path) -> VerifyResult:
+        return self._verify_fn(
+            chisel_code, self._testcase, output_dir=output_dir, bm_type=self._bm_type,
+            verbose=self._verbose, **self._verify_kwargs
+        )
+
+    def _history(self, tracing: Tracing):
+        if not self._use_in_context_history or not tracing.attempts:
+            return None
+        return in_context_attempt_history_format(tracing, k=self._max_history_length, summary_wait=self._summary_wait)
+
+    def race(
+            self,
+            tracing: Tracing,
+            chisel_code: ChiselCode,
+            verify_result: VerifyResult,
+            *,
+            origin: str = CHAIN
+    ) -> tuple[AIMessage, Branch]:
+        """
+        Correct the failed `chisel_code`. Adds its attempt (with `origin`) and the candidate that is
+        not continued to `tracing`, and returns the reviewer response and the continued branch.
+        """
+        race = Race(failure_stage(verify_result), Branch(SPECULATIVE), Branch(CHAIN))
+        self.stats.races.append(race)
+        cancel = threading.Event()
+        lock = threading.Lock()
+        reviewed = {}
+        # The speculative branch sees the history of the earlier attempts only, like the fused mode.
+        speculative_history = self._history(tracing)
+        start = time.monotonic()
+
+        def _finish(branch: Branch, response: AIMessage, output_dir: Path) -> Branch:
+            branch.chisel_code = self._generator.code_extract(response)
+            if cancel.is_set():
+                branch.cancelled = True
+                return branch
+            branch.verify_result = self._verify(branch.chisel_code, output_dir)
+            branch.seconds = time.monotonic() - start
+            return branch
+
+        def _speculative() -> Branch:
+            branch = race.speculative
+            response = self._generator.direct_correction_generation(
+                verify_result, chisel_code, in_context_history=speculative_history
+            )
+            branch.add_usage(response)
+            return _finish(branch, response, self._output_dir / 'speculative')
+
+        def _chain() -> Branch:
+            branch = race.chain
+            reviewer_response = self._reviewer(self._testcase, verify_result, chisel_code)
+            branch.add_usage(reviewer_response)
+            with lock:
+                if cancel.is_set():
+                    branch.cancelled = True
+                    return branch
+                reviewed['response'] = reviewer_response
+                tracing.add_attempt(chisel_code, verify_result, reviewer_response, origin=origin)
+            response = self._generator.correction_generation(
+                reviewer_response, verify_result, chisel_code, in_context_history=self._history(tracing)
+            )
+            branch.add_usage(response)
+            if cancel.is_set():
+                branch.cancelled = True
+                return branch
+            return _finish(branch, response, self._output_dir)
+
+        pool = ThreadPoolExecutor(max_workers=2)
+        self._pools.append(pool)
+        pending = {pool.submit(self._guarded, _speculative, race.speculative), pool.submit(self._guarded, _chain, race.chain)}
+        try:
+            while pending and race.chosen is None:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    branch = future.result()
+                    if branch.is_passed:
+                        self._log(f"The {branch.name} candidate passed after {branch.seconds:.1f}s, cancelling the other branch.")
+                        race.chosen = branch
+                        break
+        finally:
+            with lock:
+                cancel.set()
+            # A cancelled branch stops before its next LLM call or verification; it is not waited for.
+            pool.shutdown(wait=False, cancel_futures=True)
+        race.decision_seconds = time.monotonic() - start
+        return self._record(race, tracing, chisel_code, verify_result, reviewed.get('response'), origin)
+
+    def wait_for_cancelled(self):
+        """ Wait for the LLM calls of cancelled branches, so their tokens are in the stats. """
+        for pool in self._pools:
+            pool.shutdown(wait=True)
+        self._pools.clear()
+
+    def _guarded(self, fn: Callable[[], Branch], branch: Branch) -> Branch:
+        # Errors are recorded on the branch, so that the other branch runs to completion before
+        # `_record` decides whether to re-raise them.
+        try:
+            return fn()
+        except ValueError as e:
+            # The response has no usable Scala code block; the other branch may still have one.
+            self._log(f"Dropping the {branch.name} candidate: {e}")
+            branch.error = e
+            return branch
+        except Exception as e:
+            # E.g. `BudgetExceeded`, or a failed LLM or verification service call.
+            self._log(f"The {branch.name} branch failed: {type(e).__name__}: {e}")
+            branch.error = e
+            return branch
+
+    def _record(
+            self,
+            race: Race,
+            tracing: Tracing,
+            chisel_code: ChiselCode,
+            verify_result: VerifyResult,
+            reviewer_response: Optional[AIMessage],
+            origin: str
+    ) -> tuple[AIMessage, Branch]:
+        if race.chosen is None:
+            # Both branches are done. Unless a candidate passed, an error other than a missing code
+            # block ends the correction, as it would in the plain chain.
+            for branch in (race.chain, race.speculative):
+                if branch.error is not None and not isinstance(branch.error, ValueError):
+                    raise branch.error
+            candidates = [b for b in (race.chain, race.speculative) if b.verify_result is not None]
+            if not candidates:
+                raise race.chain.error or race.speculative.error
+            # `max` keeps the first of equal candidates, i.e. the chain's.
+            race.chosen = max(candidates, key=lambda b: verify_progress(b.verify_result))
+        self._log(
+            f"{race.stage} failure: continuing the {race.chosen.name} candidate after {race.decision_seconds:.1f}s "
+            f"(speculative {verify_progress(race.speculative.verify_result)}, chain {verify_progress(race.chain.verify_result)})."
+        )
+        if reviewer_response is None:
+            reviewer_response = AIMessage("(Review cancelled: the speculative correction of this attempt passed.)")
+            tracing.add_attempt(chisel_code, verify_result, reviewer_response, origin=origin)
+        other = race.other
+        if other.verify_result is not None:
+            tracing.add_attempt(
+                other.chisel_code, other.verify_result,
+                AIMessage(f"(Alternative {other.name} correction of the previous attempt; the {race.chosen.name} correction was continued instead.)"),
+                origin=other.name
+            )
+        return reviewer_response, race.chosen
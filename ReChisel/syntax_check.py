@@ -0,0 +1,315 @@
+import argparse
+from bisect import bisect_right
+from dataclasses import dataclass
+from functools import lru_cache
+import json
+from pathlib import Path
+import re
+import statistics
+import time
+from typing import Literal
+
+from ReChisel.chisel_code import ChiselCode
+
+
+SyntaxCheckBackend = Literal['lexer', 'tree-sitter']
+
+_CLOSERS = {'(': ')', '[': ']', '{': '}'}
+_CHAR_LITERAL = re.compile(r"'(?:[^'\\\n]|\\u[0-9a-fA-F]{4}|\\.)'")
+_SYMBOL_LITERAL = re.compile(r"'[A-Za-z_]\w*")
+# Verilog sized literals such as 4'b1010, outside of strings.
+_VERILOG_LITERAL = re.compile(r"\d+'[sS]?[bBoOdDhH][0-9a-fA-FxXzZ_]+")
+_MARKDOWN_FENCE = re.compile(r'^[ \t]*```', flags=re.MULTILINE)
+# Line-level constructs of other languages that can never parse as Scala. Checked on code
+# with comments and string literals blanked out.
+_FOREIGN_SYNTAX = [
+    (re.compile(r'^[ \t]*(?:endmodule|endcase|endfunction)\b', flags=re.MULTILINE), "Verilog syntax"),
+    (re.compile(r'^[ \t]*(?:always\s*@|always_ff\b|always_comb\b)', flags=re.MULTILINE), "Verilog syntax"),
+    (re.compile(r'^[ \t]*module\s+\w+\s*(?:#\s*)?\(', flags=re.MULTILINE), "Verilog syntax"),
+]
+# Python block headers, which end in ':'. A Scala line can end in ':' too when the type follows
+# on the next line (e.g. "def f(x: Int):" then "  UInt = ..."), so they are only reported if
+# the next non-blank line does not start like a type.
+_PYTHON_BLOCK_HEADERS = [
+    re.compile(r'^[ \t]*def\s+\w+\s*\([^)]*\)\s*(?:->\s*[^:]+)?:[ \t]*$', flags=re.MULTILINE),
+    re.compile(r'^[ \t]*(?:elif\b.*|else\s*):[ \t]*$', flags=re.MULTILINE),
+    re.compile(r'^[ \t]*(?:if|while|for)\s+[^(\s].*:[ \t]*$', flags=re.MULTILINE),
+]
+_TYPE_CONTINUATION = re.compile(r'[ \t]*(?:[A-Z]|\()')
+# At most this many diagnostics are reported; later ones are usually follow-up errors.
+_MAX_DIAGNOSTICS = 10
+
+
+@dataclass
+class SyntaxDiagnostic:
+    # 1-based, as reported by scalac.
+    line: int
+    column: int
+    message: str
+
+
+class _Positions:
+    def __init__(self, code: str):
+        self._line_starts = [0] + [m.end() for m in re.finditer(r'\n', code)]
+
+    def __call__(self, index: int) -> tuple[int, int]:
+        line = bisect_right(self._line_starts, index)
+        return line, index - self._line_starts[line - 1] + 1
+
+
+def _lexical_check(code: str) -> list[SyntaxDiagnostic]:
+    """
+    Errors that need no grammar to detect: unbalanced or mismatched brackets, unterminated
+    literals and comments (typical of truncated responses), Verilog literals, markdown fences,
+    and Verilog or Python lines. Conservative: only constructs that valid Scala 2 code does not
+    contain are reported.
+    """
+    position = _Positions(code)
+    diagnostics = []
+
+    def report(index: int, message: str):
+        diagnostics.append(SyntaxDiagnostic(*position(index), message))
+
+    # Comments and string literals blanked out, for the line-level checks below.
+    blanked = list(code)
+
+    def blank(start: int, end: int):
+        for k in range(start, end):
+            if blanked[k] != '\n':
+                blanked[k] = ' '
+
+    stack: list[tuple[str, int]] = []
+    structure_ok = True
+    i, n = 0, len(code)
+    while i < n:
+        c = code[i]
+        if code.startswith('//', i):
+            end = code.find('\n', i)
+            end = n if end == -1 else end
+            blank(i, end)
+            i = end
+        elif code.startswith('/*', i):
+            # Block comments nest in Scala.
+            depth, j = 1, i + 2
+            while j < n and depth:
+                if code.startswith('/*', j):
+                    depth, j = depth + 1, j + 2
+                elif code.startswith('*/', j):
+                    depth, j = depth - 1, j + 2
+                else:
+                    j += 1
+            if depth:
+                report(i, "unclosed comment")
+                return diagnostics
+            blank(i, j)
+            i = j
+        elif code.startswith('"""', i):
+            end = code.find('"""', i + 3)
+            if end == -1:
+                report(i, "unclosed multi-line string literal")
+                return diagnostics
+            # Extra quotes before the closing delimiter belong to the string.
+            while code.startswith('""""', end):
+                end += 1
+            blank(i, end + 3)
+            i = end + 3
+        elif c == '"':
+            interpolated = i > 0 and (code[i - 1].isalnum() or code[i - 1] == '_')
+            j = i + 1
+            while j < n and code[j] not in '"\n':
+                if code[j] == '\\':
+                    j += 2
+                elif interpolated and code.startswith('${', j):
+                    depth, j = 1, j + 2
+                    while j < n and depth and code[j] != '\n':
+                        depth += {'{': 1, '}': -1}.get(code[j], 0)
+                        j += 1
+                else:
+                    j += 1
+            if j >= n or code[j] != '"':
+                report(i, "unclosed string literal")
+                return diagnostics
+            blank(i, j + 1)
+            i = j + 1
+        elif c == '`':
+            end = code.find('`', i + 1)
+            if end == -1 or '\n' in code[i:end]:
+                report(i, "unclosed quoted identifier")
+                return diagnostics
+            i = end + 1
+        elif c == "'":
+            digits = i
+            while digits > 0 and code[digits - 1].isdigit():
+                digits -= 1
+            if digits < i and _VERILOG_LITERAL.match(code, digits):
+                report(digits, "Verilog-style sized literal is not valid Scala; use e.g. \"b1010\".U(4.W)")
+                i = _VERILOG_LITERAL.match(code, digits).end()
+            elif m := _CHAR_LITERAL.match(code, i):
+                blank(i, m.end())
+                i = m.end()
+            elif m := _SYMBOL_LITERAL.match(code, i):
+                i = m.end()
+            else:
+                report(i, "unclosed character literal")
+                return diagnostics
+        elif c in _CLOSERS:
+            stack.append((c, i))
+            i += 1
+        elif c in ')]}':
+            if not stack:
+                report(i, f"eof expected but '{c}' found.")
+                structure_ok = False
+                break
+            opener, _ = stack.pop()
+            if _CLOSERS[opener] != c:
+                report(i, f"'{_CLOSERS[opener]}' expected but '{c}' found.")
+                structure_ok = False
+                break
+            i += 1
+        else:
+            i += 1
+    if structure_ok and stack:
+        opener, opened_at = stack[-1]
+        report(n, f"'{_CLOSERS[opener]}' expected but eof found (opened at line {position(opened_at)[0]}).")
+
+    text = "".join(blanked)
+    for m in _MARKDOWN_FENCE.finditer(code):
+        report(m.start(), "markdown code fence in Scala source")
+    for pattern, language in _FOREIGN_SYNTAX:
+        for m in pattern.finditer(text):
+            report(m.start() + len(m.group()) - len(m.group().lstrip()), f"{language} is not valid Scala")
+    for pattern in _PYTHON_BLOCK_HEADERS:
+        for m in pattern.finditer(text):
+            next_line = next((line for line in text[m.end():].split('\n')[1:] if line.strip()), '')
+            if not _TYPE_CONTINUATION.match(next_line):
+                report(m.start() + len(m.group()) - len(m.group().lstrip()), "Python syntax is not valid Scala")
+    diagnostics.sort(key=lambda d: (d.line, d.column))
+    return diagnostics[:_MAX_DIAGNOSTICS]
+
+
+@lru_cache(maxsize=1)
+def _tree_sitter_parser():
+    try:
+        import tree_sitter
+        import tree_sitter_scala
+    except ImportError as e:
+        raise ImportError(
+            "The tree-sitter syntax pre-check needs `pip install tree-sitter tree-sitter-scala`."
+        ) from e
+    return tree_sitter.Parser(tree_sitter.Language(tree_sitter_scala.language()))
+
+
+def _tree_sitter_check(code: str) -> list[SyntaxDiagnostic]:
+    """ ERROR and MISSING nodes of the tree-sitter-scala parse tree. """
+    tree = _tree_sitter_parser().parse(code.encode('utf-8'))
+    diagnostics = []
+
+    def visit(node):
+        if len(diagnostics) >= _MAX_DIAGNOSTICS or not (node.has_error or node.is_missing):
+            return
+        row, column = node.start_point
+        if node.is_missing:
+            diagnostics.append(SyntaxDiagnostic(row + 1, column + 1, f"'{node.type}' expected."))
+        elif node.type == 'ERROR':
+            snippet = node.text.decode('utf-8', errors='replace').split('\n')[0][:40]
+            diagnostics.append(SyntaxDiagnostic(row + 1, column + 1, f"syntax error near '{snippet}'"))
+            return
+        for child in node.children:
+            visit(child)
+
+    visit(tree.root_node)
+    return diagnostics
+
+
+def check_scala_syntax(code: str, backend: SyntaxCheckBackend = 'lexer') -> list[SyntaxDiagnostic]:
+    """ Syntax errors in a Scala source file; empty if none was found. """
+    if backend == 'lexer':
+        return _lexical_check(code)
+    elif backend == 'tree-sitter':
+        return _tree_sitter_check(code)
+    raise ValueError(f"Unknown syntax check backend: {backend}")
+
+
+def format_diagnostics(diagnostics: list[SyntaxDiagnostic], code: str, path: str = 'src/main/scala/Main.scala') -> str:
+    """ Diagnostics in the form sbt reports scalac errors, so that reviewers and prompts see familiar output. """
+    lines = code.split('\n')
+    out = []
+    for d in diagnostics:
+        source = lines[d.line - 1] if d.line <= len(lines) else ''
+        out.extend([
+            f"[error] {path}:{d.line}:{d.column}: {d.message}",
+            f"[error] {source}",
+            f"[error] {' ' * (d.column - 1)}^",
+        ])
+    out.append(f"[error] {len(diagnostics)} error{'s' if len(diagnostics) != 1 else ''} found")
+    out.append("[error] (Compile / compileIncremental) Compilation failed")
+    return "\n".join(out)
+
+
+# scalac parser (not typer or elaboration) errors, as reported by sbt.
+_SCALAC_PARSE_ERROR = re.compile(
+    r"expected but .* found|illegal start of|unclosed|eof expected|illegal character|"
+    r"Invalid literal number|malformed|is not a legal prefix|Missing closing brace"
+)
+
+
+def measure(result_paths: list[Path], backend: SyntaxCheckBackend, top_module_name: str) -> dict:
+    """
+    Compare the pre-check with the recorded sbt outcome of every attempt in `rechisel_cli.py`
+    result files. A false positive rejects code that sbt compiled; a false negative passes code
+    that sbt rejected with a parse error.
+    """
+    counts = {'attempts': 0, 'sbt_failed': 0, 'sbt_parse_errors': 0, 'flagged': 0,
+              'true_positives': 0, 'false_positives': 0, 'false_negatives': 0}
+    latencies, false_positives = [], []
+    for path in result_paths:
+        rlt = json.loads(Path(path).read_text(encoding='utf-8'))
+        # A passing attempt is only recorded as the final one; failing final attempts are also in `attempts`.
+        samples = {a['chisel_code']: a.get('verify_result') for a in rlt.get('attempts', []) if a.get('chisel_code')}
+        if rlt.get('final_chisel_code'):
+            samples[rlt['final_chisel_code']] = rlt.get('final_verify_result')
+        for chisel_code, vr in samples.items():
+            if not vr or vr.get('syntax_precheck_failed') or not vr.get('sbt_cmd_exec_result'):
+                # Only attempts with a real sbt outcome are ground truth.
+                continue
+            code = ChiselCode(f"```scala\n{chisel_code}\n```", top_module_name).decorated
+            start = time.perf_counter()
+            flagged = bool(check_scala_syntax(code, backend))
+            latencies.append((time.perf_counter() - start) * 1000)
+            sbt_ok = vr['chisel_compile_to_verilog_success']
+            sbt = vr['sbt_cmd_exec_result']
+            parse_error = not sbt_ok and bool(_SCALAC_PARSE_ERROR.search(sbt['stdout'] + sbt['stderr']))
+            counts['attempts'] += 1
+            counts['sbt_failed'] += not sbt_ok
+            counts['sbt_parse_errors'] += parse_error
+            counts['flagged'] += flagged
+            counts['true_positives'] += flagged and not sbt_ok
+            counts['false_positives'] += flagged and sbt_ok
+            counts['false_negatives'] += parse_error and not flagged
+            if flagged and sbt_ok:
+                false_positives.append(str(path))
+    return {
+        'backend': backend,
+        **counts,
+        'false_positive_rate': counts['false_positives'] / (counts['attempts'] - counts['sbt_failed'])
+        if counts['attempts'] > counts['sbt_failed'] else None,
+        'false_negative_rate': counts['false_negatives'] / counts['sbt_parse_errors'] if counts['sbt_parse_errors'] else None,
+        # Share of all sbt launches for failing code that the pre-check saves.
+        'sbt_failures_caught': counts['true_positives'] / counts['sbt_failed'] if counts['sbt_failed'] else None,
+        'median_ms': statistics.median(latencies) if latencies else None,
+        'max_ms': max(latencies) if latencies else None,
+        'false_positive_files': sorted(set(false_positives)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the Scala syntax pre-check against recorded sbt outcomes")
+    parser.add_argument('results', type=str, nargs='+', help='Result JSON files of rechisel_cli.py runs (without --syntax-precheck)')
+    parser.add_argument('--backend', type=str, default='lexer', choices=['lexer', 'tree-sitter'], help='Pre-check backend')
+    parser.add_argument('--top-module-name', type=str, default='TopModule', help='Top module name used for decoration')
+    args = parser.parse_args()
+    print(json.dumps(measure([Path(p) for p in args.results], args.backend, args.top_module_name), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -8,12 +8,20 @@ class Testcase:
         prob_id: str, 
         specification_path: Optional[str | Path] = None,
         reference_path: Optional[str | Path] = None,
-        testbench_path: Optional[str | Path] = None,
+        testbench_path: Optional[str | Path | list[str | Path]] = None,
+        seeds: Optional[list[int]] = None,
     ):
         self.prob_id = prob_id
         self._specification_path = Path(specification_path) if specification_path else None
         self._reference_path = Path(reference_path) if reference_path else None
-        self._testbench_path = Path(testbench_path) if testbench_path else None
+        # Several testbenches are simulated separately against the same compiled design.
+        if isinstance(testbench_path, (list, tuple)):
+            self._testbench_paths = [Path(p) for p in testbench_path if p]
+        else:
+            self._testbench_paths = [Path(testbench_path)] if testbench_path else []
+        self._testbench_path = self._testbench_paths[0] if self._testbench_paths else None
+        # Seeds for the `$random` stimulus of the testbenches; None runs each testbench once, unchanged.
+        self.seeds = list(seeds) if seeds else None
 
     def _read_file_safe(self, file_path: Optional[Path]) -> str:
         """ Safely read file content, return empty string if path is None or file doesn't exist """
@@ -36,6 +44,12 @@ class Testcase:
     def testbench_code(self) -> str:
         return self._read_file_safe(self._testbench_path)
 
+    @cached_property
+    def testbenches(self) -> list[tuple[str, str]]:
+        """ (file name, code) of each testbench that can be read """
+        testbenches = [(p.name, self._read_file_safe(p)) for p in self._testbench_paths]
+        return [(name, code) for name, code in testbenches if code]
+
     def to_dict(self) -> dict:
         """ Convert the Testcase instance to a dictionary representation """
         return {
@@ -43,14 +57,28 @@ class Testcase:
             'specification_path': str(self._specification_path) if self._specification_path else None,
             'reference_path': str(self._reference_path) if self._reference_path else None,
             'testbench_path': str(self._testbench_path) if self._testbench_path else None,
+            'testbench_paths': [str(p) for p in self._testbench_paths],
+            'seeds': self.seeds,
         }
 
+    @classmethod
+    def from_dict(cls, d: dict) -> 'Testcase':
+        """ Create a Testcase from the output of `to_dict` """
+        return cls(
+            prob_id=d['prob_id'],
+            specification_path=d.get('specification_path'),
+            reference_path=d.get('reference_path'),
+            testbench_path=d.get('testbench_paths') or d.get('testbench_path'),
+            seeds=d.get('seeds'),
+        )
+
     def __str__(self) -> str:
         return (
             f"Testcase(prob_id={self.prob_id}, "
             f"specification_path={self._specification_path}, "
             f"reference_path={self._reference_path}, "
-            f"testbench_path={self._testbench_path})"
+            f"testbench_paths={[str(p) for p in self._testbench_paths]}, "
+            f"seeds={self.seeds})"
         )
     
     def __repr__(self) -> str:
@@ -0,0 +1,109 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import json
+from pathlib import Path
+import resource
+import statistics
+import time
+
+from ReChisel.chisel_code import ChiselCode
+from ReChisel.testcase import Testcase
+from ReChisel.toolchains import TOOLCHAINS, get_toolchain
+from ReChisel.verifier import Verifier, VerifierWorkingSpace
+
+
+def _elaborate(scala_path: str, toolchain: str, working_dir: str, sbt_command: str) -> dict:
+    """ Elaborate one design to Verilog. Runs in a fresh process so that peak memory is per run. """
+    chisel_toolchain = get_toolchain(toolchain)
+    code = ChiselCode(f"```scala\n{Path(scala_path).read_text(encoding='utf-8')}\n```", 'TopModule')
+    working_space = VerifierWorkingSpace(
+        Path(working_dir) / 'chisel', Path(working_dir) / 'iv', sbt_build_path=chisel_toolchain.build_sbt
+    )
+    verifier = Verifier(working_space, sbt_command=sbt_command, toolchain=chisel_toolchain)
+    # No reference or testbench: only elaboration is run.
+    verifier.prepare(code, testcase=Testcase('bench'))
+    start = time.monotonic()
+    ok = verifier.chisel_compile_to_verilog()
+    elapsed = time.monotonic() - start
+    return {
+        'design': scala_path,
+        'toolchain': toolchain,
+        'ok': ok,
+        'seconds': elapsed,
+        # Largest resident set of any descendant, i.e. the sbt/JVM process; KiB on Linux.
+        'peak_rss_mib': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+        'verilog_lines': len(verifier.result.compiled_verilog_code.splitlines()) if ok else 0,
+    }
+
+
+def benchmark(
+        designs: list[Path], toolchains: list[str], working_dir: Path, *,
+        repeat: int = 3, sbt_command: str = 'sbt run'
+) -> list[dict]:
+    """
+    Elaborate every design `repeat` times with every toolchain, each run in its own process.
+    The first run of each toolchain also resolves its dependencies and is reported separately.
+    """
+    results = []
+    for toolchain in toolchains:
+        for i in range(repeat):
+            for design in designs:
+                with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as pool:
+                    result = pool.submit(
+                        _elaborate, str(design), toolchain, str(working_dir / toolchain), sbt_command
+                    ).result()
+                result['run'] = i
+                results.append(result)
+                print(
+                    f"{toolchain:>8} run {i} {design}: {'ok' if result['ok'] else 'FAILED':>6} "
+                    f"{result['seconds']:7.1f} s {result['peak_rss_mib']:8.0f} MiB"
+                )
+    return results
+
+
+def summarize(results: list[dict]) -> dict:
+    summary = {}
+    for toolchain in sorted({r['toolchain'] for r in results}):
+        runs = [r for r in results if r['toolchain'] == toolchain]
+        cold = runs[0]
+        warm = [r for r in runs[1:] if r['ok']] or [r for r in runs if r['ok']]
+        summary[toolchain] = {
+            'runs': len(runs),
+            'failures': sum(not r['ok'] for r in runs),
+            'cold_seconds': cold['seconds'],
+            'median_seconds': statistics.median(r['seconds'] for r in warm) if warm else None,
+            'median_peak_rss_mib': statistics.median(r['peak_rss_mib'] for r in warm) if warm else None,
+            'max_peak_rss_mib': max(r['peak_rss_mib'] for r in runs),
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare elaboration time and peak memory of the Chisel toolchain profiles")
+    parser.add_argument('designs', type=str, nargs='*', help='Chisel files with a `TopModule` (default: the bundled benchmarks)')
+    parser.add_argument('--toolchains', type=str, nargs='+', default=sorted(TOOLCHAINS), choices=sorted(TOOLCHAINS), help='Toolchain profiles to compare')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs per design and toolchain')
+    parser.add_argument('--sbt-command', type=str, default='sbt run', help='sbt command used for elaboration')
+    parser.add_argument('--working-dir', type=str, default='output/toolchain_benchmark', help='Working directory for the builds')
+    parser.add_argument('--output', type=str, default=None, help='Write all runs and the summary to this JSON file')
+    args = parser.parse_args()
+
+    designs = [Path(d) for d in args.designs] or sorted(Path('benchmarks').glob('*/*.scala'))
+    results = benchmark(designs, args.toolchains, Path(args.working_dir), repeat=args.repeat, sbt_command=args.sbt_command)
+    summary = summarize(results)
+
+    print(f"\n{'toolchain':>10} {'fail':>5} {'cold (s)':>9} {'median (s)':>11} {'median RSS (MiB)':>17} {'max RSS (MiB)':>14}")
+    for toolchain, s in summary.items():
+        median_seconds = f"{s['median_seconds']:.1f}" if s['median_seconds'] is not None else '-'
+        median_rss = f"{s['median_peak_rss_mib']:.0f}" if s['median_peak_rss_mib'] is not None else '-'
+        print(
+            f"{toolchain:>10} {s['failures']:>5} {s['cold_seconds']:>9.1f} {median_seconds:>11} "
+            f"{median_rss:>17} {s['max_peak_rss_mib']:>14.0f}"
+        )
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps({'runs': results, 'summary': summary}, indent=2), encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
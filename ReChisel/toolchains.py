@@ -0,0 +1,92 @@
+from dataclasses import dataclass
+import os
+from pathlib import Path
+import shutil
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class ChiselToolchain:
+    """
+    How generated Chisel code is built into Verilog: the sbt build file template and the
+    `Main` wrapper that elaborates the top module into `generated/`.
+    """
+    name: str
+    build_sbt: str
+    stage_import: str
+    # Body of `object Main extends App`; `{top}` is replaced by the top module name.
+    emit_statement: str
+    # Executables the toolchain runs besides sbt, located via `PATH`.
+    required_executables: tuple = ()
+
+    def decorate(self, raw_stripped: str, top_module_name: str) -> str:
+        return (
+            f"package {top_module_name}\n\n"
+            "import chisel3._\n"
+            "import chisel3.util._\n\n"
+            f"{self.stage_import}\n\n"
+            #
+            f"{raw_stripped}\n\n"
+            #
+            "object Main extends App {\n"
+            f"{self.emit_statement.replace('{top}', top_module_name)}"
+            "}\n"
+        )
+
+    def sbt_env(self) -> Optional[dict]:
+        """ Environment for sbt, or None to inherit it unchanged. """
+        if 'firtool' not in self.required_executables or 'CHISEL_FIRTOOL_PATH' in os.environ:
+            return None
+        firtool = shutil.which('firtool')
+        if firtool is None:
+            # Chisel then downloads a firtool release itself.
+            return None
+        # Makes Chisel use the local firtool instead of downloading one.
+        return {**os.environ, 'CHISEL_FIRTOOL_PATH': str(Path(firtool).parent)}
+
+
+# Chisel 3.6 with the Scala FIRRTL compiler (the original setup).
+CHISEL3 = ChiselToolchain(
+    name='chisel3',
+    build_sbt='build.sbt',
+    stage_import="import chisel3.stage.ChiselStage",
+    emit_statement=(
+        "    (new ChiselStage).emitVerilog(\n"
+        "      new {top},\n"
+        "      Array(\n"
+        "        \"--target-dir\", \"generated\",\n"
+        "        \"--emission-options=disableMemRandomization,disableRegisterRandomization\",\n"
+        "      )\n"
+        "    )\n"
+    ),
+)
+
+# Chisel 6 with CIRCT: elaboration in Scala, lowering to Verilog by `firtool`.
+CIRCT = ChiselToolchain(
+    name='circt',
+    build_sbt='build_circt.sbt',
+    # Generated code lives in `package <top>`, so the top-level `circt` package is named explicitly.
+    stage_import="import _root_.circt.stage.ChiselStage",
+    emit_statement=(
+        "    ChiselStage.emitSystemVerilogFile(\n"
+        "      new {top},\n"
+        "      Array(\"--target-dir\", \"generated\"),\n"
+        "      Array(\n"
+        # Same as `disableMemRandomization,disableRegisterRandomization` of the Chisel 3 profile.
+        "        \"-disable-all-randomization\",\n"
+        "        \"-strip-debug-info\",\n"
+        # Constructs Icarus Verilog does not support.
+        "        \"-lowering-options=disallowLocalVariables,disallowPackedArrays,locationInfoStyle=none\",\n"
+        "      )\n"
+        "    )\n"
+    ),
+    required_executables=('firtool',),
+)
+
+TOOLCHAINS = {t.name: t for t in (CHISEL3, CIRCT)}
+
+
+def get_toolchain(name: str) -> ChiselToolchain:
+    if name not in TOOLCHAINS:
+        raise ValueError(f"Unknown Chisel toolchain: {name}, expected one of {sorted(TOOLCHAINS)}")
+    return TOOLCHAINS[name]
@@ -1,39 +1,216 @@
 
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+import threading
+import time
+from typing import Optional
+
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 
+from ReChisel.blob_store import BlobStore
 from ReChisel.llms import get_llm_client, llm_call_with_retry
 from ReChisel.chisel_code import ChiselCode
 from ReChisel.testcase import Testcase
-from ReChisel.verifier import VerifyResult, collect_verify_feedback
+from ReChisel.usage import UsageTracker
+from ReChisel.utils import CommandExecResult
+from ReChisel.verifier import SimulationResult, VerifyResult, collect_verify_feedback
 
 
 class Attempt:
+    """
+    A compact record of one failed attempt.
+
+    Large strings (LLM responses, compiled Verilog, tool logs) are kept in a `BlobStore`
+    and only their keys are held here. `chisel_code`, `verify_result` and `reviewer_response`
+    are rebuilt from the store on access.
+    """
+    __slots__ = (
+        '_store', '_top_module_name', '_code_key', '_verify_record', '_reviewer_key',
+        '_llm_summary', '_llm_summary_future', 'origin'
+    )
+
     def __init__(
             self, 
             chisel_code: ChiselCode, 
             verify_result: VerifyResult,
             reviewer_response: AIMessage,
             *,
-            llm_summary: str = None
+            llm_summary: str = None,
+            llm_summary_future: Optional[Future] = None,
+            store: Optional[BlobStore] = None,
+            origin: str = 'chain'
     ):
-        self.chisel_code = chisel_code
-        self.verify_result = verify_result
-        self.reviewer_response = reviewer_response
+        self._store = store if store is not None else BlobStore()
+        # Which search path produced the code, e.g. 'speculative' for a reviewer-free correction.
+        self.origin = origin
+        self._top_module_name = chisel_code.top_module_name if chisel_code else None
+        self._code_key = self._store.put(chisel_code.response) if chisel_code else None
+        self._verify_record = self._pack_verify_result(verify_result) if verify_result else None
+        self._reviewer_key = self._store.put(reviewer_response.content) if reviewer_response else None
         self._llm_summary = llm_summary
+        # The LLM summary, if it is still being computed in the background.
+        self._llm_summary_future = llm_summary_future
+
+    def _pack_cmd_exec_result(self, cmd_exec_result: Optional[CommandExecResult]) -> Optional[tuple]:
+        if cmd_exec_result is None:
+            return None
+        return (
+            cmd_exec_result.return_code,
+            self._store.put(cmd_exec_result.stdout),
+            self._store.put(cmd_exec_result.stderr),
+        )
+
+    def _unpack_cmd_exec_result(self, record: Optional[tuple]) -> Optional[CommandExecResult]:
+        if record is None:
+            return None
+        return_code, stdout_key, stderr_key = record
+        return CommandExecResult(
+            return_code=return_code,
+            stdout=self._store.get(stdout_key),
+            stderr=self._store.get(stderr_key),
+        )
+
+    def _pack_verify_result(self, verify_result: VerifyResult) -> tuple:
+        return (
+            verify_result.chisel_compile_to_verilog_success,
+            self._store.put(verify_result.compiled_verilog_code),
+            self._pack_cmd_exec_result(verify_result.sbt_cmd_exec_result),
+            self._pack_cmd_exec_result(verify_result.iv_cmd_exec_result),
+            self._pack_cmd_exec_result(verify_result.vvp_cmd_exec_result),
+            verify_result.functionality_correct,
+            verify_result.formal_equivalent,
+            self._pack_cmd_exec_result(verify_result.equiv_cmd_exec_result),
+            verify_result.counterexample,
+            verify_result.syntax_precheck_failed,
+            tuple(
+                (
+                    sim.testbench,
+                    sim.seed,
+                    self._pack_cmd_exec_result(sim.iv_cmd_exec_result),
+                    self._pack_cmd_exec_result(sim.vvp_cmd_exec_result),
+                    sim.functionality_correct,
+                )
+                for sim in verify_result.simulations
+            ),
+        )
+
+    @property
+    def chisel_code(self) -> Optional[ChiselCode]:
+        if self._code_key is None:
+            return None
+        return ChiselCode(self._store.get(self._code_key), self._top_module_name)
+
+    @property
+    def verify_result(self) -> Optional[VerifyResult]:
+        if self._verify_record is None:
+            return None
+        (
+            chisel_ok, verilog_key, sbt, iv, vvp, functionality_correct,
+            formal_equivalent, equiv, counterexample, syntax_precheck_failed, simulations
+        ) = self._verify_record
+        return VerifyResult(
+            chisel_compile_to_verilog_success=chisel_ok,
+            compiled_verilog_code=self._store.get(verilog_key),
+            sbt_cmd_exec_result=self._unpack_cmd_exec_result(sbt),
+            iv_cmd_exec_result=self._unpack_cmd_exec_result(iv),
+            vvp_cmd_exec_result=self._unpack_cmd_exec_result(vvp),
+            functionality_correct=functionality_correct,
+            formal_equivalent=formal_equivalent,
+            equiv_cmd_exec_result=self._unpack_cmd_exec_result(equiv),
+            counterexample=counterexample,
+            syntax_precheck_failed=syntax_precheck_failed,
+            simulations=[
+                SimulationResult(
+                    testbench=testbench,
+                    seed=seed,
+                    iv_cmd_exec_result=self._unpack_cmd_exec_result(sim_iv),
+                    vvp_cmd_exec_result=self._unpack_cmd_exec_result(sim_vvp),
+                    functionality_correct=sim_correct,
+                )
+                for testbench, seed, sim_iv, sim_vvp, sim_correct in simulations
+            ],
+        )
+
+    @property
+    def reviewer_response(self) -> Optional[AIMessage]:
+        if self._reviewer_key is None:
+            return None
+        return AIMessage(self._store.get(self._reviewer_key))
 
     def to_dict(self):
+        chisel_code = self.chisel_code
+        verify_result = self.verify_result
+        reviewer_response = self.reviewer_response
         return {
-            "chisel_code": self.chisel_code.raw_stripped if self.chisel_code else None,
-            "verify_result": self.verify_result.__dict__() if self.verify_result else None,
-            "reviewer_response": self.reviewer_response.content if self.reviewer_response else None,
-            "llm_summary": self._llm_summary
+            "chisel_code": chisel_code.raw_stripped if chisel_code else None,
+            "verify_result": verify_result.__dict__() if verify_result else None,
+            "reviewer_response": reviewer_response.content if reviewer_response else None,
+            "llm_summary": self.llm_summary,
+            "origin": self.origin
         }
 
+    @property
+    def summary_pending(self) -> bool:
+        return self._llm_summary_future is not None and not self._llm_summary_future.done()
+
+    @property
+    def llm_summary_future(self) -> Optional[Future]:
+        return self._llm_summary_future
+
+    @property
+    def llm_summary(self) -> Optional[str]:
+        """ The LLM summary if it is available; None if not requested, still pending or failed. """
+        future = self._llm_summary_future
+        if self._llm_summary is None and future is not None and future.done() and future.exception() is None:
+            self._llm_summary = future.result()
+        return self._llm_summary
+
     @property
     def summary(self):
-        if self._llm_summary is None:
+        llm_summary = self.llm_summary
+        if llm_summary is None:
             return self.reviewer_response.content
-        return self._llm_summary
+        return llm_summary
+
+
+class SummaryStats:
+    """ Latency of background LLM summaries, and how often the history fell back to the reviewer response. """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requested = 0
+        self.completed = 0
+        self.failed = 0
+        self.fallbacks = 0
+        self.latencies: list[float] = []
+
+    def record_request(self):
+        with self._lock:
+            self.requested += 1
+
+    def record_done(self, latency: float, ok: bool):
+        with self._lock:
+            if ok:
+                self.completed += 1
+                self.latencies.append(latency)
+            else:
+                self.failed += 1
+
+    def record_fallback(self):
+        with self._lock:
+            self.fallbacks += 1
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            latencies = sorted(self.latencies)
+            return {
+                'requested': self.requested,
+                'completed': self.completed,
+                'failed': self.failed,
+                'fallbacks': self.fallbacks,
+                'latency_mean': sum(latencies) / len(latencies) if latencies else None,
+                'latency_p50': latencies[len(latencies) // 2] if latencies else None,
+                'latency_max': latencies[-1] if latencies else None,
+            }
 
 
 class Tracing:
@@ -42,41 +219,92 @@ class Tracing:
             *,
             use_llm_summary: bool = False,
             llm_summary_model: str = '',
-            llm_summary_system_prompt: str = ""
+            llm_summary_system_prompt: str = "",
+            blob_store: Optional[BlobStore] = None,
+            usage_tracker: Optional[UsageTracker] = None
     ):
         self.testcase = testcase
         self.attempts: list[Attempt] = []
+        # Shared by all attempts so that identical contents are stored only once.
+        self.blob_store = blob_store if blob_store is not None else BlobStore()
 
         self._use_llm_summary = use_llm_summary
         self._llm_summary_model = llm_summary_model
         self._llm_summary_system_prompt = llm_summary_system_prompt
+        self._usage_tracker = usage_tracker
+        # LLM summaries run in the background, off the critical path of the next correction.
+        self._summary_executor: Optional[ThreadPoolExecutor] = None
+        self.summary_stats = SummaryStats()
+
+    def _summarize(self, messages: list) -> str:
+        start = time.monotonic()
+        try:
+            client = get_llm_client(self._llm_summary_model)
+            response = llm_call_with_retry(
+                client, messages, usage_tracker=self._usage_tracker, role='summary', model=self._llm_summary_model
+            )
+        except Exception:
+            self.summary_stats.record_done(time.monotonic() - start, ok=False)
+            raise
+        self.summary_stats.record_done(time.monotonic() - start, ok=True)
+        return response.content
 
     def add_attempt(
             self, 
             chisel_code: ChiselCode, 
             verify_result: VerifyResult, 
-            reviewer_response: AIMessage
+            reviewer_response: AIMessage,
+            *,
+            origin: str = 'chain'
     ):
-        if not self._use_llm_summary:
-            llm_summary = None
-        else:
+        llm_summary_future = None
+        if self._use_llm_summary:
             messages = [
                 SystemMessage(self._llm_summary_system_prompt),
                 collect_verify_feedback(verify_result, chisel_code),
                 HumanMessage(f"# Reviewer Response:\n\n{reviewer_response.content}")
             ]
-            client = get_llm_client(self._llm_summary_model)
-            response = llm_call_with_retry(client, messages)
-            llm_summary = response.content
+            if self._summary_executor is None:
+                self._summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='llm-summary')
+            self.summary_stats.record_request()
+            llm_summary_future = self._summary_executor.submit(self._summarize, messages)
         
         trace_item = Attempt(
             chisel_code=chisel_code,
             verify_result=verify_result,
             reviewer_response=reviewer_response,
-            llm_summary=llm_summary
+            llm_summary_future=llm_summary_future,
+            store=self.blob_store,
+            origin=origin
         )
         self.attempts.append(trace_item)
 
+    def wait_for_summaries(self, timeout: Optional[float] = None):
+        """ Wait for pending background summaries, e.g. before writing the results. """
+        futures = [a.llm_summary_future for a in self.attempts if a.summary_pending]
+        if futures:
+            wait(futures, timeout=timeout)
+
+    @property
+    def use_llm_summary(self) -> bool:
+        return self._use_llm_summary
+
+    def fork(self) -> 'Tracing':
+        """ A new Tracing with the same settings and a copy of the attempt history, sharing the blob store. """
+        forked = Tracing(
+            self.testcase,
+            use_llm_summary=self._use_llm_summary,
+            llm_summary_model=self._llm_summary_model,
+            llm_summary_system_prompt=self._llm_summary_system_prompt,
+            blob_store=self.blob_store,
+            usage_tracker=self._usage_tracker
+        )
+        # Attempts only change when their background summary completes, so branches can share them.
+        forked.attempts = list(self.attempts)
+        forked._summary_executor = self._summary_executor
+        forked.summary_stats = self.summary_stats
+        return forked
+
     def last_k_attempts(self, k: int) -> list[Attempt]:
         if k < 0:
             return self.attempts
@@ -85,17 +313,30 @@ class Tracing:
 
 def in_context_attempt_history_format(
         tracing: Tracing, 
-        k: int = 5
+        k: int = 5,
+        *,
+        summary_wait: float = 0.0
 ) -> HumanMessage:
     """
     Format the last k trace items into a list of messages for in-context learning.
+
+    Background LLM summaries are used when they are ready. Up to `summary_wait` seconds in
+    total are spent waiting for pending ones; after that, the reviewer response is used instead.
     """
+    attempts = tracing.last_k_attempts(k)
+    pending = [a.llm_summary_future for a in attempts if a.summary_pending]
+    if pending and summary_wait > 0:
+        wait(pending, timeout=summary_wait)
+    for item in attempts:
+        if item.llm_summary_future is not None and item.llm_summary is None:
+            tracing.summary_stats.record_fallback()
+
     traces = [
         f"## Attempt {i + 1}\n\n"
         f"Chisel Code (omitted):\n"
         f"```scala\n{item.chisel_code.raw_stripped}\n```\n"
         f"Summary: {item.summary}\n\n"
-        for i, item in enumerate(tracing.last_k_attempts(k))
+        for i, item in enumerate(attempts)
     ]
     return HumanMessage(
         "Below are the most recent consecutive k attempts trying to implement this Chisel module. "
@@ -0,0 +1,220 @@
+from dataclasses import dataclass
+import fcntl
+import json
+from pathlib import Path
+import threading
+import time
+from typing import Optional
+
+from langchain_core.messages import BaseMessage
+
+
+# USD per million tokens: (input, output). Override with a JSON file of the same shape.
+DEFAULT_PRICE_TABLE = {
+    'gpt-4o': (2.50, 10.00),
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4.1': (2.00, 8.00),
+    'claude-3.5-sonnet-v2': (3.00, 15.00),
+    'claude-3.5-haiku': (0.80, 4.00),
+}
+
+
+class BudgetExceeded(RuntimeError):
+    """Raised before an LLM call (or search step) when a token, cost, time or call budget is used up."""
+    pass
+
+
+def load_price_table(path: Optional[str | Path] = None) -> dict:
+    """ The default price table, updated with `{model: [input_usd_per_1m, output_usd_per_1m]}` from `path`. """
+    table = dict(DEFAULT_PRICE_TABLE)
+    if path:
+        table.update({k: tuple(v) for k, v in json.loads(Path(path).read_text(encoding='utf-8')).items()})
+    return table
+
+
+def extract_token_usage(response: BaseMessage) -> tuple[int, int]:
+    """ (input_tokens, output_tokens) reported by the provider, or (0, 0) if not reported. """
+    usage = getattr(response, 'usage_metadata', None)
+    if usage:
+        return usage.get('input_tokens', 0), usage.get('output_tokens', 0)
+    # Older integrations only fill `response_metadata`: OpenAI uses `token_usage`, Bedrock `usage`.
+    metadata = getattr(response, 'response_metadata', None) or {}
+    usage = metadata.get('token_usage') or metadata.get('usage') or {}
+    return (
+        usage.get('prompt_tokens', usage.get('input_tokens', 0)) or 0,
+        usage.get('completion_tokens', usage.get('output_tokens', 0)) or 0,
+    )
+
+
+@dataclass
+class Budget:
+    # None means unlimited.
+    max_tokens: Optional[int] = None
+    max_cost: Optional[float] = None
+    max_seconds: Optional[float] = None
+
+    def exceeded(self, tokens: int, cost: float, seconds: float) -> Optional[str]:
+        if self.max_tokens is not None and tokens >= self.max_tokens:
+            return f"token budget exhausted ({tokens} >= {self.max_tokens})"
+        if self.max_cost is not None and cost >= self.max_cost:
+            return f"cost budget exhausted (${cost:.4f} >= ${self.max_cost:.4f})"
+        if self.max_seconds is not None and seconds >= self.max_seconds:
+            return f"wall-clock budget exhausted ({seconds:.0f} s >= {self.max_seconds:.0f} s)"
+        return None
+
+
+@dataclass
+class UsageRecord:
+    role: str
+    model: str
+    prob_id: str
+    attempt: int
+    input_tokens: int
+    output_tokens: int
+    cost: float
+    # Wall-clock time of the call, including retries.
+    seconds: float = 0.0
+
+
+class CampaignLedger:
+    """
+    Totals shared by all runs of a campaign, kept in a JSON file. Updates are serialized
+    with a file lock, so concurrent CLI processes can share one ledger.
+    """
+
+    def __init__(self, path: str | Path):
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._path.touch(exist_ok=True)
+        # Starts the campaign clock if this is the first run, so that reads never need to write.
+        self._update(lambda totals: totals)
+
+    def _update(self, fn) -> dict:
+        with self._path.open('r+', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            content = f.read()
+            totals = json.loads(content) if content.strip() else {
+                'started_at': time.time(), 'tokens': 0, 'cost': 0.0, 'runs': 0
+            }
+            totals = fn(totals)
+            f.seek(0)
+            f.truncate()
+            f.write(json.dumps(totals))
+            return totals
+
+    def totals(self) -> dict:
+        with self._path.open('r', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_SH)
+            return json.loads(f.read())
+
+    def add_usage(self, tokens: int, cost: float) -> dict:
+        def _add(totals):
+            totals['tokens'] += tokens
+            totals['cost'] += cost
+            return totals
+        return self._update(_add)
+
+    def add_run(self) -> dict:
+        def _add(totals):
+            totals['runs'] += 1
+            return totals
+        return self._update(_add)
+
+
+class UsageTracker:
+    """
+    Records the token usage of every LLM response, attributed to role, problem and attempt,
+    and enforces per-problem and per-campaign budgets before each call.
+    """
+
+    def __init__(
+            self,
+            prob_id: str,
+            *,
+            price_table: Optional[dict] = None,
+            problem_budget: Optional[Budget] = None,
+            campaign_budget: Optional[Budget] = None,
+            campaign_ledger: Optional[CampaignLedger] = None,
+    ):
+        self.prob_id = prob_id
+        # Set by the driver loop; calls are attributed to the current attempt.
+        self.attempt = 0
+        self._price_table = price_table if price_table is not None else dict(DEFAULT_PRICE_TABLE)
+        self._problem_budget = problem_budget or Budget()
+        self._campaign_budget = campaign_budget or Budget()
+        self._ledger = campaign_ledger
+        self._start_time = time.monotonic()
+        self._lock = threading.Lock()
+        self.records: list[UsageRecord] = []
+        self.stop_reason: Optional[str] = None
+
+    def cost(self, model: str, input_tokens: int, output_tokens: int) -> float:
+        input_price, output_price = self._price_table.get(model, (0.0, 0.0))
+        return (input_tokens * input_price + output_tokens * output_price) / 1e6
+
+    @property
+    def total_tokens(self) -> int:
+        with self._lock:
+            return sum(r.input_tokens + r.output_tokens for r in self.records)
+
+    @property
+    def total_cost(self) -> float:
+        with self._lock:
+            return sum(r.cost for r in self.records)
+
+    def record(self, response: BaseMessage, *, role: str, model: str, seconds: float = 0.0) -> UsageRecord:
+        input_tokens, output_tokens = extract_token_usage(response)
+        record = UsageRecord(
+            role=role, model=model, prob_id=self.prob_id, attempt=self.attempt,
+            input_tokens=input_tokens, output_tokens=output_tokens,
+            cost=self.cost(model, input_tokens, output_tokens),
+            seconds=seconds,
+        )
+        with self._lock:
+            self.records.append(record)
+        if self._ledger is not None:
+            # Added as the call is made, so that concurrent runs see it in their budget checks.
+            self._ledger.add_usage(input_tokens + output_tokens, record.cost)
+        return record
+
+    def check(self):
+        """ Raise `BudgetExceeded` if any per-problem or per-campaign budget is used up. """
+        tokens, cost = self.total_tokens, self.total_cost
+        reason = self._problem_budget.exceeded(tokens, cost, time.monotonic() - self._start_time)
+        if reason is None and self._ledger is not None:
+            # The ledger already includes this run's calls.
+            totals = self._ledger.totals()
+            reason = self._campaign_budget.exceeded(
+                totals['tokens'], totals['cost'], time.time() - totals['started_at']
+            )
+            reason = f"campaign {reason}" if reason else None
+        elif reason is not None:
+            reason = f"problem {reason}"
+        if reason is not None:
+            self.stop_reason = reason
+            raise BudgetExceeded(reason)
+
+    def commit_to_ledger(self):
+        """ Count this run in the campaign ledger once it is over; its usage was added call by call. """
+        if self._ledger is not None:
+            self._ledger.add_run()
+
+    def to_dict(self) -> dict:
+        def _totals(records) -> dict:
+            return {
+                'calls': len(records),
+                'input_tokens': sum(r.input_tokens for r in records),
+                'output_tokens': sum(r.output_tokens for r in records),
+                'cost': round(sum(r.cost for r in records), 6),
+                'seconds': sum(r.seconds for r in records),
+            }
+        with self._lock:
+            records = list(self.records)
+        return {
+            'total': _totals(records),
+            'by_role': {role: _totals([r for r in records if r.role == role]) for role in sorted({r.role for r in records})},
+            'by_attempt': [_totals([r for r in records if r.attempt == a]) for a in range(max((r.attempt for r in records), default=-1) + 1)],
+            'elapsed': time.monotonic() - self._start_time,
+            'stop_reason': self.stop_reason,
+            'unpriced_models': sorted({r.model for r in records if r.model not in self._price_table}),
+        }
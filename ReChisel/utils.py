@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 import re
 import subprocess
-from typing import Tuple, Optional, Union
+from typing import Callable, Tuple, Optional, Union
 
 
 @dataclass
@@ -15,6 +15,20 @@ class CommandExecResult:
         return self.return_code == 0
 
 
+# Installed by `ReChisel.cassette` to record or replay commands. Called as
+# `hook(run, command, **kwargs)`, where `run` executes the command for real.
+_command_hook: Optional[Callable[..., CommandExecResult]] = None
+
+
+def set_command_hook(hook: Optional[Callable[..., CommandExecResult]]):
+    global _command_hook
+    _command_hook = hook
+
+
+def get_command_hook() -> Optional[Callable[..., CommandExecResult]]:
+    return _command_hook
+
+
 def run_command(
     command: Union[str, list],
     *,
@@ -50,6 +64,25 @@ def run_command(
         subprocess.TimeoutExpired: If the command does not complete before the 
             timeout duration.
     """
+    kwargs = dict(
+        workingdir=workingdir, raise_on_error=raise_on_error, io_encoding=io_encoding,
+        use_shell=use_shell, env=env, timeout=timeout,
+    )
+    if _command_hook is not None:
+        return _command_hook(_run_command, command, **kwargs)
+    return _run_command(command, **kwargs)
+
+
+def _run_command(
+    command: Union[str, list],
+    *,
+    workingdir: Optional[str] = None,
+    raise_on_error: bool = False,
+    io_encoding: str = 'utf-8',
+    use_shell: bool = False,
+    env: Optional[dict] = None,
+    timeout: Optional[int] = None,
+) -> CommandExecResult:
     ansi_escape = re.compile(r'\x1B\[[0-?]*[ -/]*[@-~]')
 
     # If we're not using a shell, and the command is given as a string,
@@ -1,14 +1,143 @@
-from dataclasses import dataclass
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 from pathlib import Path
 import re
-from typing import Literal
+import threading
+from typing import TYPE_CHECKING, Literal, Optional
 import shutil
 
-from langchain_core.messages import HumanMessage
-
 from ReChisel.testcase import Testcase
 from ReChisel.chisel_code import ChiselCode
-from ReChisel.utils import CommandExecResult, run_command
+from ReChisel.formal import is_combinational, module_names, yosys_equivalence_check
+from ReChisel.syntax_check import SyntaxCheckBackend, check_scala_syntax, format_diagnostics
+from ReChisel.toolchains import CHISEL3, ChiselToolchain, get_toolchain
+from ReChisel.utils import CommandExecResult, get_command_hook, run_command
+
+if TYPE_CHECKING:
+    from langchain_core.messages import HumanMessage
+
+
+# VerilogEval testbenches report the functional result as `Mismatches: <n> in <m> samples`.
+MISMATCH_PATTERN = re.compile(r'Mismatches: (\d+) in (\d+) samples')
+
+
+def parse_mismatches(sim_output: str) -> Optional[int]:
+    """ Return the number of mismatched samples reported by the simulation, or None if not reported. """
+    match = MISMATCH_PATTERN.search(sim_output or '')
+    return int(match.group(1)) if match else None
+
+
+def evaluate_sim_output(sim_output: str, bm_type: Literal['autochip', 'verilog-eval']) -> bool:
+    """ Whether the simulation output reports a functionally correct design. """
+    # AutoChip
+    if bm_type == 'autochip':
+        return "All tests passed!" in sim_output
+    # Verilog Eval
+    elif bm_type == 'verilog-eval':
+        return parse_mismatches(sim_output) == 0
+    else:
+        raise ValueError(f"Unknown benchmark type: {bm_type}")
+
+
+# Seeding: unseeded `$random` calls draw from a variable set by a vvp plusarg instead. `$random(seed)`
+# updates `seed` in place; `$urandom(seed)` would only reseed, so it is left alone.
+SEED_VARIABLE = 'rechisel_seed'
+_UNSEEDED_RANDOM = re.compile(r'\$random\b(?!\s*\()')
+_MODULE_HEADER = re.compile(r'\bmodule\s+\w+[^;]*;')
+_COMMENT = re.compile(r'//[^\n]*|/\*.*?\*/', flags=re.DOTALL)
+_SEED_DECLARATION = (
+    f"\ninteger {SEED_VARIABLE};\n"
+    f"initial if (!$value$plusargs(\"{SEED_VARIABLE}=%d\", {SEED_VARIABLE})) {SEED_VARIABLE} = 0;\n"
+)
+
+
+def seed_testbench(code: str) -> str:
+    """
+    Make the unseeded `$random` calls of a testbench use a seed given to vvp as
+    `+rechisel_seed=<n>`, so that one compiled testbench can be simulated with several seeds.
+    """
+    # Module boundaries are searched with comments blanked out, keeping offsets unchanged.
+    blanked = _COMMENT.sub(lambda m: re.sub(r'[^\n]', ' ', m.group(0)), code)
+    edits = []
+    for header in _MODULE_HEADER.finditer(blanked):
+        end = blanked.find('endmodule', header.end())
+        calls = list(_UNSEEDED_RANDOM.finditer(blanked, header.end(), end if end >= 0 else len(blanked)))
+        if not calls:
+            continue
+        edits.append((header.end(), header.end(), _SEED_DECLARATION))
+        edits += [(c.start(), c.end(), f"$random({SEED_VARIABLE})") for c in calls]
+    for start, end, replacement in reversed(edits):
+        code = code[:start] + replacement + code[end:]
+    return code
+
+
+@dataclass
+class SimulationResult:
+    """ One testbench simulated with one seed (None: the testbench's own stimulus). """
+    testbench: str
+    seed: Optional[int] = None
+    iv_cmd_exec_result: CommandExecResult = None
+    vvp_cmd_exec_result: CommandExecResult = None
+    # None if the simulation did not run: the testbench did not compile, or the run stopped early.
+    functionality_correct: Optional[bool] = None
+
+    def to_dict(self) -> dict:
+        return {
+            'testbench': self.testbench,
+            'seed': self.seed,
+            'iv_cmd_exec_result': self.iv_cmd_exec_result.__dict__ if self.iv_cmd_exec_result else None,
+            'vvp_cmd_exec_result': self.vvp_cmd_exec_result.__dict__ if self.vvp_cmd_exec_result else None,
+            'functionality_correct': self.functionality_correct,
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> 'SimulationResult':
+        return cls(
+            testbench=d['testbench'],
+            seed=d.get('seed'),
+            iv_cmd_exec_result=CommandExecResult(**d['iv_cmd_exec_result']) if d.get('iv_cmd_exec_result') else None,
+            vvp_cmd_exec_result=CommandExecResult(**d['vvp_cmd_exec_result']) if d.get('vvp_cmd_exec_result') else None,
+            functionality_correct=d.get('functionality_correct'),
+        )
+
+
+# Jobs of the simulation pool. Each runs one iverilog or vvp process.
+
+def _compile_testbench(iv_dir: str, sources: list[str], output_fname: str) -> CommandExecResult:
+    # `-g2012` is used to enable SystemVerilog features.
+    return run_command(['iverilog', '-g2012', '-o', output_fname, *sources], workingdir=iv_dir)
+
+
+def _run_simulation(sim_dir: str, binary: str, seed: Optional[int]) -> CommandExecResult:
+    command = ['vvp', binary] + ([f'+{SEED_VARIABLE}={seed}'] if seed is not None else [])
+    return run_command(command, workingdir=sim_dir)
+
+
+class _InlineExecutor:
+    """ Runs each job when it is submitted, so that a command hook sees one command at a time. """
+
+    def submit(self, fn, *args) -> Future:
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+_simulation_pools: dict[int, ThreadPoolExecutor] = {}
+_simulation_pools_lock = threading.Lock()
+
+
+def _simulation_pool(workers: int) -> ThreadPoolExecutor:
+    """
+    A pool shared by all verifications in this process, bounding the concurrent iverilog/vvp
+    processes. Threads suffice, as the jobs wait on their subprocesses.
+    """
+    with _simulation_pools_lock:
+        if workers not in _simulation_pools:
+            _simulation_pools[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='simulation')
+        return _simulation_pools[workers]
 
 
 @dataclass
@@ -22,6 +151,20 @@ class VerifyResult:
     
     functionality_correct: bool = False
 
+    # Set by the optional formal equivalence check (see `ReChisel.formal`).
+    # None if the check was not run or was inconclusive, and simulation decided instead.
+    formal_equivalent: Optional[bool] = None
+    equiv_cmd_exec_result: CommandExecResult = None
+    counterexample: Optional[dict] = None
+
+    # Set if the syntax pre-check rejected the code; `sbt_cmd_exec_result` then holds its
+    # diagnostics and sbt was not run.
+    syntax_precheck_failed: bool = False
+
+    # Per testbench and seed, if the testcase has several testbenches or seeds. The iverilog and
+    # vvp results above are then those of the first failing simulation, or else of the first one.
+    simulations: list[SimulationResult] = field(default_factory=list)
+
     @property
     def verilog_compile_success(self):
         # verilog_compile_success is True if the Icarus Verilog command executed successfully.
@@ -30,6 +173,9 @@ class VerifyResult:
         # (i.e., `chisel_compile_to_verilog_success` is True).
         # This is because the Chisel code may generate Verilog code that is not compatible with
         # testbench or reference code, e.g., wrong module names, missing ports, etc.
+        # A conclusive formal check also implies this: Yosys parsed the code and its ports matched the reference.
+        if self.formal_equivalent is not None:
+            return True
         return self.iv_cmd_exec_result and self.iv_cmd_exec_result.is_ok
     
     @property
@@ -52,19 +198,55 @@ class VerifyResult:
         d['sbt_cmd_exec_result'] = self.sbt_cmd_exec_result.__dict__ if self.sbt_cmd_exec_result else None
         d['iv_cmd_exec_result'] = self.iv_cmd_exec_result.__dict__ if self.iv_cmd_exec_result else None
         d['vvp_cmd_exec_result'] = self.vvp_cmd_exec_result.__dict__ if self.vvp_cmd_exec_result else None
+        d['formal_equivalent'] = self.formal_equivalent
+        d['equiv_cmd_exec_result'] = self.equiv_cmd_exec_result.__dict__ if self.equiv_cmd_exec_result else None
+        d['counterexample'] = self.counterexample
+        d['syntax_precheck_failed'] = self.syntax_precheck_failed
+        d['simulations'] = [s.to_dict() for s in self.simulations]
         return d
 
+    @classmethod
+    def from_dict(cls, d: dict) -> 'VerifyResult':
+        """ Rebuild a VerifyResult from the output of `__dict__()`. Derived fields are ignored. """
+        def _cmd_exec_result(key: str) -> Optional[CommandExecResult]:
+            return CommandExecResult(**d[key]) if d.get(key) else None
+        return cls(
+            chisel_compile_to_verilog_success=d['chisel_compile_to_verilog_success'],
+            compiled_verilog_code=d['compiled_verilog_code'],
+            sbt_cmd_exec_result=_cmd_exec_result('sbt_cmd_exec_result'),
+            iv_cmd_exec_result=_cmd_exec_result('iv_cmd_exec_result'),
+            vvp_cmd_exec_result=_cmd_exec_result('vvp_cmd_exec_result'),
+            functionality_correct=d['functionality_correct'],
+            formal_equivalent=d.get('formal_equivalent'),
+            equiv_cmd_exec_result=_cmd_exec_result('equiv_cmd_exec_result'),
+            counterexample=d.get('counterexample'),
+            syntax_precheck_failed=d.get('syntax_precheck_failed', False),
+            simulations=[SimulationResult.from_dict(s) for s in d.get('simulations') or []],
+        )
+
 
 class VerifierWorkingSpace:
-    def __init__(self, chisel_dir: str | Path, iv_dir: str | Path, *, sbt_build_path: str | Path = 'build.sbt'):
+    def __init__(
+            self, chisel_dir: str | Path, iv_dir: str | Path, *, 
+            sbt_build_path: str | Path = 'build.sbt',
+            formal_dir: Optional[str | Path] = None,
+            keep_chisel_build: bool = False,
+            skeleton_dir: Optional[str | Path] = None
+    ):
 
         # Clear the directories and re-create them
         self.chisel_dir = Path(chisel_dir)
         self.iv_dir = Path(iv_dir)
-        shutil.rmtree(self.chisel_dir, ignore_errors=True)
-        shutil.rmtree(self.iv_dir, ignore_errors=True)
-        self.chisel_dir.mkdir(parents=True, exist_ok=True)
-        self.iv_dir.mkdir(parents=True, exist_ok=True)
+        self.formal_dir = Path(formal_dir) if formal_dir else None
+        for d in (self.chisel_dir, self.iv_dir, self.formal_dir):
+            if d is not None:
+                # With `keep_chisel_build`, sbt's `project/` and `target/` survive between
+                # verifications (and a running sbt server can be reused); only the previous output is removed.
+                if d == self.chisel_dir and keep_chisel_build:
+                    shutil.rmtree(d / "generated", ignore_errors=True)
+                else:
+                    shutil.rmtree(d, ignore_errors=True)
+                d.mkdir(parents=True, exist_ok=True)
 
         # Copy sbt build file to chisel dir
         # Make sure the sbt build file exists
@@ -73,6 +255,14 @@ class VerifierWorkingSpace:
             raise FileNotFoundError(f"SBT build file not found: {sbt_build_path}")
         shutil.copy2(sbt_build_path, self.chisel_dir / "build.sbt")
 
+        # Seed the build with a precompiled skeleton project (see `ReChisel.warmup`), so that
+        # sbt neither resolves dependencies nor compiles the build definition again.
+        if skeleton_dir is not None:
+            for sub in ("project", "target"):
+                src = Path(skeleton_dir) / sub
+                if src.exists() and not (self.chisel_dir / sub).exists():
+                    shutil.copytree(src, self.chisel_dir / sub, symlinks=True)
+
         # Prepare the Chisel Main.scala file
         main_scala_path = self.chisel_dir / "src/main/scala/Main.scala"
         main_scala_path.parent.mkdir(parents=True, exist_ok=True)
@@ -80,9 +270,18 @@ class VerifierWorkingSpace:
     
 
 class Verifier:
-    def __init__(self, working_space: VerifierWorkingSpace, *, verbose: bool = False):
+    def __init__(
+            self, working_space: VerifierWorkingSpace, *,
+            verbose: bool = False,
+            sbt_command: str = 'sbt run',
+            toolchain: ChiselToolchain = CHISEL3,
+            syntax_precheck: Optional[SyntaxCheckBackend] = None
+    ):
         self._working_space = working_space
         self._verbose = verbose
+        self._sbt_command = sbt_command
+        self._toolchain = toolchain
+        self._syntax_precheck = syntax_precheck
 
     @property
     def result(self):
@@ -97,35 +296,72 @@ class Verifier:
         self._log("Preparing the verification environment...")
         # Initialize the result object
         self._result = VerifyResult()
+        self._top_module_name = code.top_module_name
         
         # Build Chisel's compiler env.
         # Write the Chisel code to the `src/main/scala/Main.scala` file.
         chisel_code_path = self._working_space.chisel_dir / "src/main/scala/Main.scala"
-        chisel_code_path.write_text(code.decorated, encoding='utf-8')
+        self._scala_source = code.decorated_for(self._toolchain)
+        chisel_code_path.write_text(self._scala_source, encoding='utf-8')
         self._log(f"Chisel code written to {chisel_code_path}")
         
         # Move the reference code and testbench code to IV's working directory. 
         # All files in the `iv_dir` will be compiled by IV.
         self._log("Preparing reference and testbench code in IV working directory...")
         self._working_space.iv_dir.mkdir(parents=True, exist_ok=True)
-        files_to_write = [
-            (testcase.reference_code, f'{testcase.prob_id}_ref.sv'),
-            (testcase.testbench_code, f'{testcase.prob_id}_tb.sv')
-        ]
+        testbenches = testcase.testbenches
+        # Several testbenches or seeds: each testbench goes to its own subdirectory and is
+        # compiled separately, see `simulate_testbenches`.
+        self._multi_simulation = len(testbenches) > 1 or testcase.seeds is not None
+        self._seeds = testcase.seeds or [None]
+        files_to_write = [(testcase.reference_code, f'{testcase.prob_id}_ref.sv')]
+        if not self._multi_simulation:
+            files_to_write.append((testcase.testbench_code, f'{testcase.prob_id}_tb.sv'))
         for content, filename in files_to_write:
             if content:
                 _target = self._working_space.iv_dir / filename
                 _target.write_text(content, encoding='utf-8')
                 self._log(f"Written {_target}")
+
+        self._testbench_files = []
+        if self._multi_simulation:
+            for idx, (name, content) in enumerate(testbenches):
+                _target = self._working_space.iv_dir / f"tb{idx}" / name
+                _target.parent.mkdir(parents=True, exist_ok=True)
+                _target.write_text(seed_testbench(content) if testcase.seeds else content, encoding='utf-8')
+                self._testbench_files.append(_target)
+                self._log(f"Written {_target}")
         
         return True
+
+    @property
+    def multi_simulation(self) -> bool:
+        return self._multi_simulation
     
+    def syntax_precheck(self) -> bool:
+        """
+        Parse the Scala source in-process. On syntax errors, record them as the sbt result in
+        scalac's format and return False, so that sbt need not be launched.
+        """
+        self._log(f"Pre-checking Scala syntax ({self._syntax_precheck})...")
+        diagnostics = check_scala_syntax(self._scala_source, self._syntax_precheck)
+        if not diagnostics:
+            return True
+        self._log(f"Syntax pre-check found {len(diagnostics)} error(s), skipping SBT.")
+        self._result.sbt_cmd_exec_result = CommandExecResult(1, format_diagnostics(diagnostics, self._scala_source), '')
+        self._result.syntax_precheck_failed = True
+        self._result.chisel_compile_to_verilog_success = False
+        return False
+
     def chisel_compile_to_verilog(self):
 
+        if self._syntax_precheck is not None and not self.syntax_precheck():
+            return False
+
         self._log("Compiling Chisel code to Verilog using SBT...")
         self._log(f"SBT command executed under working directory: {self._working_space.chisel_dir}")
         self._result.sbt_cmd_exec_result = run_command(
-            'sbt run', workingdir=self._working_space.chisel_dir
+            self._sbt_command, workingdir=self._working_space.chisel_dir, env=self._toolchain.sbt_env()
         )
         self._log(f"SBT command executed with return code: {self._result.sbt_cmd_exec_result.return_code}")
 
@@ -153,36 +389,65 @@ class Verifier:
         # Extract Verilog code
         self._log("Extracting generated Verilog code...")
         generated_dir = self._working_space.chisel_dir / "generated"
-        verilog_files = [
-            f for f in generated_dir.iterdir() if f.suffix in {'.v', '.sv'}
-        ]
-        if len(verilog_files) != 1:
-            raise RuntimeError(
-                f"Expected exactly one Verilog file in {generated_dir}, "
-                f"found: {[f.name for f in verilog_files]}"
-            )
-        
+        # The Chisel 3 profile writes one `<top>.v`. firtool writes `<top>.sv` and may split
+        # extra modules into further files, possibly in subdirectories.
+        verilog_files = sorted(
+            f for f in generated_dir.rglob('*') if f.is_file() and f.suffix in {'.v', '.sv'}
+        )
+        if not verilog_files:
+            raise RuntimeError(f"Expected Verilog files in {generated_dir}, found none.")
+        # The top module's file first, then the others in a stable order.
+        verilog_files.sort(key=lambda f: f.stem != self._top_module_name)
+
         # Read verilog code and store it in `compiled_verilog_code`
-        self._log(f"Found generated Verilog file: {verilog_files[0]}")
-        self._result.compiled_verilog_code = verilog_files[0].read_text(encoding='utf-8')
+        self._log(f"Found generated Verilog files: {[str(f.relative_to(generated_dir)) for f in verilog_files]}")
+        self._result.compiled_verilog_code = "\n".join(
+            f.read_text(encoding='utf-8') for f in verilog_files
+        )
         self._result.chisel_compile_to_verilog_success = True
         return True
 
+    def formal_equivalence_check(self, testcase: Testcase, top_module_name: str, *, timeout: int = 60):
+        """
+        Check the generated Verilog against the reference with Yosys. Returns True if the check
+        was conclusive, in which case simulation can be skipped. Returns False for sequential
+        designs, missing references, solver timeouts and Yosys errors, so that the caller
+        falls back to simulation.
+        """
+        self._log("Trying formal equivalence check using Yosys...")
+        reference_code = testcase.reference_code
+        if not reference_code or self._working_space.formal_dir is None:
+            self._log("No reference code or formal working directory, skipping formal check.")
+            return False
+        if not (is_combinational(reference_code) and is_combinational(self._result.compiled_verilog_code)):
+            self._log("Design is sequential, skipping formal check.")
+            return False
+        reference_modules = module_names(reference_code)
+        if not reference_modules:
+            return False
+        # VerilogEval names the reference module `RefModule`.
+        reference_top = 'RefModule' if 'RefModule' in reference_modules else reference_modules[0]
+
+        equiv_result = yosys_equivalence_check(
+            reference_code, reference_top,
+            self._result.compiled_verilog_code, top_module_name,
+            self._working_space.formal_dir,
+            timeout=timeout,
+        )
+        self._log(f"Formal equivalence check result: {equiv_result.status}")
+        self._result.equiv_cmd_exec_result = equiv_result.cmd_exec_result
+        if not equiv_result.is_conclusive:
+            return False
+
+        self._result.formal_equivalent = equiv_result.status == 'equivalent'
+        self._result.counterexample = equiv_result.counterexample
+        self._result.functionality_correct = self._result.formal_equivalent
+        return True
+
     def verilog_compile(self, output_fname: str = 'a.out', top_fname: str = 'top.v'):
         self._log("Compiling Verilog code using Icarus Verilog...")
 
-        # Write the verilog code to the `iv_dir` as `top_fname`
-        verilog_file = self._working_space.iv_dir / top_fname
-        verilog_file.write_text(self._result.compiled_verilog_code)
-        self._log(f"Verilog code written to {verilog_file}")
-
-        # Find all files with .sv or .v extension in iv_dir
-        # Generated verilog code is written in iv_dir by the last step.
-        # The testbench and reference code files are already in iv_dir by prepare().
-        all_verilog_files_under_iv = [
-            f.relative_to(self._working_space.iv_dir)
-            for f in self._working_space.iv_dir.iterdir() if f.suffix in {'.sv', '.v'}
-        ]
+        all_verilog_files_under_iv = self._write_compiled_verilog(top_fname)
         self._log(f"Icarus Verilog command executed under working directory: {self._working_space.iv_dir}")
         self._log(f"Found Verilog files for compilation: {[f.name for f in all_verilog_files_under_iv]}")
         
@@ -195,6 +460,20 @@ class Verifier:
         self._log(f"Icarus Verilog command executed with return code: {self._result.iv_cmd_exec_result.return_code}")
         return self._result.verilog_compile_success
 
+    def _write_compiled_verilog(self, top_fname: str) -> list[Path]:
+        # Write the verilog code to the `iv_dir` as `top_fname`
+        verilog_file = self._working_space.iv_dir / top_fname
+        verilog_file.write_text(self._result.compiled_verilog_code)
+        self._log(f"Verilog code written to {verilog_file}")
+
+        # Find all files with .sv or .v extension in iv_dir
+        # Generated verilog code is written in iv_dir by the last step.
+        # The testbench and reference code files are already in iv_dir by prepare().
+        return [
+            f.relative_to(self._working_space.iv_dir)
+            for f in self._working_space.iv_dir.iterdir() if f.suffix in {'.sv', '.v'}
+        ]
+
     def run_verilog_sim(self, output_fname: str = 'a.out'):
         self._log("Running Verilog simulation using VVP...")
         self._log(f"VVP command executed under working directory: {self._working_space.iv_dir}")
@@ -219,36 +498,146 @@ class Verifier:
     def functionality_eval(self, bm_type: Literal['autochip', 'verilog-eval']):
 
         self._log(f"Evaluating functionality for benchmark type: {bm_type}")
-        sim_output = self._result.vvp_cmd_exec_result.stdout
-        # AutoChip
-        if bm_type == 'autochip':
-            is_correct = "All tests passed!" in sim_output
-        # Verilog Eval
-        elif bm_type == 'verilog-eval':
-            mismatch_pattern = re.compile(r'Mismatches: (\d+) in (\d+) samples')
-            match = mismatch_pattern.search(sim_output)
-            is_correct = match and int(match.group(1)) == 0
-        else:
-            raise ValueError(f"Unknown benchmark type: {bm_type}")
+        is_correct = evaluate_sim_output(self._result.vvp_cmd_exec_result.stdout, bm_type)
         
         self._log(f"Functionality evaluation result: {'Correct' if is_correct else 'Incorrect'}")
         self._result.functionality_correct = is_correct
         return is_correct
 
+    def simulate_testbenches(
+            self, bm_type: Literal['autochip', 'verilog-eval'], *,
+            workers: int = 4,
+            stop_on_first_failure: bool = False,
+            top_fname: str = 'top.v'
+    ) -> bool:
+        """
+        Compile each testbench once against the generated Verilog and simulate it with every seed,
+        as parallel vvp processes. With `stop_on_first_failure`, no further jobs are started
+        once a testbench fails to compile or a simulation reports a functional error.
+        """
+        iv_dir = self._working_space.iv_dir
+        common_sources = [str(f) for f in self._write_compiled_verilog(top_fname)]
+        self._log(f"Simulating {len(self._testbench_files)} testbench(es) with seeds {self._seeds} on {workers} worker(s)...")
+        # A command hook (e.g. a cassette) snapshots the working directory around each command.
+        executor = _simulation_pool(workers) if workers > 1 and get_command_hook() is None else _InlineExecutor()
+
+        iv_results: dict[int, CommandExecResult] = {}
+        results: dict[tuple[int, int], SimulationResult] = {}
+        jobs = {}
+        for idx, tb_file in enumerate(self._testbench_files):
+            sources = common_sources + [str(tb_file.relative_to(iv_dir))]
+            binary = str(tb_file.parent.relative_to(iv_dir) / 'a.out')
+            jobs[executor.submit(_compile_testbench, str(iv_dir), sources, binary)] = (idx, None)
+
+        def _collect(future, submit_simulations: bool) -> bool:
+            """ Record a finished job; returns whether it failed. """
+            idx, seed_idx = jobs.pop(future)
+            tb_file = self._testbench_files[idx]
+            if seed_idx is None:
+                iv_results[idx] = future.result()
+                self._log(f"Icarus Verilog compiled {tb_file.name} with return code: {iv_results[idx].return_code}")
+                if not iv_results[idx].is_ok:
+                    return True
+                for seed_idx, seed in enumerate(self._seeds if submit_simulations else []):
+                    # Each simulation runs in its own directory, as testbenches may write files.
+                    sim_dir = tb_file.parent / f"seed_{seed}" if seed is not None else tb_file.parent
+                    sim_dir.mkdir(exist_ok=True)
+                    binary = '../a.out' if seed is not None else 'a.out'
+                    jobs[executor.submit(_run_simulation, str(sim_dir), binary, seed)] = (idx, seed_idx)
+                return False
+
+            vvp_result = future.result()
+            if not vvp_result.is_ok:
+                # As in `run_verilog_sim`, not observed for binaries that compiled.
+                raise RuntimeError(
+                    f"Verilog simulation (vvp) of {tb_file.name} execution failed. \n"
+                    f"STDOUT: {vvp_result.stdout}\n"
+                    f"STDERR: {vvp_result.stderr}\n"
+                )
+            is_correct = evaluate_sim_output(vvp_result.stdout, bm_type)
+            results[(idx, seed_idx)] = SimulationResult(
+                tb_file.name, self._seeds[seed_idx], iv_results[idx], vvp_result, is_correct
+            )
+            self._log(f"Simulation of {tb_file.name} (seed {self._seeds[seed_idx]}): {'Correct' if is_correct else 'Incorrect'}")
+            return not is_correct
+
+        failed = False
+        while jobs:
+            done, _ = wait(jobs, return_when=FIRST_COMPLETED)
+            for future in done:
+                failed = _collect(future, submit_simulations=not (failed and stop_on_first_failure)) or failed
+            if failed and stop_on_first_failure and jobs:
+                self._log(f"Stopping early, cancelling {len(jobs)} pending job(s).")
+                for future in list(jobs):
+                    if future.cancel():
+                        del jobs[future]
+                # Jobs already running still write to the working directory; let them finish.
+                for future in wait(jobs).done:
+                    _collect(future, submit_simulations=False)
+
+        simulations = [
+            results.get((idx, seed_idx)) or SimulationResult(tb_file.name, seed, iv_results.get(idx))
+            for idx, tb_file in enumerate(self._testbench_files)
+            for seed_idx, seed in enumerate(self._seeds)
+        ]
+        self._result.simulations = simulations
+        compiled = [s for s in simulations if s.iv_cmd_exec_result is not None]
+        compile_failure = next((s for s in compiled if not s.iv_cmd_exec_result.is_ok), None)
+        if compile_failure is not None or compiled:
+            self._result.iv_cmd_exec_result = (compile_failure or compiled[0]).iv_cmd_exec_result
+        simulated = [s for s in simulations if s.vvp_cmd_exec_result is not None]
+        functional_failure = next((s for s in simulated if not s.functionality_correct), None)
+        if functional_failure is not None or simulated:
+            self._result.vvp_cmd_exec_result = (functional_failure or simulated[0]).vvp_cmd_exec_result
+        self._result.functionality_correct = bool(simulations) and all(s.functionality_correct for s in simulations)
+        self._log(
+            f"{sum(bool(s.functionality_correct) for s in simulations)}/{len(simulations)} simulations correct, "
+            f"{len(simulations) - len(simulated)} not run."
+        )
+        return self._result.functionality_correct
+
 
 def verify(
         code: ChiselCode, bmcase: Testcase, output_dir: Path, bm_type: str,
-        *, verbose: bool = False
+        *, verbose: bool = False, use_formal: bool = False, formal_timeout: int = 60,
+        sbt_command: str = 'sbt run', keep_chisel_build: bool = False,
+        skeleton_dir: Optional[str | Path] = None, toolchain: str = 'chisel3',
+        syntax_precheck: Optional[SyntaxCheckBackend] = None,
+        sim_workers: int = 4, stop_on_first_failure: bool = False
 ) -> VerifyResult:
 
+    chisel_toolchain = get_toolchain(toolchain)
     # Create working space for the verifier
-    working_space = VerifierWorkingSpace(output_dir / 'chisel', output_dir / 'iv')
+    working_space = VerifierWorkingSpace(
+        output_dir / 'chisel', output_dir / 'iv',
+        sbt_build_path=chisel_toolchain.build_sbt,
+        formal_dir=output_dir / 'formal' if use_formal else None,
+        keep_chisel_build=keep_chisel_build,
+        skeleton_dir=skeleton_dir
+    )
     # Initialize the verifier
-    verifier = Verifier(working_space, verbose=verbose)
+    verifier = Verifier(
+        working_space, verbose=verbose, sbt_command=sbt_command, toolchain=chisel_toolchain,
+        syntax_precheck=syntax_precheck
+    )
+
+    if not (verifier.prepare(code, bmcase) and verifier.chisel_compile_to_verilog()):
+        return verifier.result
+
+    # A conclusive formal check replaces simulation; otherwise fall back to it.
+    if use_formal and verifier.formal_equivalence_check(
+        bmcase, code.top_module_name, timeout=formal_timeout
+    ):
+        return verifier.result
+
+    # Several testbenches or seeds: compile each testbench once, then simulate in parallel.
+    if verifier.multi_simulation:
+        verifier.simulate_testbenches(
+            bm_type, workers=sim_workers, stop_on_first_failure=stop_on_first_failure
+        )
+        return verifier.result
 
     _ = (
-        verifier.prepare(code, bmcase) and
-        verifier.chisel_compile_to_verilog() and
         verifier.verilog_compile() and
         verifier.run_verilog_sim() and
         verifier.functionality_eval(bm_type=bm_type)
@@ -259,7 +648,9 @@ def verify(
 def collect_verify_feedback(
         verify_result: VerifyResult,
         chisel_code: ChiselCode
-) -> HumanMessage:
+) -> 'HumanMessage':
+    # Imported here so that verification alone never imports LLM libraries.
+    from langchain_core.messages import HumanMessage
 
     def __format_cmd_exec_message(cmd_exec_result: CommandExecResult) -> str:
         if cmd_exec_result.is_ok:
@@ -288,6 +679,25 @@ def collect_verify_feedback(
             f"```\n{__format_cmd_exec_message(verify_result.iv_cmd_exec_result)}\n```\n\n"
         )
     # The Verilog code is able to compile and run, but the functionality is incorrect.
+    elif not verify_result.functionality_correct and verify_result.counterexample:
+        def __format_ports(ports: dict) -> str:
+            return "\n".join(f"  {name} = {value}" for name, value in ports.items())
+        msg += (
+            f"# Formal equivalence check (Yosys) found a counterexample:\n\n"
+            f"Inputs:\n{__format_ports(verify_result.counterexample['inputs'])}\n\n"
+            f"Expected outputs (reference):\n{__format_ports(verify_result.counterexample['reference_outputs'])}\n\n"
+            f"Outputs of the Chisel code:\n{__format_ports(verify_result.counterexample['generated_outputs'])}\n\n"
+        )
+    elif not verify_result.functionality_correct and len(verify_result.simulations) > 1:
+        def __format_simulation(simulation: SimulationResult) -> str:
+            seed = f" with seed {simulation.seed}" if simulation.seed is not None else ""
+            match = MISMATCH_PATTERN.search(simulation.vvp_cmd_exec_result.stdout)
+            return f"- {simulation.testbench}{seed}: {match.group(0) if match else 'failed'}"
+        failing = [s for s in verify_result.simulations if s.functionality_correct is False]
+        msg += (
+            f"# Failing simulations ({len(failing)} of {sum(s.vvp_cmd_exec_result is not None for s in verify_result.simulations)} run):\n\n"
+            + "\n".join(__format_simulation(s) for s in failing) + "\n\n"
+        )
     elif not verify_result.functionality_correct:
         # TODO: For functional errors, the current benchmark simulation result only points out that 
         # the function point is inconsistent, but does not provide more information about the error. 
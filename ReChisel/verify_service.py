@@ -0,0 +1,399 @@
+import argparse
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+from pathlib import Path
+import queue
+import threading
+import time
+from typing import Optional
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+
+from ReChisel.chisel_code import ChiselCode
+from ReChisel.scala_extract import CodeExtractionError
+from ReChisel.testcase import Testcase
+from ReChisel.utils import run_command
+from ReChisel.verifier import VerifyResult, verify
+
+
+DEFAULT_URL = 'http://127.0.0.1:8765'
+
+
+@dataclass
+class Job:
+    job_id: str
+    payload: dict
+    status: str = 'queued'  # queued | running | done | failed | cancelled
+    submitted_at: float = field(default_factory=time.monotonic)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    error_type: Optional[str] = None
+    # Whether a failed job raised a `ValueError` (e.g. a `CodeExtractionError`), which clients
+    # re-raise like the local `verify`; `extraction_error` is the `CodeExtractionError.to_dict()`.
+    value_error: bool = False
+    extraction_error: Optional[dict] = None
+    done: threading.Event = field(default_factory=threading.Event)
+
+    def to_dict(self) -> dict:
+        return {
+            'job_id': self.job_id,
+            'status': self.status,
+            'queue_wait': (self.started_at - self.submitted_at) if self.started_at else None,
+            'run_time': (self.finished_at - self.started_at) if self.finished_at and self.started_at else None,
+            'result': self.result,
+            'error': self.error,
+            'error_type': self.error_type,
+            'value_error': self.value_error,
+            'extraction_error': self.extraction_error,
+        }
+
+
+class VerifyService:
+    """
+    A fixed pool of verification workers shared by all ReChisel processes on a machine.
+
+    Each worker owns a persistent working directory. Its sbt build directory is kept between
+    jobs, so with `sbt --client` every worker talks to one warm sbt server instead of starting a
+    JVM per verification. Jobs beyond `queue_size` are rejected, so clients back off instead of
+    piling up.
+    """
+
+    def __init__(
+            self,
+            working_dir: str | Path,
+            *,
+            num_workers: Optional[int] = None,
+            queue_size: int = 64,
+            sbt_command: str = 'sbt --client run',
+            toolchain: str = 'chisel3',
+            max_finished_jobs: int = 10000,
+            verbose: bool = False,
+    ):
+        self._working_dir = Path(working_dir)
+        # sbt itself compiles on several threads, so do not give every core its own JVM.
+        self._num_workers = num_workers or max(1, (os.cpu_count() or 2) // 2)
+        self._queue: queue.Queue[Job] = queue.Queue(maxsize=queue_size)
+        self._sbt_command = sbt_command
+        # One toolchain per service, so each worker's sbt server keeps a single warm build.
+        self._toolchain = toolchain
+        self._max_finished_jobs = max_finished_jobs
+        self._verbose = verbose
+
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._lock = threading.Lock()
+        self._running = 0
+        self._num_completed = 0
+        self._num_rejected = 0
+        self._queue_waits = deque(maxlen=1000)
+        self._run_times = deque(maxlen=1000)
+        self._workers: list[threading.Thread] = []
+        self._stopping = threading.Event()
+
+    def _log(self, message: str):
+        if self._verbose:
+            print(f"[VERIFY SERVICE] {message}")
+
+    def start(self):
+        for i in range(self._num_workers):
+            worker = threading.Thread(target=self._worker_loop, args=(i,), daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        self._log(f"Started {self._num_workers} workers.")
+
+    def stop(self):
+        self._stopping.set()
+        if 'client' in self._sbt_command:
+            # Shut down the sbt servers started by the workers.
+            for i in range(self._num_workers):
+                chisel_dir = self._working_dir / f"worker_{i}" / 'chisel'
+                if chisel_dir.exists():
+                    run_command('sbt --client shutdown', workingdir=chisel_dir)
+
+    def submit(self, payload: dict) -> Job:
+        """ Queue a job. Raises `queue.Full` when the service is saturated. """
+        job = Job(job_id=uuid.uuid4().hex, payload=payload)
+        with self._lock:
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self._num_rejected += 1
+                raise
+            self._jobs[job.job_id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """ Cancel a queued job. A running job finishes, but its result is discarded. """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status in {'queued', 'running'}:
+                job.status = 'cancelled'
+                job.done.set()
+            return job
+
+    def stats(self) -> dict:
+        def _percentiles(values) -> dict:
+            if not values:
+                return {'p50': None, 'p95': None, 'max': None}
+            values = sorted(values)
+            return {
+                'p50': values[len(values) // 2],
+                'p95': values[min(len(values) - 1, int(len(values) * 0.95))],
+                'max': values[-1],
+            }
+        with self._lock:
+            return {
+                'num_workers': self._num_workers,
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'running': self._running,
+                'completed': self._num_completed,
+                'rejected': self._num_rejected,
+                'queue_wait': _percentiles(list(self._queue_waits)),
+                'run_time': _percentiles(list(self._run_times)),
+            }
+
+    def _worker_loop(self, worker_idx: int):
+        output_dir = self._working_dir / f"worker_{worker_idx}"
+        while not self._stopping.is_set():
+            try:
+                job = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            with self._lock:
+                if job.status == 'cancelled':
+                    continue
+                job.status = 'running'
+                job.started_at = time.monotonic()
+                self._running += 1
+            self._log(f"Worker {worker_idx} running job {job.job_id}")
+
+            result, error, error_type, value_error, extraction_error = None, None, None, False, None
+            try:
+                result = self._run_job(job.payload, output_dir).__dict__()
+            except Exception as e:
+                error, error_type = f"{type(e).__name__}: {e}", type(e).__name__
+                value_error = isinstance(e, ValueError)
+                extraction_error = e.to_dict() if isinstance(e, CodeExtractionError) else None
+
+            with self._lock:
+                self._running -= 1
+                job.finished_at = time.monotonic()
+                if job.status != 'cancelled':
+                    job.status = 'done' if error is None else 'failed'
+                    job.result, job.error, job.error_type = result, error, error_type
+                    job.value_error, job.extraction_error = value_error, extraction_error
+                    self._num_completed += 1
+                    self._queue_waits.append(job.started_at - job.submitted_at)
+                    self._run_times.append(job.finished_at - job.started_at)
+                job.done.set()
+                self._prune_finished_jobs()
+
+    def _prune_finished_jobs(self):
+        # Called with the lock held. Jobs are ordered by submission time.
+        while len(self._jobs) > self._max_finished_jobs:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if not oldest.done.is_set():
+                break
+            del self._jobs[oldest_id]
+
+    def _run_job(self, payload: dict, output_dir: Path) -> VerifyResult:
+        code = ChiselCode(payload['llm_response'], payload['top_module_name'])
+        testcase = Testcase.from_dict(payload['testcase'])
+        return verify(
+            code, testcase, output_dir=output_dir, bm_type=payload['bm_type'],
+            verbose=self._verbose,
+            use_formal=payload.get('use_formal', False),
+            formal_timeout=payload.get('formal_timeout', 60),
+            stop_on_first_failure=payload.get('stop_on_first_failure', False),
+            sbt_command=self._sbt_command,
+            keep_chisel_build=True,
+            toolchain=self._toolchain,
+        )
+
+
+def _make_handler(service: VerifyService):
+
+    class Handler(BaseHTTPRequestHandler):
+        # Routes:
+        #   POST   /jobs              submit a job -> 202 {job_id}, or 503 when saturated
+        #   GET    /jobs/<id>?wait=s  job status, waiting up to `s` seconds for it to finish
+        #   DELETE /jobs/<id>         cancel a job
+        #   GET    /stats             queue depth, latency percentiles, counters
+
+        def _send_json(self, code: int, body: dict, headers: Optional[dict] = None):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _job_id(self) -> Optional[str]:
+            parts = self.path.split('?')[0].strip('/').split('/')
+            return parts[1] if len(parts) == 2 and parts[0] == 'jobs' else None
+
+        def do_POST(self):
+            if self.path.rstrip('/') != '/jobs':
+                return self._send_json(404, {'error': 'not found'})
+            length = int(self.headers.get('Content-Length', 0))
+            try:
+                payload = json.loads(self.rfile.read(length))
+                job = service.submit(payload)
+            except queue.Full:
+                return self._send_json(503, {'error': 'service saturated'}, {'Retry-After': '1'})
+            except (json.JSONDecodeError, KeyError) as e:
+                return self._send_json(400, {'error': str(e)})
+            self._send_json(202, {'job_id': job.job_id})
+
+        def do_GET(self):
+            if self.path.rstrip('/') == '/stats':
+                return self._send_json(200, service.stats())
+            job = service.get(self._job_id() or '')
+            if job is None:
+                return self._send_json(404, {'error': 'unknown job'})
+            query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+            if 'wait' in query:
+                try:
+                    wait = float(query['wait'][0])
+                except ValueError:
+                    return self._send_json(400, {'error': f"invalid wait: {query['wait'][0]}"})
+                job.done.wait(timeout=min(max(wait, 0.0), 60))
+            self._send_json(200, job.to_dict())
+
+        def do_DELETE(self):
+            job = service.cancel(self._job_id() or '')
+            if job is None:
+                return self._send_json(404, {'error': 'unknown job'})
+            self._send_json(200, job.to_dict())
+
+        def log_message(self, format, *args):
+            if service._verbose:
+                super().log_message(format, *args)
+
+    return Handler
+
+
+def serve(host: str, port: int, service: VerifyService):
+    service.start()
+    server = ThreadingHTTPServer((host, port), _make_handler(service))
+    print(f"Verification service listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+class VerifyServiceError(RuntimeError):
+    """Raised when the verification service cannot complete a job."""
+    pass
+
+
+def _request(method: str, url: str, body: Optional[dict] = None, timeout: float = 90) -> dict:
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read())
+
+
+def remote_verify(
+        code: ChiselCode, bmcase: Testcase, output_dir: Path, bm_type: str,
+        *, verbose: bool = False, use_formal: bool = False, formal_timeout: int = 60,
+        stop_on_first_failure: bool = False,
+        url: str = DEFAULT_URL, submit_retry_wait: float = 1.0
+) -> VerifyResult:
+    """
+    Drop-in replacement for `ReChisel.verifier.verify` that runs on a `VerifyService`.
+    `output_dir` is unused; the service verifies in its own working directories.
+    """
+    testcase = {
+        k: (str(Path(v).resolve()) if v and k.endswith('_path') else v)
+        for k, v in bmcase.to_dict().items()
+    }
+    testcase['testbench_paths'] = [str(Path(p).resolve()) for p in testcase['testbench_paths']]
+    payload = {
+        'llm_response': code.response,
+        'top_module_name': code.top_module_name,
+        'testcase': testcase,
+        'bm_type': bm_type,
+        'use_formal': use_formal,
+        'formal_timeout': formal_timeout,
+        'stop_on_first_failure': stop_on_first_failure,
+    }
+
+    # Back off while the service is saturated.
+    while True:
+        try:
+            job_id = _request('POST', f"{url}/jobs", payload)['job_id']
+            break
+        except urllib.error.HTTPError as e:
+            if e.code != 503:
+                raise VerifyServiceError(f"Job submission failed: {e.read().decode('utf-8', 'replace')}") from e
+            if verbose:
+                print("[VERIFY CLIENT] Service saturated, retrying...")
+            time.sleep(submit_retry_wait)
+
+    try:
+        while True:
+            job = _request('GET', f"{url}/jobs/{job_id}?wait=30")
+            if job['status'] not in {'queued', 'running'}:
+                break
+    except BaseException:
+        # Do not leave an abandoned job in the queue, e.g. on KeyboardInterrupt.
+        try:
+            _request('DELETE', f"{url}/jobs/{job_id}", timeout=5)
+        except Exception:
+            pass
+        raise
+
+    # As raised by the local `verify`, e.g. for a response without a usable code block.
+    if job['status'] == 'failed' and job.get('extraction_error'):
+        error = job['extraction_error']
+        raise CodeExtractionError(error['kind'], error['message'].removeprefix('Error: '), line=error['line'])
+    if job['status'] == 'failed' and job.get('value_error'):
+        raise ValueError(job['error'].removeprefix(f"{job['error_type']}: "))
+    if job['status'] != 'done':
+        raise VerifyServiceError(f"Job {job_id} {job['status']}: {job['error']}")
+    return VerifyResult.from_dict(job['result'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ReChisel local verification service")
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Host to bind')
+    parser.add_argument('--port', type=int, default=8765, help='Port to bind')
+    parser.add_argument('--working-dir', type=str, default='output/verify_service', help='Working directory for the workers')
+    parser.add_argument('--workers', type=int, default=None, help='Number of workers (default: half the CPU cores)')
+    parser.add_argument('--queue-size', type=int, default=64, help='Maximum number of queued jobs before rejecting new ones')
+    parser.add_argument('--sbt-command', type=str, default='sbt --client run', help='sbt command run by the workers')
+    parser.add_argument('--toolchain', type=str, default='chisel3', choices=['chisel3', 'circt'], help='Chisel toolchain profile used by the workers')
+    parser.add_argument('--verbose', action='store_true', help='Enable verbose output')
+    args = parser.parse_args()
+
+    service = VerifyService(
+        args.working_dir,
+        num_workers=args.workers,
+        queue_size=args.queue_size,
+        sbt_command=args.sbt_command,
+        toolchain=args.toolchain,
+        verbose=args.verbose,
+    )
+    serve(args.host, args.port, service)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+import argparse
+import json
+import os
+from pathlib import Path
+import re
+import time
+from typing import Optional
+
+from ReChisel.chisel_code import ChiselCode
+from ReChisel.testcase import Testcase
+from ReChisel.toolchains import ChiselToolchain, get_toolchain
+from ReChisel.utils import run_command
+from ReChisel.verifier import Verifier, VerifierWorkingSpace
+
+
+WARMUP_CONFIG_NAME = 'warmup.json'
+
+_ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;?]*[A-Za-z]')
+
+# A minimal design; compiling it pulls in every dependency that real verifications need.
+_SKELETON_RESPONSE = (
+    "```scala\n"
+    "class TopModule extends RawModule {\n"
+    "  val in = IO(Input(UInt(1.W)))\n"
+    "  val out = IO(Output(UInt(1.W)))\n"
+    "  out := in\n"
+    "}\n"
+    "```\n"
+)
+
+
+def _sbt_args(cache_dir: str | Path, *, offline: bool) -> list[str]:
+    cache_dir = Path(cache_dir).resolve()
+    args = [
+        'sbt',
+        f"-Dsbt.boot.directory={cache_dir / 'boot'}",
+        f"-Dsbt.ivy.home={cache_dir / 'ivy'}",
+        f"-Dsbt.coursier.home={cache_dir / 'coursier'}",
+        f"-Dsbt.global.base={cache_dir / 'global'}",
+    ]
+    if offline:
+        args.append("-Dsbt.offline=true")
+    return args
+
+
+def sbt_command(cache_dir: str | Path, *, offline: bool = True) -> str:
+    """
+    The `sbt run` command line that keeps sbt's boot directory and Coursier/Ivy caches under
+    `cache_dir`, optionally in offline mode. `cache_dir` must not contain spaces.
+    """
+    return " ".join([*_sbt_args(cache_dir, offline=offline), 'run'])
+
+
+def check_classpath_lock(config: dict):
+    """ Raise if the classpath recorded by `warmup` is missing or its jars are no longer in the cache. """
+    lock_path = Path(config['classpath_lock'])
+    entries = lock_path.read_text(encoding='utf-8').split() if lock_path.exists() else []
+    if not entries:
+        raise RuntimeError(f"The classpath lock {lock_path} is missing or empty, re-run the warm-up.")
+    missing = [entry for entry in entries if not Path(entry).exists()]
+    if missing:
+        raise RuntimeError(
+            f"{len(missing)} entries of the classpath lock {lock_path} are no longer in the cache "
+            f"(e.g. {missing[0]}), re-run the warm-up."
+        )
+
+
+def load_warmup_config(cache_dir: str | Path) -> Optional[dict]:
+    """ The config written by `warmup` after checking its classpath lock, or None if the cache has not been warmed up. """
+    path = Path(cache_dir) / WARMUP_CONFIG_NAME
+    if not path.exists():
+        return None
+    config = json.loads(path.read_text(encoding='utf-8'))
+    check_classpath_lock(config)
+    return config
+
+
+def _timed_compile(
+        working_space: VerifierWorkingSpace, command: str, toolchain: ChiselToolchain, verbose: bool
+) -> tuple[bool, float, str]:
+    verifier = Verifier(working_space, verbose=verbose, sbt_command=command, toolchain=toolchain)
+    # The skeleton has no reference or testbench.
+    verifier.prepare(ChiselCode(_SKELETON_RESPONSE, 'TopModule'), testcase=Testcase('skeleton'))
+    start = time.monotonic()
+    ok = verifier.chisel_compile_to_verilog()
+    elapsed = time.monotonic() - start
+    sbt_result = verifier.result.sbt_cmd_exec_result
+    return ok, elapsed, sbt_result.stdout + sbt_result.stderr
+
+
+def _export_classpath(cache_dir: str | Path, chisel_dir: Path) -> list[str]:
+    """ The resolved classpath of the sbt project in `chisel_dir`, without the project's own build outputs. """
+    # `-error` keeps sbt's own log lines, e.g. the closing "[success] Total time: ...", out of stdout.
+    export = run_command(
+        [*_sbt_args(cache_dir, offline=True), '-error', 'export Runtime/fullClasspath'],
+        workingdir=chisel_dir,
+    )
+    # The exported value is the last line that is a path list and not a log line.
+    lines = [
+        line.strip() for line in _ANSI_ESCAPE.sub('', export.stdout).splitlines()
+        if os.sep in line and not line.lstrip().startswith('[')
+    ]
+    if not export.is_ok or not lines:
+        raise RuntimeError(f"Exporting the resolved classpath failed:\n{export.stdout}{export.stderr}")
+    project_dir = str(Path(chisel_dir).resolve())
+    return sorted(entry for entry in lines[-1].split(os.pathsep) if entry and not entry.startswith(project_dir))
+
+
+def warmup(
+        cache_dir: str | Path, *,
+        toolchain: str = 'chisel3',
+        build_sbt: Optional[str | Path] = None,
+        verbose: bool = False
+) -> dict:
+    """
+    Resolve all dependencies of `build_sbt` into a local cache once, precompile a skeleton
+    project, record the resolved classpath, and check that a fresh workspace seeded with
+    the skeleton compiles in sbt offline mode against that classpath. `build_sbt` defaults to
+    the toolchain's build file.
+    """
+    chisel_toolchain = get_toolchain(toolchain)
+    build_sbt = build_sbt or chisel_toolchain.build_sbt
+    cache_dir = Path(cache_dir).resolve()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    skeleton_dir = cache_dir / 'skeleton'
+
+    # 1. Cold: resolve and download everything, compile the skeleton.
+    print("Resolving dependencies and compiling the skeleton project (online)...")
+    ok, cold_seconds, output = _timed_compile(
+        VerifierWorkingSpace(skeleton_dir / 'chisel', skeleton_dir / 'iv', sbt_build_path=build_sbt),
+        sbt_command(cache_dir, offline=False),
+        chisel_toolchain,
+        verbose,
+    )
+    if not ok:
+        raise RuntimeError(f"Warm-up compilation failed:\n{output}")
+
+    # 2. Pin: record the exact resolved classpath.
+    classpath = _export_classpath(cache_dir, skeleton_dir / 'chisel')
+    lock_path = cache_dir / 'classpath.lock'
+    lock_path.write_text("\n".join(classpath) + "\n", encoding='utf-8')
+
+    # 3. Offline check: a fresh workspace seeded from the skeleton, with sbt in offline mode.
+    print("Checking a fresh workspace in offline mode...")
+    offline_ok, offline_seconds, output = _timed_compile(
+        VerifierWorkingSpace(
+            cache_dir / 'offline_check' / 'chisel', cache_dir / 'offline_check' / 'iv',
+            sbt_build_path=build_sbt, skeleton_dir=skeleton_dir / 'chisel'
+        ),
+        sbt_command(cache_dir, offline=True),
+        chisel_toolchain,
+        verbose,
+    )
+    if not offline_ok:
+        raise RuntimeError(f"Offline compilation in a fresh workspace failed:\n{output}")
+    # The fresh workspace must resolve to exactly the locked classpath.
+    offline_classpath = _export_classpath(cache_dir, cache_dir / 'offline_check' / 'chisel')
+    if offline_classpath != classpath:
+        changed = sorted(set(offline_classpath) ^ set(classpath))
+        raise RuntimeError(f"A fresh workspace resolves a different classpath than {lock_path}:\n" + "\n".join(changed))
+
+    config = {
+        'sbt_command': sbt_command(cache_dir, offline=True),
+        'skeleton_dir': str(skeleton_dir / 'chisel'),
+        'toolchain': toolchain,
+        'classpath_lock': str(lock_path),
+        'cold_compile_seconds': cold_seconds,
+        'offline_compile_seconds': offline_seconds,
+    }
+    (cache_dir / WARMUP_CONFIG_NAME).write_text(json.dumps(config, indent=2), encoding='utf-8')
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm up a shared, offline-capable sbt cache for ReChisel verification")
+    parser.add_argument('cache_dir', type=str, help='Directory for the shared dependency cache and skeleton project (no spaces)')
+    parser.add_argument('--toolchain', type=str, default='chisel3', choices=['chisel3', 'circt'], help='Chisel toolchain profile used by verification')
+    parser.add_argument('--build-sbt', type=str, default=None, help="sbt build file used by verification (default: the toolchain's)")
+    parser.add_argument('--verbose', action='store_true', help='Enable verbose output')
+    args = parser.parse_args()
+
+    config = warmup(args.cache_dir, toolchain=args.toolchain, build_sbt=args.build_sbt, verbose=args.verbose)
+    print(f"Cold compile (dependency resolution + skeleton): {config['cold_compile_seconds']:.1f} s")
+    print(f"Fresh workspace, offline, seeded from skeleton:  {config['offline_compile_seconds']:.1f} s")
+    print(f"Warm-up config written to {Path(args.cache_dir) / WARMUP_CONFIG_NAME}")
+    print(f"Use it with: rechisel_cli.py ... --sbt-cache {args.cache_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,29 +1,45 @@
 
 import argparse
+from contextlib import nullcontext
+from functools import partial
 from pathlib import Path
 from pprint import pprint
 import json
+import time
 
 from langchain_core.messages import AIMessage
 
+from ReChisel.autofix import AutoFixer
+from ReChisel.beam_search import BeamSearch, BeamSearchConfig
+from ReChisel.blob_store import BlobStore
+from ReChisel.cassette import Cassette
 from ReChisel.chisel_code import ChiselCode
+from ReChisel.fix_memory import FixMemory, error_signature
 from ReChisel.generator import Generator
+from ReChisel.results_store import ResultsStore
+from ReChisel.retrieval import RetrievalIndex, few_shot_examples_message
 from ReChisel.reviewer import Reviewer
+from ReChisel.speculative import CHAIN, SpeculativeCorrector, failure_stage
 from ReChisel.testcase import Testcase
 from ReChisel.tracing import Tracing, in_context_attempt_history_format
+from ReChisel.usage import Budget, BudgetExceeded, CampaignLedger, UsageTracker, load_price_table
 from ReChisel.verifier import VerifyResult, verify
+from ReChisel.verify_service import remote_verify
+from ReChisel.warmup import load_warmup_config
 
 
 args = argparse.ArgumentParser(description="ReChisel CLI")
 
 args.add_argument('--verbose', action='store_true', help='Enable verbose output')
 args.add_argument('-o', '--output', type=str, required=False, default='output/output.json', help='Output file for the results')
+args.add_argument('--results-db', type=str, required=False, default=None, help='Append per-problem and per-attempt rows to this results store (SQLite file) for analytics')
 args.add_argument('-n', '--num-iterations', type=int, required=False, default=10, help='Maximum number of iterations for the generation and verification process')
 # Testcase
 args.add_argument('--prob-id', type=str, required=False, default='prob_0', help='Problem ID')
 args.add_argument('--specification', type=str, required=True, help='Specification directory')
 args.add_argument('--reference', type=str, required=False, default=None, help='Reference directory')
-args.add_argument('--testbench', type=str, required=True, help='Testbench directory')
+args.add_argument('--testbench', type=str, nargs='+', required=True, help='Testbench file(s); several are compiled and simulated separately against the same generated Verilog')
+args.add_argument('--seeds', type=int, nargs='+', required=False, default=None, help='Simulate each testbench once per seed, seeding its unseeded $random calls')
 args.add_argument('--top-module-name', type=str, required=False, default='TopModule', help='Top module name')
 args.add_argument('--bm-type', type=str, required=True, help='Benchmark type for verification')
 # Generator
@@ -37,14 +53,54 @@ args.add_argument('--sbt-reflection-system-prompt', type=str, required=False, de
 args.add_argument('--iv-reflection-system-prompt', type=str, required=False, default='prompts/syntax_iv_reflection.txt', help='IV reflection system prompt file')
 args.add_argument('--functionality-reflection-system-prompt', type=str, required=False, default='prompts/functionality_reflection.txt', help='Functionality reflection system prompt file')
 args.add_argument('--reviewer-model', type=str, required=False, default='gpt-4o-mini', help='Reviewer model')
+args.add_argument('--correction-mode', type=str, required=False, default='two-call', choices=['two-call', 'fused', 'speculative'], help='Reflect and correct in two LLM calls (reviewer model, then correction model), in one fused call with the correction model, or race a reviewer-free correction against the two calls (chain search)')
+args.add_argument('--speculative-stages', type=str, nargs='+', required=False, default=['sbt', 'iv', 'functionality'], choices=['sbt', 'iv', 'functionality'], help='Failure stages at which the speculative mode races a direct correction; other failures use the two calls')
+args.add_argument('--fused-system-prompt', type=str, required=False, default='prompts/fused_reflect_correct.txt', help='Template combining the reflection and correction system prompts for the fused mode')
+args.add_argument('--auto-fix', action='store_true', help='Try rule-based fixes for iverilog interface mismatches (Bundle `io_` prefix, implicit clock/reset) before calling the reviewer')
+# Retrieval
+args.add_argument('--retrieval-index', type=str, required=False, default=None, help='Index of solved problems (python -m ReChisel.retrieval); the most similar ones prime the initial generation')
+args.add_argument('--retrieval-k', type=int, required=False, default=3, help='Maximum number of solved examples in the initial generation prompt')
+args.add_argument('--retrieval-token-budget', type=int, required=False, default=3000, help='Estimated token budget for the solved examples')
+args.add_argument('--retrieval-update', action='store_true', help='Add this problem to the retrieval index if it passes')
+args.add_argument('--fix-memory', type=str, required=False, default=None, help='JSON file of reviewer guidance that fixed sbt/iverilog errors, keyed by error signature; confident entries replace the reviewer call (chain search, two-call mode)')
+args.add_argument('--fix-memory-min-support', type=int, required=False, default=2, help='Successful corrections needed before stored guidance replaces the reviewer call')
+# Search
+args.add_argument('--search', type=str, required=False, default='chain', choices=['chain', 'beam'], help='Single reflection chain, or beam search over correction candidates')
+args.add_argument('--beam-width', type=int, required=False, default=2, help='Number of candidates kept in the beam (beam search)')
+args.add_argument('--beam-expansions', type=int, required=False, default=2, help='Number of corrections generated per candidate per round (beam search)')
+args.add_argument('--verify-workers', type=int, required=False, default=4, help='Maximum number of concurrent LLM calls and verifications (beam search)')
+args.add_argument('--time-budget', type=float, required=False, default=None, help='Wall-clock budget in seconds (beam search)')
+args.add_argument('--llm-call-budget', type=int, required=False, default=None, help='Maximum number of LLM calls (beam search)')
+# Usage and budgets
+args.add_argument('--price-table', type=str, required=False, default=None, help='JSON file of {model: [input_usd, output_usd]} prices per million tokens, overriding the defaults')
+args.add_argument('--max-tokens', type=int, required=False, default=None, help='Token budget for this problem (input + output, all roles)')
+args.add_argument('--max-cost', type=float, required=False, default=None, help='Cost budget in USD for this problem')
+args.add_argument('--max-seconds', type=float, required=False, default=None, help='Wall-clock budget in seconds for this problem')
+args.add_argument('--campaign-ledger', type=str, required=False, default=None, help='JSON file accumulating usage across all runs of a campaign; enables the campaign budgets')
+args.add_argument('--campaign-max-tokens', type=int, required=False, default=None, help='Token budget for the whole campaign')
+args.add_argument('--campaign-max-cost', type=float, required=False, default=None, help='Cost budget in USD for the whole campaign')
+args.add_argument('--campaign-max-seconds', type=float, required=False, default=None, help='Wall-clock budget in seconds for the whole campaign, counted from its first run')
 # Verifier
 args.add_argument('--verifier-working-dir', type=str, required=False, default='output/verification', help='Working directory for verification output')
+args.add_argument('--verify-service', type=str, required=False, default=None, help='URL of a shared verification service (python -m ReChisel.verify_service) to verify on, instead of a local sbt')
+args.add_argument('--sbt-cache', type=str, required=False, default=None, help='Shared sbt cache prepared by `python -m ReChisel.warmup`; sbt then runs offline from a precompiled skeleton')
+args.add_argument('--chisel-toolchain', type=str, required=False, default='chisel3', choices=['chisel3', 'circt'], help='Chisel 3.6 with the Scala FIRRTL compiler, or Chisel 6 with CIRCT firtool (uses build_circt.sbt)')
+args.add_argument('--syntax-precheck', type=str, required=False, default=None, choices=['lexer', 'tree-sitter'], help='Reject code with Scala syntax errors in-process, without launching sbt (tree-sitter needs tree-sitter and tree-sitter-scala installed)')
+args.add_argument('--formal-equivalence', action='store_true', help='Check combinational designs against the reference with Yosys, falling back to simulation')
+args.add_argument('--sim-workers', type=int, required=False, default=4, help='Maximum number of concurrent iverilog/vvp processes with several testbenches or seeds')
+args.add_argument('--stop-on-first-failure', action='store_true', help='With several testbenches or seeds, start no further simulations once one fails')
+args.add_argument('--formal-timeout', type=int, required=False, default=60, help='Timeout in seconds for the Yosys equivalence check')
+args.add_argument('--cassette', type=str, required=False, default=None, help='Cassette file of recorded commands and LLM responses (see --cassette-mode)')
+args.add_argument('--cassette-mode', type=str, required=False, default='replay', choices=['record', 'replay'], help='Record all commands and LLM responses of this run into the cassette, or replay them without sbt, iverilog or LLM access')
+args.add_argument('--cassette-strict-llm', action='store_true', help='In replay mode, also require the LLM request messages to match the recording')
 # Tracing
 args.add_argument('--use-in-context-history', action='store_true', help='Use in-context history for reflection')
 args.add_argument('--use-llm-summary', action='store_true', help='Use LLM summary for tracing')
 args.add_argument('--llm-summary-system-prompt', type=str, required=False, default='prompts/attempt_summary.txt', help='LLM summary system prompt file')
 args.add_argument('--llm-summary-model', type=str, required=False, default='gpt-4o-mini', help='LLM model for summary generation')
+args.add_argument('--llm-summary-wait', type=float, required=False, default=0.0, help='Seconds to wait for pending background LLM summaries before falling back to reviewer responses')
 args.add_argument('--max-history-length', type=int, required=False, default=5, help='Maximum length of history to keep in tracing')
+args.add_argument('--trace-spill-dir', type=str, required=False, default=None, help='Directory to spill compressed trace contents (code, Verilog, logs) to, instead of keeping them in memory')
 
 args = args.parse_args()
 
@@ -55,6 +111,15 @@ bmcase = Testcase(
     specification_path=args.specification,
     reference_path=args.reference,
     testbench_path=args.testbench,
+    seeds=args.seeds,
+)
+
+usage_tracker = UsageTracker(
+    args.prob_id,
+    price_table=load_price_table(args.price_table),
+    problem_budget=Budget(args.max_tokens, args.max_cost, args.max_seconds),
+    campaign_budget=Budget(args.campaign_max_tokens, args.campaign_max_cost, args.campaign_max_seconds),
+    campaign_ledger=CampaignLedger(args.campaign_ledger) if args.campaign_ledger else None,
 )
 
 generator = Generator(
@@ -63,15 +128,33 @@ generator = Generator(
     syntax_correction_system_prompt=Path(args.syntax_correction_system_prompt).read_text(encoding='utf-8'),
     functionality_correction_system_prompt=Path(args.functionality_correction_system_prompt).read_text(encoding='utf-8'),
     correction_model=args.correction_model,
+    fused_system_prompt_template=Path(args.fused_system_prompt).read_text(encoding='utf-8') if args.correction_mode == 'fused' else None,
+    usage_tracker=usage_tracker,
     verbose=args.verbose
 )
-generator.testcase_prepare(bmcase, args.top_module_name)
+
+retrieval_index = RetrievalIndex(args.retrieval_index, verbose=args.verbose) if args.retrieval_index else None
+retrieval_info = None
+few_shot_examples = None
+if retrieval_index is not None:
+    retrieval_start = time.perf_counter()
+    # The problem itself is excluded, so that its own solution is never shown.
+    examples = retrieval_index.query(bmcase.specification, args.retrieval_k, exclude_prob_ids=[args.prob_id])
+    few_shot_examples = few_shot_examples_message(examples, args.retrieval_token_budget)
+    retrieval_info = {
+        'index_size': retrieval_index.num_docs,
+        'query_ms': (time.perf_counter() - retrieval_start) * 1000,
+        'examples': [{'prob_id': e.prob_id, 'score': e.score} for e in examples],
+        'prompt_chars': len(few_shot_examples.content) if few_shot_examples else 0,
+    }
+generator.testcase_prepare(bmcase, args.top_module_name, few_shot_examples=few_shot_examples)
 
 reviewer = Reviewer(
     sbt_system_prompt=Path(args.sbt_reflection_system_prompt).read_text(encoding='utf-8'),
     iv_system_prompt=Path(args.iv_reflection_system_prompt).read_text(encoding='utf-8'),
     functionality_system_prompt=Path(args.functionality_reflection_system_prompt).read_text(encoding='utf-8'),
     model=args.reviewer_model,
+    usage_tracker=usage_tracker,
     verbose=args.verbose
 )
 
@@ -80,64 +163,246 @@ tracing = Tracing(
     use_llm_summary=args.use_llm_summary,
     llm_summary_model=args.llm_summary_model,
     llm_summary_system_prompt=Path(args.llm_summary_system_prompt).read_text(encoding='utf-8'),
+    blob_store=BlobStore(args.trace_spill_dir),
+    usage_tracker=usage_tracker,
 )
 
 
+if args.cassette and args.verify_service:
+    print("--verify-service is ignored with --cassette; commands are recorded or replayed locally.")
+use_verify_service = bool(args.verify_service) and not args.cassette
+
+verify_kwargs = {
+    'use_formal': args.formal_equivalence, 'formal_timeout': args.formal_timeout,
+    'stop_on_first_failure': args.stop_on_first_failure,
+}
+if use_verify_service:
+    if args.chisel_toolchain != 'chisel3':
+        print("--chisel-toolchain is ignored with --verify-service; the service uses its own --toolchain.")
+    if args.syntax_precheck:
+        print("--syntax-precheck is ignored with --verify-service; the service runs sbt for every candidate.")
+else:
+    verify_kwargs['toolchain'] = args.chisel_toolchain
+    verify_kwargs['syntax_precheck'] = args.syntax_precheck
+    verify_kwargs['sim_workers'] = args.sim_workers
+if args.sbt_cache and use_verify_service:
+    print("--sbt-cache is ignored with --verify-service; the service runs its own sbt.")
+elif args.sbt_cache:
+    warmup_config = load_warmup_config(args.sbt_cache)
+    if warmup_config is None:
+        raise FileNotFoundError(f"No warm-up config in {args.sbt_cache}, run `python -m ReChisel.warmup {args.sbt_cache}` first.")
+    if warmup_config.get('toolchain', 'chisel3') != args.chisel_toolchain:
+        raise ValueError(f"The sbt cache in {args.sbt_cache} was warmed up for the {warmup_config.get('toolchain', 'chisel3')} toolchain.")
+    verify_kwargs['sbt_command'] = warmup_config['sbt_command']
+    verify_kwargs['skeleton_dir'] = warmup_config['skeleton_dir']
+if use_verify_service:
+    verify = partial(remote_verify, url=args.verify_service)
+
+autofixer = AutoFixer(verbose=args.verbose) if args.auto_fix else None
+
+fix_memory = FixMemory(args.fix_memory, min_support=args.fix_memory_min_support, verbose=args.verbose) if args.fix_memory else None
+if fix_memory is not None and (args.search == 'beam' or args.correction_mode != 'two-call'):
+    print("--fix-memory is ignored with --search beam and --correction-mode fused/speculative; it replaces the separate reviewer call of the two-call chain search.")
+    fix_memory = None
+
+cassette = Cassette(args.cassette, args.cassette_mode, strict_llm=args.cassette_strict_llm, verbose=args.verbose) if args.cassette else None
+
+
 current_chisel_code: ChiselCode = None
 current_verify_result: VerifyResult = None
 current_reviewer_response: AIMessage = None
 attempt_count = 0
 is_passed = False
+search_stats = None
+# In the fused mode, the correction produced together with the diagnosis of the last attempt.
+fused_correction_response: AIMessage = None
+# Error signature, reviewer guidance and whether it came from the fix memory, for the correction being verified.
+pending_guidance: tuple = None
+# In the speculative mode, the verified candidate chosen by the last race, and where the current code came from.
+raced_candidate = None
+current_origin = CHAIN
+if args.correction_mode != 'two-call' and args.search == 'beam':
+    print(f"--correction-mode {args.correction_mode} is ignored with --search beam; beam search reviews each candidate once for several corrections.")
+speculative_corrector = SpeculativeCorrector(
+    generator=generator,
+    reviewer=reviewer,
+    testcase=bmcase,
+    bm_type=args.bm_type,
+    output_dir=Path(args.verifier_working_dir),
+    use_in_context_history=args.use_in_context_history,
+    max_history_length=args.max_history_length,
+    summary_wait=args.llm_summary_wait,
+    verify_kwargs=verify_kwargs,
+    verify_fn=verify,
+    verbose=args.verbose
+) if args.correction_mode == 'speculative' and args.search == 'chain' else None
+
+
+search_start = time.monotonic()
+with cassette.activate() if cassette else nullcontext():
+    try:
+        if args.search == 'beam':
+            beam_search = BeamSearch(
+                generator=generator,
+                reviewer=reviewer,
+                tracing=tracing,
+                testcase=bmcase,
+                bm_type=args.bm_type,
+                output_dir=Path(args.verifier_working_dir),
+                config=BeamSearchConfig(
+                    beam_width=args.beam_width,
+                    num_expansions=args.beam_expansions,
+                    max_depth=args.num_iterations,
+                    verify_workers=args.verify_workers,
+                    time_budget=args.time_budget,
+                    llm_call_budget=args.llm_call_budget,
+                ),
+                use_in_context_history=args.use_in_context_history,
+                max_history_length=args.max_history_length,
+                summary_wait=args.llm_summary_wait,
+                verify_kwargs=verify_kwargs,
+                verify_fn=verify,
+                usage_tracker=usage_tracker,
+                verbose=args.verbose
+            )
+            best = beam_search.run()
+            if best is not None:
+                # Report the best branch as if it were a single chain.
+                tracing = best.child_tracing or best.tracing
+                current_chisel_code = best.chisel_code
+                current_verify_result = best.verify_result
+                is_passed = best.is_passed
+            search_stats = beam_search.stats.to_dict()
+            print(f"Beam search stopped ({search_stats['stop_reason']}), passed: {is_passed}.")
+        else:
+            while True:
+                print(f"==== Attempt {attempt_count + 1} ====")
+                usage_tracker.attempt = attempt_count
+                if raced_candidate is not None:
+                    # Generated and verified during the race.
+                    print(f"Using the {raced_candidate.name} correction chosen by the speculative race...")
+                    generation_response = None
+                    current_chisel_code, current_verify_result = raced_candidate.chisel_code, raced_candidate.verify_result
+                    current_origin, raced_candidate = raced_candidate.name, None
+                elif current_reviewer_response is None:
+                    print("Generating initial Chisel code...")
+                    generation_response = generator.initial_chisel_generation()
+                elif fused_correction_response is not None:
+                    print("Using the correction from the fused reflect-and-correct call...")
+                    generation_response, fused_correction_response = fused_correction_response, None
+                else:
+                    print("Generating correction for the current Chisel code...")
+                    if args.use_in_context_history:
+                        ictx_history = in_context_attempt_history_format(
+                            tracing, k=args.max_history_length, summary_wait=args.llm_summary_wait
+                        )
+                    generation_response = generator.correction_generation(
+                        current_reviewer_response,
+                        current_verify_result,
+                        current_chisel_code,
+                        in_context_history=ictx_history if args.use_in_context_history else None
+                    )
+                if generation_response is not None:
+                    current_chisel_code = generator.code_extract(generation_response)
+                    current_origin = CHAIN
+
+                    print("Verifying the current Chisel code...")
+                    current_verify_result = verify(
+                        current_chisel_code,
+                        bmcase,
+                        output_dir=Path(args.verifier_working_dir),
+                        bm_type=args.bm_type,
+                        verbose=args.verbose,
+                        **verify_kwargs
+                    )
+                if pending_guidance is not None:
+                    fix_memory.record_outcome(*pending_guidance, current_verify_result)
+                    pending_guidance = None
+
+                if current_verify_result.functionality_correct:
+                    print(f"Verification passed after {attempt_count + 1} attempts, stopping the process.")
+                    is_passed = True
+                    break
+                else:
+                    print(f"Verification failed at attempt {attempt_count + 1}.")
 
+                if autofixer is not None:
+                    autofix = autofixer.run(
+                        current_chisel_code, current_verify_result, bmcase,
+                        lambda code: verify(
+                            code, bmcase, output_dir=Path(args.verifier_working_dir), bm_type=args.bm_type,
+                            verbose=args.verbose, **verify_kwargs
+                        )
+                    )
+                    if autofix is not None:
+                        fix, fixed_verify_result = autofix
+                        print(f"Auto-fix resolved the interface mismatch: {', '.join(fix.rules)}.")
+                        tracing.add_attempt(current_chisel_code, current_verify_result, fix.reviewer_response, origin=current_origin)
+                        current_chisel_code, current_verify_result = fix.chisel_code, fixed_verify_result
+                        current_origin = CHAIN
+                        if current_verify_result.functionality_correct:
+                            print("Verification passed after auto-fix, stopping the process.")
+                            is_passed = True
+                            break
 
-while True:
-    print(f"==== Attempt {attempt_count + 1} ====")
-    if current_reviewer_response is None:
-        print("Generating initial Chisel code...")
-        generation_response = generator.initial_chisel_generation()
-    else:
-        print("Generating correction for the current Chisel code...")
-        if args.use_in_context_history:
-            ictx_history = in_context_attempt_history_format(tracing, k=args.max_history_length)
-        generation_response = generator.correction_generation(
-            current_reviewer_response,
-            current_verify_result,
-            current_chisel_code,
-            in_context_history=ictx_history if args.use_in_context_history else None
-        )
-    current_chisel_code = generator.code_extract(generation_response)
-
-    print("Verifying the current Chisel code...")
-    current_verify_result = verify(
-        current_chisel_code,
-        bmcase,
-        output_dir=Path(args.verifier_working_dir),
-        bm_type=args.bm_type,
-        verbose=args.verbose
-    )
-
-    if current_verify_result.functionality_correct:
-        print(f"Verification passed after {attempt_count + 1} attempts, stopping the process.")
-        is_passed = True
-        break
-    else:
-        print(f"Verification failed at attempt {attempt_count + 1}.")
-
-    print(f"Reflecting on the verification result and Chisel code...")
-    current_reviewer_response = reviewer(bmcase, current_verify_result, current_chisel_code)
+                if args.correction_mode == 'fused':
+                    print("Reflecting on and correcting the Chisel code in one call...")
+                    # The attempt being corrected is in the feedback itself; the history covers earlier ones.
+                    ictx_history = None
+                    if args.use_in_context_history and tracing.attempts:
+                        ictx_history = in_context_attempt_history_format(
+                            tracing, k=args.max_history_length, summary_wait=args.llm_summary_wait
+                        )
+                    current_reviewer_response, fused_correction_response = generator.fused_correction_generation(
+                        reviewer.reflection_system_prompt(current_verify_result),
+                        current_verify_result,
+                        current_chisel_code,
+                        in_context_history=ictx_history
+                    )
+                elif speculative_corrector is not None and failure_stage(current_verify_result) in args.speculative_stages:
+                    print("Racing a reviewer-free correction against the review and correction...")
+                    # The race records this attempt and the candidate that is not continued.
+                    current_reviewer_response, raced_candidate = speculative_corrector.race(
+                        tracing, current_chisel_code, current_verify_result, origin=current_origin
+                    )
+                else:
+                    signature = error_signature(current_verify_result) if fix_memory is not None else None
+                    guidance = fix_memory.lookup(signature) if signature is not None else None
+                    if guidance is not None:
+                        print("Reusing stored reviewer guidance for this error signature...")
+                        current_reviewer_response = AIMessage(guidance)
+                    else:
+                        print(f"Reflecting on the verification result and Chisel code...")
+                        current_reviewer_response = reviewer(bmcase, current_verify_result, current_chisel_code)
+                    if signature is not None:
+                        pending_guidance = (signature, current_reviewer_response.content, guidance is not None)
         
-    print("Adding attempt to tracing...")
-    tracing.add_attempt(
-        current_chisel_code, 
-        current_verify_result, 
-        current_reviewer_response
-    )
+                if raced_candidate is None:
+                    print("Adding attempt to tracing...")
+                    tracing.add_attempt(
+                        current_chisel_code, 
+                        current_verify_result, 
+                        current_reviewer_response,
+                        origin=current_origin
+                    )
 
-    attempt_count += 1
-    print(f"Attempt {attempt_count + 1} completed.\n")
-    if attempt_count >= args.num_iterations:
-        print("Maximum attempts reached, stopping the process.")
-        break
+                attempt_count += 1
+                print(f"Attempt {attempt_count + 1} completed.\n")
+                if attempt_count >= args.num_iterations:
+                    print("Maximum attempts reached, stopping the process.")
+                    break
+    except BudgetExceeded as e:
+        # Stop cleanly; the attempts made so far are saved below.
+        print(f"Stopping the process: {e}")
+    finally:
+        # Also counts runs that end with an error; their calls are already in the ledger.
+        usage_tracker.commit_to_ledger()
+
+    # Summaries still running in the background are included in the results.
+    tracing.wait_for_summaries()
+    if speculative_corrector is not None:
+        speculative_corrector.wait_for_cancelled()
+orchestration_seconds = time.monotonic() - search_start
 
 
 # Save the result
@@ -153,7 +418,8 @@ rlt_dict = {
         'sbt_reflection_system_prompt': args.sbt_reflection_system_prompt,
         'iv_reflection_system_prompt': args.iv_reflection_system_prompt,
         'functionality_reflection_system_prompt': args.functionality_reflection_system_prompt,
-        'llm_summary_system_prompt': args.llm_summary_system_prompt
+        'llm_summary_system_prompt': args.llm_summary_system_prompt,
+        'fused_system_prompt': args.fused_system_prompt if args.correction_mode == 'fused' else None
     },
     'llm_models': {
         'init_gen_model': args.init_gen_model,
@@ -165,14 +431,54 @@ rlt_dict = {
         'use_in_context_history': args.use_in_context_history,
         'use_llm_summary': args.use_llm_summary,
         'max_history_length': args.max_history_length,
+        'llm_summary_wait': args.llm_summary_wait,
         'num_iterations': args.num_iterations,
+        'search': args.search,
+        'beam_width': args.beam_width,
+        'beam_expansions': args.beam_expansions,
         'bm_type': args.bm_type,
-        'verifier_working_dir': args.verifier_working_dir
+        'formal_equivalence': args.formal_equivalence,
+        'seeds': args.seeds,
+        'stop_on_first_failure': args.stop_on_first_failure,
+        'syntax_precheck': args.syntax_precheck,
+        'auto_fix': args.auto_fix,
+        'fix_memory': args.fix_memory,
+        'correction_mode': args.correction_mode,
+        'speculative_stages': args.speculative_stages if args.correction_mode == 'speculative' else None,
+        'chisel_toolchain': args.chisel_toolchain,
+        'retrieval_index': args.retrieval_index,
+        'retrieval_k': args.retrieval_k if args.retrieval_index else None,
+        'retrieval_token_budget': args.retrieval_token_budget if args.retrieval_index else None,
+        'verifier_working_dir': args.verifier_working_dir,
+        'verify_service': args.verify_service,
+        'sbt_cache': args.sbt_cache,
+        'trace_spill_dir': args.trace_spill_dir,
+        'budgets': {
+            'max_tokens': args.max_tokens,
+            'max_cost': args.max_cost,
+            'max_seconds': args.max_seconds,
+            'campaign_max_tokens': args.campaign_max_tokens,
+            'campaign_max_cost': args.campaign_max_cost,
+            'campaign_max_seconds': args.campaign_max_seconds,
+        }
     },
     'testcase': bmcase.to_dict(),
     'attempts': [
         attempt.to_dict() for attempt in tracing.attempts
     ],
+    'search_stats': search_stats,
+    'summary_stats': tracing.summary_stats.to_dict() if args.use_llm_summary else None,
+    'autofix_stats': autofixer.stats.to_dict() if autofixer else None,
+    'fix_memory_stats': fix_memory.stats.to_dict() if fix_memory else None,
+    'speculation_stats': speculative_corrector.stats.to_dict() if speculative_corrector else None,
+    'usage': usage_tracker.to_dict(),
+    'retrieval': retrieval_info,
+    'cassette': {
+        'path': args.cassette,
+        'mode': args.cassette_mode,
+        **cassette.stats,
+        'orchestration_seconds': orchestration_seconds,
+    } if cassette else None,
     'is_passed': is_passed,
     'final_chisel_code': current_chisel_code.raw_stripped if current_chisel_code else None,
     'final_verify_result': current_verify_result.__dict__() if current_verify_result else None
@@ -181,4 +487,23 @@ rlt_dict = {
 with output_path.open('w', encoding='utf-8') as f:
     json.dump(rlt_dict, f, indent=2, ensure_ascii=False)
 
+usage_total = rlt_dict['usage']['total']
+print(f"LLM usage: {usage_total['calls']} calls, {usage_total['input_tokens']} input / {usage_total['output_tokens']} output tokens, ${usage_total['cost']:.4f}")
+if cassette and cassette.mode == 'replay':
+    print(f"Replayed {cassette.stats['commands']} commands and {cassette.stats['llm_calls']} LLM calls in {orchestration_seconds:.3f} s")
+
 print(f"Results saved to {output_path}")
+
+if args.retrieval_update and retrieval_index is not None and is_passed and current_chisel_code:
+    added = retrieval_index.add([{
+        'prob_id': args.prob_id,
+        'specification': bmcase.specification,
+        'chisel_code': current_chisel_code.raw_stripped,
+    }])
+    print(f"Added {added} solved example to {args.retrieval_index} ({retrieval_index.num_docs} in total)")
+
+if args.results_db:
+    results_store = ResultsStore(args.results_db)
+    run_id = results_store.append_result(rlt_dict)
+    results_store.close()
+    print(f"Results appended to {args.results_db} (run_id: {run_id})")